@@ -0,0 +1,128 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Make sibling modules importable as `ai.<module>` when this file is run as a script
+_PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from ai.metadata_index import build_metadata_index
+from ai.retriever import default_fetch_k, get_retriever
+
+Search = Callable[[List[float]], List[Tuple[Document, float]]]
+
+
+def synthetic_store(n: int, dim: int, seed: int = 0):
+    """
+    In-memory FAISS store of ``n`` random unit vectors with short chunk texts
+    (no Ollama needed), spread over ten sources of four chunks per page.
+    """
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import FakeEmbeddings
+
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = faiss.IndexFlatL2(dim)
+    index.add(vectors)
+    ids = [str(i) for i in range(n)]
+    per_source = max(1, n // 10)
+    docstore = InMemoryDocstore({
+        i: Document(page_content=f"chunk {i}", metadata={"source": f"doc{int(i) // per_source}.pdf", "page": int(i) % per_source // 4})
+        for i in ids
+    })
+    return FAISS(FakeEmbeddings(size=dim), index, docstore, dict(enumerate(ids)))
+
+
+def sample_queries(db, count: int, seed: int = 1) -> List[List[float]]:
+    """Stored vectors plus noise, renormalized: realistic near-duplicates of indexed chunks."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(db.index.ntotal, size=count, replace=db.index.ntotal < count)
+    vectors = db.index.reconstruct_batch(rows.astype(np.int64))
+    vectors += rng.standard_normal(vectors.shape).astype(np.float32) * 0.05
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.tolist()
+
+
+def timed(name: str, search: Search, queries: List[List[float]], repeat: int) -> List[List[str]]:
+    results: List[List[str]] = []
+    best = float("inf")
+    latencies: List[float] = []
+    for _ in range(repeat):
+        run: List[float] = []
+        results = []
+        for query in queries:
+            started = time.perf_counter()
+            hits = search(query)
+            run.append(time.perf_counter() - started)
+            results.append([doc.page_content for doc, _ in hits])
+        if sum(run) < best:
+            best, latencies = sum(run), run
+    us = np.array(latencies) * 1e6
+    print(f"{name:>22}: {us.mean():8.1f} us/query (p50 {np.percentile(us, 50):.1f}, p95 {np.percentile(us, 95):.1f})", flush=True)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-query overhead of LangChain's FAISS search methods versus the native retriever.")
+    parser.add_argument("--index", type=str, help="Saved index directory (default: a synthetic in-memory index)", default="")
+    parser.add_argument("--synthetic", type=int, help="Vectors in the synthetic index", default=20000)
+    parser.add_argument("--dim", type=int, help="Dimension of the synthetic index", default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--repeat", type=int, help="Runs per path; the fastest is reported", default=3)
+    args = parser.parse_args()
+
+    if args.index:
+        from ai.loader import load_index
+        db = load_index(args.index)
+    else:
+        db = synthetic_store(args.synthetic, args.dim)
+    queries = sample_queries(db, args.queries)
+    print(f"{db.index.ntotal} vectors of dim {db.index.d}, {len(queries)} queries", flush=True)
+
+    for k in (4, 10):
+        fetch_k = default_fetch_k(k)
+        paths = [
+            (
+                "similarity",
+                lambda q: db.similarity_search_with_score_by_vector(q, k=k),
+                get_retriever(db, k, "similarity").search,
+            ),
+            (
+                "mmr",
+                lambda q: db.max_marginal_relevance_search_with_score_by_vector(q, k=k, fetch_k=fetch_k),
+                get_retriever(db, k, "mmr").search,
+            ),
+        ]
+        print(f"top-k {k} (mmr fetch_k {fetch_k})", flush=True)
+        for mode, langchain_search, native_search in paths:
+            expected = timed(f"{mode} langchain", langchain_search, queries, args.repeat)
+            actual = timed(f"{mode} native", native_search, queries, args.repeat)
+            mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+            print(" " * 24 + ("same results" if mismatches == 0 else f"results differ for {mismatches} queries"), flush=True)
+
+    # Filters run inside the search (FAISS ID selectors), so they should cost less than no filter
+    metadata_index = getattr(db, "metadata_index", None)
+    if metadata_index is None:
+        ordered = [db.index_to_docstore_id[i] for i in range(db.index.ntotal)]
+        metadata_index = build_metadata_index(db.docstore.search(doc_id) for doc_id in ordered)
+    first_source = str(metadata_index.sources[0])
+    filters = [
+        ("no filter", None),
+        ("one source", metadata_index.select([first_source])),
+        ("pages 0-9", metadata_index.select(None, [[0, 9]])),
+        ("one page", metadata_index.select([first_source], [0])),
+    ]
+    print(f"filtered search, top-k 4 (one source = {first_source})", flush=True)
+    for name, rows in filters:
+        retriever = get_retriever(db, 4)
+        label = name if rows is None else f"{name} ({len(rows)} rows)"
+        timed(label, lambda q: retriever.search(q, rows), queries, args.repeat)
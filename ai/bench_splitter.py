@@ -0,0 +1,68 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+# Make sibling modules importable as `ai.<module>` when this file is run as a script
+_PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from ai.loader import load_pdfs
+from ai.text_splitter import FastTextSplitter, sanitize_text
+
+
+def langchain_split(documents: List[Document], chunk_size: int, chunk_overlap: int) -> List[Document]:
+    # The previous pipeline: split with LangChain, then sanitize and drop empty chunks
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks = []
+    for d in splitter.split_documents(documents):
+        txt = sanitize_text(d.page_content)
+        if txt.strip():
+            chunks.append(Document(page_content=txt, metadata=d.metadata))
+    return chunks
+
+
+def timed(name: str, fn: Callable[[], List[Document]], repeat: int) -> List[Document]:
+    best = float("inf")
+    chunks: List[Document] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"{name:>10}: {len(chunks)} chunks in {best * 1000:.1f} ms ({len(chunks) / best:,.0f} chunks/s)", flush=True)
+    return chunks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare FastTextSplitter against LangChain's RecursiveCharacterTextSplitter.")
+    parser.add_argument("--pdf", action="append", help="Path to a PDF file (can be specified multiple times)")
+    parser.add_argument("--dir", type=str, help="Directory to scan for PDFs (glob *.pdf)", default="")
+    parser.add_argument("--chunk-size", type=int, default=250)
+    parser.add_argument("--chunk-overlap", type=int, default=50)
+    parser.add_argument("--repeat", type=int, help="Runs per splitter; the best time is reported", default=5)
+    args = parser.parse_args()
+
+    pdfs: List[Path] = [Path(p) for p in args.pdf or []]
+    if args.dir:
+        pdfs.extend(sorted(Path(args.dir).glob("*.pdf")))
+    if not pdfs:
+        raise SystemExit("No PDFs provided. Use --pdf path or --dir directory.")
+
+    documents = load_pdfs(pdfs)
+    chars = sum(len(d.page_content) for d in documents)
+    print(f"{len(documents)} pages, {chars:,} characters", flush=True)
+
+    fast = FastTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    expected = timed("langchain", lambda: langchain_split(documents, args.chunk_size, args.chunk_overlap), args.repeat)
+    actual = timed("fast", lambda: fast.split_documents(documents), args.repeat)
+
+    mismatches = sum(
+        1 for a, b in zip(expected, actual)
+        if a.page_content != b.page_content or a.metadata != b.metadata
+    ) + abs(len(expected) - len(actual))
+    print("Output identical" if mismatches == 0 else f"Output differs in {mismatches} chunks", flush=True)
@@ -0,0 +1,165 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+CHUNKS_FILENAME = "chunks.sqlite"
+# Keep well under SQLite's default host-parameter limit
+_SQL_CHUNK = 500
+
+
+class SqliteDocstore(Docstore, AddableMixin):
+    """
+    Chunk text and metadata in a SQLite file, read on demand for search hits.
+
+    Replaces the pickled InMemoryDocstore: loading only opens the file, and
+    reads go through SQLite's memory-mapped I/O, so the text is shared via
+    the OS page cache instead of living in every process's heap. The FAISS
+    row -> docstore id mapping lives in the ``positions`` table.
+
+    Deleting never removes rows from the file: other handles may still be
+    searching the version of the index saved with it. ``save_index`` copies
+    the store into the new version and :meth:`commit` drops the unreferenced
+    rows from that copy only.
+    """
+
+    def __init__(self, path: Union[str, Path], mmap_bytes: int = 1 << 30):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute(f"PRAGMA mmap_size={int(mmap_bytes)}")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, content TEXT NOT NULL, metadata TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS positions (pos INTEGER PRIMARY KEY, id TEXT NOT NULL)")
+        self._conn.commit()
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._conn.execute("SELECT content, metadata FROM chunks WHERE id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def mget(self, ids: Sequence[str]) -> Dict[str, Document]:
+        found: Dict[str, Document] = {}
+        with self._lock:
+            for i in range(0, len(ids), _SQL_CHUNK):
+                part = list(ids[i:i + _SQL_CHUNK])
+                marks = ",".join("?" * len(part))
+                for doc_id, content, metadata in self._conn.execute(
+                    f"SELECT id, content, metadata FROM chunks WHERE id IN ({marks})", part
+                ):
+                    found[doc_id] = Document(id=doc_id, page_content=content, metadata=json.loads(metadata))
+        return found
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        rows = [
+            (doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False, default=str))
+            for doc_id, doc in texts.items()
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (id, content, metadata) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def update_metadata(self, metadata: Dict[str, dict]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunks SET metadata = ? WHERE id = ?",
+                [(json.dumps(md, ensure_ascii=False, default=str), doc_id) for doc_id, md in metadata.items()],
+            )
+            self._conn.commit()
+
+    def delete(self, ids: List) -> None:
+        # Deferred: the copy made at the next save leaves these rows out
+        pass
+
+    def positions(self) -> Dict[int, str]:
+        with self._lock:
+            return {pos: doc_id for pos, doc_id in self._conn.execute("SELECT pos, id FROM positions ORDER BY pos")}
+
+    def commit(self, index_to_docstore_id: Dict[int, str]) -> None:
+        """Persist the FAISS row -> id mapping and drop unreferenced chunks in one transaction."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM positions")
+                self._conn.executemany("INSERT INTO positions (pos, id) VALUES (?, ?)", index_to_docstore_id.items())
+                self._conn.execute("DELETE FROM chunks WHERE id NOT IN (SELECT id FROM positions)")
+
+    def copy_to(self, path: Union[str, Path]) -> None:
+        """Copy the whole store to a new file at ``path`` with SQLite's online backup (pages, not rows)."""
+        dest = sqlite3.connect(str(path))
+        try:
+            with self._lock:
+                self._conn.backup(dest)
+        finally:
+            dest.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def iter_documents(docstore: Docstore, ids: Iterable[str]) -> Iterable[Document]:
+    """Yield documents for ``ids`` in order, fetching in batches where the store allows it."""
+    ids = list(ids)
+    for i in range(0, len(ids), _SQL_CHUNK):
+        part = ids[i:i + _SQL_CHUNK]
+        if isinstance(docstore, SqliteDocstore):
+            found = docstore.mget(part)
+            for doc_id in part:
+                yield found[doc_id]
+        else:
+            for doc_id in part:
+                doc = docstore.search(doc_id)
+                if not isinstance(doc, Document):
+                    raise ValueError(f"Could not find document for id {doc_id}, got {doc}")
+                yield doc
+
+
+def update_metadata(docstore: Docstore, metadata: Dict[str, dict]) -> None:
+    """Replace the metadata of stored documents by id."""
+    if isinstance(docstore, SqliteDocstore):
+        docstore.update_metadata(metadata)
+        return
+    for doc_id, md in metadata.items():
+        doc = docstore.search(doc_id)
+        if isinstance(doc, Document):
+            doc.metadata = md
+
+
+def write_docstore(path: Union[str, Path], docstore: Docstore, index_to_docstore_id: Dict[int, str]) -> None:
+    """Copy every document referenced by the index into a fresh SQLite chunk store at ``path``."""
+    if isinstance(docstore, SqliteDocstore):
+        # Copy the file as is; commit() then drops the rows the index no longer references
+        docstore.copy_to(path)
+        store = SqliteDocstore(path)
+        try:
+            store.commit(index_to_docstore_id)
+        finally:
+            store.close()
+        return
+    store = SqliteDocstore(path)
+    try:
+        ordered = [doc_id for _, doc_id in sorted(index_to_docstore_id.items())]
+        batch: Dict[str, Document] = {}
+        for doc_id, doc in zip(ordered, iter_documents(docstore, ordered)):
+            batch[doc_id] = doc
+            if len(batch) >= _SQL_CHUNK:
+                store.add(batch)
+                batch = {}
+        if batch:
+            store.add(batch)
+        store.commit(index_to_docstore_id)
+    finally:
+        store.close()
+
+
+def open_docstore(index_dir: Union[str, Path]) -> Optional[SqliteDocstore]:
+    path = Path(index_dir) / CHUNKS_FILENAME
+    if not path.exists():
+        return None
+    return SqliteDocstore(path)
@@ -0,0 +1,177 @@
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from ai.text_splitter import LengthsFunction, tokenizer_lengths
+
+# Smallest suffix/prefix overlap treated as the splitter's chunk overlap rather than a coincidence
+MIN_OVERLAP_CHARS = 12
+# Don't bother squeezing a truncated block into less room than this
+MIN_TAIL_TOKENS = 32
+BLOCK_SEPARATOR = "\n\n"
+_WIDE = re.compile(r"[\u1100-\u11ff\u3040-\u30ff\u3130-\u318f\u3400-\u9fff\uac00-\ud7a3\uf900-\ufaff]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def approx_token_lengths(pieces: Sequence[str]) -> List[int]:
+    """
+    Token counts estimated without a tokenizer: one token per Hangul/CJK
+    character and one per four other characters, close to what BPE
+    tokenizers like Qwen's produce for mixed Korean/English text.
+    """
+    lengths = []
+    for text in pieces:
+        wide = len(_WIDE.findall(text))
+        lengths.append(wide + math.ceil((len(text) - wide) / 4))
+    return lengths
+
+
+def context_token_lengths(tokenizer_name: Optional[str] = None) -> LengthsFunction:
+    """The named Hugging Face tokenizer if given and available, else the estimate."""
+    if tokenizer_name:
+        try:
+            return tokenizer_lengths(tokenizer_name)
+        except Exception as e:
+            print(f"Tokenizer {tokenizer_name} unavailable ({e}); estimating context tokens")
+    return approx_token_lengths
+
+
+@dataclass
+class PackedContext:
+    text: str
+    documents: List[Document] = field(default_factory=list)  # retrieved chunks that made it into the text
+    tokens: int = 0
+    tokens_raw: int = 0  # all retrieved chunks joined as-is
+    merged: int = 0  # chunks folded into a neighbour from the same page
+    duplicates: int = 0  # chunks dropped as repeated text
+    truncated: bool = False
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_raw - self.tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tokens": self.tokens,
+            "tokens_raw": self.tokens_raw,
+            "tokens_saved": self.tokens_saved,
+            "chunks": len(self.documents),
+            "merged": self.merged,
+            "duplicates": self.duplicates,
+            "truncated": self.truncated,
+        }
+
+
+def _norm(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _overlap_merge(a: str, b: str) -> Optional[str]:
+    """``a`` and ``b`` joined over their longest suffix/prefix overlap (either order), or None."""
+    for left, right in ((a, b), (b, a)):
+        for size in range(min(len(left), len(right)), MIN_OVERLAP_CHARS - 1, -1):
+            if left.endswith(right[:size]):
+                return left + right[size:]
+    return None
+
+
+def _blocks(docs: Sequence[Document]) -> Tuple[List[Tuple[str, List[Document]]], int, int]:
+    """
+    Group chunks by (source, page) in order of their best rank, dropping
+    repeated text and stitching overlapping neighbours together. Returns
+    ([(text, chunks)], merged count, duplicate count).
+    """
+    groups: Dict[Tuple, Tuple[List[str], List[Document]]] = {}
+    seen = set()
+    merged = duplicates = 0
+    for doc in docs:
+        text = (doc.page_content or "").strip()
+        key = _norm(text)
+        if not key or key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        parts, members = groups.setdefault((doc.metadata.get("source"), doc.metadata.get("page")), ([], []))
+        members.append(doc)
+        if any(text in part for part in parts):
+            duplicates += 1
+            continue
+        contained = [part for part in parts if part in text]
+        if contained:
+            duplicates += len(contained)
+            parts[:] = [part for part in parts if part not in contained]
+        for i, part in enumerate(parts):
+            joined = _overlap_merge(part, text)
+            if joined is not None:
+                parts[i] = joined
+                merged += 1
+                break
+        else:
+            # Same page but not touching: a separate paragraph of the page's block
+            parts.append(text)
+    # Pages keep the rank of their best chunk (dicts preserve insertion order)
+    blocks = [("\n".join(parts), members) for parts, members in groups.values()]
+    return blocks, merged, duplicates
+
+
+def _truncate(text: str, budget: int, lengths: LengthsFunction) -> str:
+    """Longest whitespace-aligned prefix of ``text`` within ``budget`` tokens."""
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if lengths([text[:mid]])[0] <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    cut = text[:lo]
+    space = cut.rfind(" ")
+    return cut[:space] if space > len(cut) // 2 else cut
+
+
+def pack_context(
+    docs: Sequence[Document],
+    max_tokens: int,
+    lengths: LengthsFunction = approx_token_lengths,
+    max_chars: Optional[int] = None,
+) -> PackedContext:
+    """
+    Assemble the prompt context from ranked chunks: merge overlapping or
+    same-page chunks, drop repeated text, then add blocks in rank order
+    until ``max_tokens`` (and ``max_chars``, if given) would be exceeded,
+    truncating the last block that still has useful room.
+    """
+    raw = BLOCK_SEPARATOR.join(d.page_content or "" for d in docs)
+    packed = PackedContext(text="", tokens_raw=lengths([raw])[0] if raw else 0)
+    blocks, packed.merged, packed.duplicates = _blocks(docs)
+
+    sep_tokens = lengths([BLOCK_SEPARATOR])[0]
+    budget = max_tokens
+    char_budget = max_chars if max_chars is not None else math.inf
+    parts: List[str] = []
+    block_tokens = lengths([text for text, _ in blocks]) if blocks else []
+    for (text, members), size in zip(blocks, block_tokens):
+        cost = size + (sep_tokens if parts else 0)
+        extra_chars = len(text) + (len(BLOCK_SEPARATOR) if parts else 0)
+        if cost <= budget and extra_chars <= char_budget:
+            parts.append(text)
+            packed.documents.extend(members)
+            budget -= cost
+            char_budget -= extra_chars
+            continue
+        room = budget - (sep_tokens if parts else 0)
+        if room >= MIN_TAIL_TOKENS:
+            head = _truncate(text, room, lengths)
+            if max_chars is not None:
+                head = head[:max(0, int(char_budget) - (len(BLOCK_SEPARATOR) if parts else 0))]
+            if head:
+                parts.append(head)
+                packed.documents.extend(members)
+        packed.truncated = True
+        break
+
+    packed.text = BLOCK_SEPARATOR.join(parts)
+    packed.tokens = lengths([packed.text])[0] if packed.text else 0
+    return packed
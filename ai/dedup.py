@@ -0,0 +1,132 @@
+import re
+import zlib
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+# MinHash signature layout: NUM_PERM hashes split into BANDS LSH bands
+NUM_PERM = 128
+BANDS = 16
+SHINGLE_SIZE = 5
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_WHITESPACE = re.compile(r"\s+")
+# Off unless asked for: near-identical chunks can differ in what matters (part numbers, values)
+DEFAULT_THRESHOLD = 0.0
+
+
+def _shingles(text: str) -> np.ndarray:
+    """crc32 hashes of the character shingles of the normalized text (works for Korean as well as English)."""
+    norm = _WHITESPACE.sub(" ", text.lower()).strip()
+    if len(norm) <= SHINGLE_SIZE:
+        grams = {norm}
+    else:
+        grams = {norm[i:i + SHINGLE_SIZE] for i in range(len(norm) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash(text: str) -> np.ndarray:
+    hashes = _shingles(text)
+    # a * h + b stays below 2**64 because a, b and h are all < 2**32
+    permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+
+def _page_ref(metadata: Dict) -> Dict:
+    return {"source": metadata.get("source"), "page": metadata.get("page")}
+
+
+class ChunkDeduplicator:
+    """
+    Incremental :func:`dedup_chunks`: every chunk passed to :meth:`add` is
+    compared with all chunks kept by earlier calls too, so feeding a document
+    in windows (streaming builds) keeps exactly the chunks one call would.
+    Holds one MinHash signature (1 KiB) and the metadata dict of each kept chunk.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.removed = 0
+        self._signatures: List[np.ndarray] = []
+        self._metadata: List[Dict] = []
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def metadata(self, position: int) -> Dict:
+        """Metadata of the ``position``-th kept chunk, counted over all calls."""
+        return self._metadata[position]
+
+    @staticmethod
+    def _keys(sig: np.ndarray) -> List[Tuple[int, bytes]]:
+        rows = NUM_PERM // BANDS
+        return [(b, sig[b * rows:(b + 1) * rows].tobytes()) for b in range(BANDS)]
+
+    def _keep(self, sig: np.ndarray, keys: List[Tuple[int, bytes]], metadata: Dict) -> None:
+        for key in keys:
+            self._buckets.setdefault(key, []).append(len(self._signatures))
+        self._signatures.append(sig)
+        self._metadata.append(metadata)
+
+    def seed(self, chunk: Document) -> None:
+        """Register a chunk kept earlier (e.g. read back from a saved index) without checking it."""
+        if self.threshold > 0:
+            sig = minhash(chunk.page_content)
+            self._keep(sig, self._keys(sig), chunk.metadata)
+
+    def add(self, chunks: Sequence[Document]) -> Tuple[List[Document], List[int]]:
+        """
+        Returns (chunks of ``chunks`` to keep, positions of chunks kept by
+        earlier calls whose ``occurrences`` metadata changed).
+        """
+        if self.threshold <= 0:
+            return list(chunks), []
+        start = len(self)
+        kept: List[Document] = []
+        touched = set()
+        for chunk in chunks:
+            sig = minhash(chunk.page_content)
+            keys = self._keys(sig)
+            match = None
+            for key in keys:
+                for idx in self._buckets.get(key, ()):
+                    if np.mean(self._signatures[idx] == sig) >= self.threshold:
+                        match = idx
+                        break
+                if match is not None:
+                    break
+            if match is None:
+                self._keep(sig, keys, chunk.metadata)
+                kept.append(chunk)
+                continue
+            self.removed += 1
+            first = self._metadata[match]
+            occurrences = first.setdefault("occurrences", [_page_ref(first)])
+            ref = _page_ref(chunk.metadata)
+            if ref not in occurrences:
+                occurrences.append(ref)
+            touched.add(match)
+        return kept, sorted(p for p in touched if p < start)
+
+
+def dedup_chunks(chunks: Sequence[Document], threshold: float = DEFAULT_THRESHOLD) -> Tuple[List[Document], int]:
+    """
+    Collapse chunks whose estimated Jaccard similarity (MinHash over character
+    shingles) is at least ``threshold`` into the first occurrence.
+
+    Candidates are found with LSH banding, so cost stays linear in the number
+    of chunks. A kept chunk that absorbed duplicates gets
+    ``metadata["occurrences"]``: every {source, page} its text appeared on,
+    its own first. Returns (kept chunks, number removed); a threshold of 0 or
+    less (the default) disables deduplication. Chunks that differ only in a
+    number, such as part numbers AB-1000 and AB-1001 in otherwise identical
+    text, are about 0.95 similar, so keep the threshold above that when such
+    differences matter.
+    """
+    dedup = ChunkDeduplicator(threshold)
+    kept, _ = dedup.add(chunks)
+    return kept, dedup.removed
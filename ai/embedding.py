@@ -0,0 +1,138 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+
+from ai.embedding_cache import EmbeddingCache, text_key
+
+
+@dataclass
+class EmbeddingStats:
+    texts: int = 0
+    batches: int = 0
+    retries: int = 0
+    seconds: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+    @property
+    def texts_per_sec(self) -> float:
+        return self.texts / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        line = (
+            f"Embedded {self.texts} texts in {self.batches} batches "
+            f"({self.retries} retries) in {self.seconds:.1f}s, {self.texts_per_sec:.1f} texts/s"
+        )
+        if self.cache_hits or self.cache_misses:
+            line += f"; cache {self.cache_hits} hits / {self.cache_misses} misses"
+        return line
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Wrap an Embeddings client so ``embed_documents`` sends fixed-size batches
+    with at most ``max_in_flight`` requests outstanding, retrying failed batches
+    with exponential backoff. Output order always matches input order.
+
+    With a ``cache``, texts already embedded by the same model are served from
+    it and only new (deduplicated) texts are sent to the wrapped client.
+
+    ``progress``, if set, is called with (done, total) for the current
+    ``embed_documents`` call after the cache lookup and after every batch.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = 64,
+        max_in_flight: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+        cache: Optional[EmbeddingCache] = None,
+        model: Optional[str] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model if model is not None else str(getattr(embeddings, "model", ""))
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        self.stats = EmbeddingStats()
+        self.progress = progress
+        self._lock = threading.Lock()
+        self._done = 0
+        self._total = 0
+
+    def _report(self, count: int) -> None:
+        with self._lock:
+            self._done += count
+            done, total = self._done, self._total
+        if self.progress is not None:
+            self.progress(done, total)
+
+    def _embed_batch(self, batch: Sequence[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                vectors = self.embeddings.embed_documents(list(batch))
+                break
+            except Exception:
+                if attempt >= self.max_retries:
+                    raise
+                with self._lock:
+                    self.stats.retries += 1
+                time.sleep(self.retry_backoff * (2 ** attempt))
+                attempt += 1
+        with self._lock:
+            self.stats.texts += len(batch)
+            self.stats.batches += 1
+        self._report(len(batch))
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        with self._lock:
+            self._done, self._total = 0, len(texts)
+        if self.cache is None:
+            return self._embed_uncached(texts)
+
+        keys = [text_key(t) for t in texts]
+        vectors = self.cache.get_many(self.model, keys)
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        with self._lock:
+            self.stats.cache_misses += sum(1 for k in keys if k not in vectors)
+            self.stats.cache_hits += sum(1 for k in keys if k in vectors)
+        # Count cached and repeated texts as done; each unique miss is reported as its batch completes
+        self._report(len(keys) - len(missing))
+        if missing:
+            fresh = dict(zip(missing.keys(), self._embed_uncached(list(missing.values()))))
+            self.cache.put_many(self.model, fresh.items())
+            vectors.update(fresh)
+        return [vectors[k] for k in keys]
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        started = time.perf_counter()
+        try:
+            if self.max_in_flight == 1 or len(batches) == 1:
+                results = [self._embed_batch(b) for b in batches]
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(batches))) as pool:
+                    results = list(pool.map(self._embed_batch, batches))
+        finally:
+            with self._lock:
+                self.stats.seconds += time.perf_counter() - started
+        return [vec for batch in results for vec in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
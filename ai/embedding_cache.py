@@ -0,0 +1,119 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+_WS_RE = re.compile(r"\s+")
+# Keep well under SQLite's default host-parameter limit
+_SQL_CHUNK = 500
+
+
+def normalize_text(text: str) -> str:
+    """Normalization applied before hashing so trivially different chunks share an entry."""
+    return _WS_RE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8", errors="ignore")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding store backed by SQLite.
+
+    Entries are keyed by (embedding model, sha256 of normalized text) and hold the
+    vector as packed float32. When the stored vectors exceed ``max_bytes`` the
+    least recently used entries are evicted down to 90% of the limit.
+    """
+
+    def __init__(self, path: Union[str, Path], max_bytes: int = 1024 * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, model: str, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for ``keys``; missing keys are simply absent."""
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(unique), _SQL_CHUNK):
+                part = unique[i:i + _SQL_CHUNK]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({marks})", [model, *part]
+                ).fetchall()
+                for key, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[key] = vec.tolist()
+                if rows:
+                    hit_marks = ",".join("?" * len(rows))
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE model = ? AND key IN ({hit_marks})",
+                        [now, model, *(k for k, _ in rows)],
+                    )
+            self._conn.commit()
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, Sequence[float]]]) -> None:
+        now = time.time()
+        rows = [(model, key, array("f", vec).tobytes(), now) for key, vec in items]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, vector, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * 0.9)
+        victims: List[int] = []
+        freed = 0
+        for rowid, size in self._conn.execute("SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used"):
+            victims.append(rowid)
+            freed += size
+            if freed >= excess:
+                break
+        for i in range(0, len(victims), _SQL_CHUNK):
+            part = victims[i:i + _SQL_CHUNK]
+            self._conn.execute(f"DELETE FROM embeddings WHERE rowid IN ({','.join('?' * len(part))})", part)
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def open_cache(path: Optional[Union[str, Path]], max_mb: int = 1024) -> Optional[EmbeddingCache]:
+    if not path:
+        return None
+    return EmbeddingCache(path, max_bytes=max_mb * 1024 * 1024)
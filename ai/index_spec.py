@@ -0,0 +1,121 @@
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import faiss
+import numpy as np
+
+# Default build/search parameters per index kind
+DEFAULT_PARAMS: Dict[str, Dict[str, int]] = {
+    "flat": {},
+    "hnsw": {"M": 32, "efConstruction": 200, "efSearch": 64},
+    "ivf": {"nlist": 1024, "nprobe": 16},
+    "ivfpq": {"nlist": 1024, "nprobe": 16, "m": 16, "nbits": 8},
+}
+# Parameters that only affect search and can be changed on a built index
+SEARCH_PARAMS = ("efSearch", "nprobe")
+# FAISS suggests at least ~39 training points per centroid
+_POINTS_PER_CENTROID = 39
+
+
+@dataclass
+class IndexSpec:
+    kind: str = "flat"
+    params: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def needs_training(self) -> bool:
+        return self.kind in ("ivf", "ivfpq")
+
+    @property
+    def supports_remove(self) -> bool:
+        # Deleting arbitrary vectors: only a flat index renumbers the rest to 0..n-1 the way
+        # FAISS.delete renumbers index_to_docstore_id (IVF keeps their ids, HNSW cannot drop any)
+        return self.kind == "flat"
+
+    @property
+    def supports_truncate(self) -> bool:
+        # Dropping the newest vectors leaves ids 0..n-1 in place for every kind but HNSW
+        return self.kind != "hnsw"
+
+    def __str__(self) -> str:
+        if not self.params:
+            return self.kind
+        return self.kind + ":" + ",".join(f"{k}={v}" for k, v in self.params.items())
+
+
+def parse_index_spec(text: Optional[str]) -> IndexSpec:
+    """
+    Parse "flat", "hnsw:M=32,efSearch=64", "ivf:nlist=1024,nprobe=16" or
+    "ivfpq:nlist=1024,m=16,nbits=8,nprobe=16". Missing parameters take defaults.
+    """
+    kind, _, rest = (text or "flat").strip().partition(":")
+    kind = kind.strip().lower()
+    if kind not in DEFAULT_PARAMS:
+        raise ValueError(f"Unknown index type '{kind}' (expected one of {', '.join(DEFAULT_PARAMS)})")
+    params = dict(DEFAULT_PARAMS[kind])
+    for item in filter(None, (p.strip() for p in rest.split(","))):
+        key, sep, value = item.partition("=")
+        if not sep or key.strip() not in DEFAULT_PARAMS[kind]:
+            raise ValueError(f"Invalid parameter '{item}' for index type '{kind}'")
+        params[key.strip()] = int(value)
+    return IndexSpec(kind, params)
+
+
+def _largest_divisor_at_most(n: int, limit: int) -> int:
+    for d in range(max(1, min(n, limit)), 0, -1):
+        if n % d == 0:
+            return d
+    return 1
+
+
+def build_index(spec: IndexSpec, dim: int, n_train: int) -> faiss.Index:
+    """Create an empty L2 index for ``spec``, shrinking nlist/nbits to what ``n_train`` vectors can support."""
+    p = spec.params
+    if spec.kind == "flat":
+        return faiss.IndexFlatL2(dim)
+    if spec.kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, p["M"])
+        index.hnsw.efConstruction = p["efConstruction"]
+        index.hnsw.efSearch = p["efSearch"]
+        return index
+    nlist = max(1, min(p["nlist"], n_train // _POINTS_PER_CENTROID))
+    quantizer = faiss.IndexFlatL2(dim)
+    if spec.kind == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    else:
+        m = _largest_divisor_at_most(dim, p["m"])
+        nbits = max(1, min(p["nbits"], int(math.log2(max(2, n_train // _POINTS_PER_CENTROID)))))
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, nbits)
+    index.nprobe = min(p["nprobe"], nlist)
+    return index
+
+
+def train_index(index: faiss.Index, vectors: np.ndarray, train_size: int = 50000, seed: int = 0) -> None:
+    """Train ``index`` on a random sample of at most ``train_size`` vectors (no-op if already trained)."""
+    if index.is_trained:
+        return
+    if len(vectors) > train_size:
+        rng = np.random.default_rng(seed)
+        vectors = vectors[rng.choice(len(vectors), size=train_size, replace=False)]
+    index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+
+
+def describe_index(index: faiss.Index) -> IndexSpec:
+    """Recover the IndexSpec of a built or loaded index."""
+    if isinstance(index, faiss.IndexHNSW):
+        hnsw = index.hnsw
+        return IndexSpec("hnsw", {"M": hnsw.nb_neighbors(1), "efConstruction": hnsw.efConstruction, "efSearch": hnsw.efSearch})
+    if isinstance(index, faiss.IndexIVFPQ):
+        return IndexSpec("ivfpq", {"nlist": index.nlist, "nprobe": index.nprobe, "m": index.pq.M, "nbits": index.pq.nbits})
+    if isinstance(index, faiss.IndexIVF):
+        return IndexSpec("ivf", {"nlist": index.nlist, "nprobe": index.nprobe})
+    return IndexSpec("flat", {})
+
+
+def set_search_params(index: faiss.Index, efSearch: Optional[int] = None, nprobe: Optional[int] = None) -> None:
+    """Apply query-time knobs; parameters that do not apply to the index type are ignored."""
+    if efSearch is not None and isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = int(efSearch)
+    if nprobe is not None and isinstance(index, faiss.IndexIVF):
+        index.nprobe = max(1, min(int(nprobe), index.nlist))
@@ -1,13 +1,16 @@
 import os
 import base64
 from pathlib import Path
-from typing import List
 
 import streamlit as st
-from langchain_ollama import OllamaLLM
 from langchain_core.prompts import PromptTemplate
 
 from loader import load_index, get_or_create_pdf_index
+from ai.context_packer import context_token_lengths, pack_context
+from ai.ollama_clients import get_llm, warm_up
+from ai.query_cache import QueryEmbeddingCache
+from ai.relevance import DEFAULT_MIN_SCORE, select_relevant
+from ai.retriever import get_retriever
 
 
 def _inject_dark_mode(enabled: bool) -> None:
@@ -60,6 +63,8 @@ def _ensure_state() -> None:
     st.session_state.setdefault("retrieval_mode", "similarity")
     st.session_state.setdefault("max_tokens", 256)
     st.session_state.setdefault("max_context_chars", 4000)
+    st.session_state.setdefault("max_context_tokens", 1024)
+    st.session_state.setdefault("min_score", DEFAULT_MIN_SCORE)
     st.session_state.setdefault("last_sources", [])
     st.session_state.setdefault("_is_generating", False)
     st.session_state.setdefault("_pending_msg", None)
@@ -144,7 +149,25 @@ def _display_pdf(pdf_path: str, height: int = 600) -> None:
         st.caption(f"Unable to display PDF: {e}")
 
 
-def _answer(query: str, top_k: int, llm_model: str, base_url: str, show_ctx: bool, retrieval_mode: str, max_context_chars: int, max_tokens: int):
+@st.cache_resource
+def _query_cache() -> QueryEmbeddingCache:
+    # Survives reruns, which re-send the same question; shared across sessions
+    return QueryEmbeddingCache(max_entries=1024, ttl_seconds=3600)
+
+
+@st.cache_resource
+def _warm_up(llm_model: str, emb_model: str, base_url: str) -> dict:
+    # Once per server process (and model choice): load both models so the first question doesn't pay for it
+    return warm_up(llm_model, emb_model, base_url)
+
+
+@st.cache_resource
+def _context_lengths(tokenizer_name: str):
+    # Loading a Hugging Face tokenizer is slow; once per process
+    return context_token_lengths(tokenizer_name or None)
+
+
+def _answer(query: str, top_k: int, llm_model: str, base_url: str, show_ctx: bool, retrieval_mode: str, max_context_chars: int, max_tokens: int, max_context_tokens: int = 1024, min_score: float = DEFAULT_MIN_SCORE):
     db = st.session_state.get("db")
     if db is None:
         # If no index is loaded, answer using general knowledge
@@ -155,31 +178,26 @@ def _answer(query: str, top_k: int, llm_model: str, base_url: str, show_ctx: boo
         )
         prompt = PromptTemplate.from_template(template).format(question=query)
     else:
-        if retrieval_mode == "mmr":
-            retriever = db.as_retriever(search_type="mmr", search_kwargs={"k": top_k, "fetch_k": max(10, top_k * 5)})
-        else:
-            retriever = db.as_retriever(search_kwargs={"k": top_k})
-        ctx_docs = retriever.invoke(query)
+        query_vector = _query_cache().embed_query(db.embeddings, query)
+        scored = get_retriever(db, top_k, retrieval_mode).search(query_vector)
+        # Keep only chunks that clear the relevance bar; none means a short general-knowledge prompt
+        ctx_docs = select_relevant(scored, top_k, min_score)
         
-        # Trim context to a character budget to speed up generation
-        parts: List[str] = []
-        total = 0
-        for d in ctx_docs:
-            text = d.page_content or ""
-            remaining = max_context_chars - total
-            if remaining <= 0:
-                break
-            if len(text) > remaining:
-                text = text[:remaining]
-            if text:
-                parts.append(text)
-                total += len(text)
-        context = "\n\n".join(parts)
+        # Merge overlapping chunks, drop repeats and pack to a token budget: prefill time dominates on CPU
+        packed = pack_context(
+            ctx_docs,
+            max_tokens=max_context_tokens,
+            lengths=_context_lengths(os.environ.get("CONTEXT_TOKENIZER", "")),
+            max_chars=max_context_chars,
+        )
+        ctx_docs = packed.documents
+        st.caption(f"Context: {packed.tokens} tokens ({packed.tokens_saved} saved by merging and packing)")
+        context = packed.text
         # Sanitize to avoid surrogate/invalid unicode issues on Windows terminals or downstream libs
         context = context.encode("utf-8", errors="ignore").decode("utf-8", errors="ignore")
 
-        # Check if context is empty or very short (likely irrelevant)
-        if not context.strip() or len(context.strip()) < 50:
+        # Nothing relevant was retrieved
+        if not context.strip():
             # Use general knowledge template when no relevant context is found
             template = (
                 "You are a helpful assistant. Answer the question using your general knowledge.\n"
@@ -198,7 +216,7 @@ def _answer(query: str, top_k: int, llm_model: str, base_url: str, show_ctx: boo
             )
             prompt = PromptTemplate.from_template(template).format(question=query, context=context)
 
-    llm = OllamaLLM(model=llm_model, base_url=base_url, temperature=0.2, num_predict=max_tokens)
+    llm = get_llm(llm_model, base_url, num_predict=max_tokens, temperature=0.2)
 
     placeholder = st.empty()
     streamed = ""
@@ -238,6 +256,7 @@ def main() -> None:
         base_url = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
         # llm_model = os.environ.get("OLLAMA_LLM", "qwen2.5:0.5b-instruct")
         llm_model = os.environ.get("OLLAMA_LLM", "qwen2.5:3b-instruct")
+        _warm_up(llm_model, emb_model, base_url)
 
 
         # Display current index status
@@ -252,8 +271,14 @@ def main() -> None:
         st.session_state["top_k"] = st.slider("Top-k context", min_value=1, max_value=10, value=st.session_state["top_k"]) 
         st.session_state["retrieval_mode"] = st.radio("Retrieval", options=["similarity", "mmr"], index=(0 if st.session_state["retrieval_mode"] == "similarity" else 1))
         st.session_state["max_context_chars"] = st.number_input("Max context size (chars)", min_value=500, max_value=20000, value=st.session_state["max_context_chars"], step=500)
+        st.session_state["max_context_tokens"] = st.slider("Max context tokens", min_value=128, max_value=8192, value=st.session_state["max_context_tokens"], step=128)
+        st.session_state["min_score"] = st.slider("Min relevance", min_value=0.0, max_value=1.0, value=float(st.session_state["min_score"]), step=0.05)
         st.session_state["max_tokens"] = st.slider("Max answer tokens", min_value=32, max_value=2048, value=st.session_state["max_tokens"], step=32)
 
+        qc = _query_cache().stats()
+        if qc["hits"] or qc["misses"]:
+            st.caption(f"Query cache: {qc['hit_rate']:.0%} hits, {qc['saved_seconds']:.1f}s saved")
+
         cols = st.columns(1)
         with cols[0]:
             if st.button("Clear chat"):
@@ -285,6 +310,8 @@ def main() -> None:
                     st.session_state["retrieval_mode"],
                     int(st.session_state["max_context_chars"]),
                     int(st.session_state["max_tokens"]),
+                    int(st.session_state["max_context_tokens"]),
+                    float(st.session_state["min_score"]),
                 )
             st.session_state["messages"].append({"role": "assistant", "content": answer})
             st.session_state["last_sources"] = sources
@@ -343,7 +370,8 @@ def main() -> None:
                         selected, 
                         indices_base_dir,
                         emb_model=emb_model,
-                        base_url=base_url
+                        base_url=base_url,
+                        mmap=True,
                     )
                     st.session_state["current_pdf_index"] = selected
                     st.success(f"Index ready for {os.path.basename(selected)}")
@@ -0,0 +1,147 @@
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+BM25_FILENAME = "bm25.npz"
+K1 = 1.2
+B = 0.75
+
+# Latin/digit runs, keeping joined codes like "AB-1234" or "v2.1" together; Hangul runs; any other word
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*|[가-힣]+|[^\W_]+")
+_SEPARATORS = re.compile(r"[-_./:]")
+_HANGUL = re.compile(r"[가-힣]+")
+# A single code-like token (has a digit, or is an all-caps acronym) or a "quoted phrase"
+_EXACT = re.compile(r'^"[^"]+"$|^(?=\S*\d)[A-Za-z0-9]+(?:[-_./:][A-Za-z0-9]+)*$|^[A-Z]{2,}[0-9]*$')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lexical tokens for BM25. Codes keep their joined form plus their parts,
+    and Korean words become character bigrams, so "삼성전자는" still matches
+    "삼성전자" without a morphological analyzer.
+    """
+    tokens: List[str] = []
+    for word in _TOKEN.findall(unicodedata.normalize("NFKC", text).lower()):
+        if _HANGUL.fullmatch(word):
+            tokens.extend([word] if len(word) == 1 else [word[i:i + 2] for i in range(len(word) - 1)])
+            continue
+        tokens.append(word)
+        if _SEPARATORS.search(word):
+            tokens.extend(part for part in _SEPARATORS.split(word) if part)
+    return tokens
+
+
+def is_exact_match_query(query: str) -> bool:
+    """Queries that are a part number, acronym or "quoted phrase" are answered by BM25 alone."""
+    return bool(_EXACT.match(query.strip()))
+
+
+class BM25Index:
+    """
+    Compact inverted index over chunk text: a sorted vocabulary with CSR
+    postings (doc row, term frequency) in NumPy arrays, saved as one .npz
+    next to index.faiss. Rows map to docstore ids, like FAISS rows do.
+    """
+
+    def __init__(self, doc_ids: np.ndarray, doc_len: np.ndarray, terms: np.ndarray,
+                 offsets: np.ndarray, post_docs: np.ndarray, post_tf: np.ndarray):
+        self.doc_ids = doc_ids
+        self.doc_len = doc_len
+        self.terms = terms
+        self.offsets = offsets
+        self.post_docs = post_docs
+        self.post_tf = post_tf
+        self._vocab = {term: i for i, term in enumerate(terms.tolist())}
+        avgdl = float(doc_len.mean()) if len(doc_len) else 1.0
+        self._norm = (K1 * (1 - B + B * doc_len / max(avgdl, 1e-9))).astype(np.float32)
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[str, str]]) -> "BM25Index":
+        """Index (docstore id, text) pairs."""
+        doc_ids: List[str] = []
+        doc_len: List[int] = []
+        postings = {}
+        for row, (doc_id, text) in enumerate(docs):
+            counts = Counter(tokenize(text))
+            doc_ids.append(doc_id)
+            doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((row, tf))
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[t]) for t in terms])
+        flat = [p for t in terms for p in postings[t]]
+        post_docs = np.fromiter((row for row, _ in flat), dtype=np.int32, count=len(flat))
+        post_tf = np.fromiter((min(tf, 65535) for _, tf in flat), dtype=np.uint16, count=len(flat))
+        return cls(
+            np.array(doc_ids, dtype=str),
+            np.array(doc_len, dtype=np.int32),
+            np.array(terms, dtype=str),
+            offsets,
+            post_docs,
+            post_tf,
+        )
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def search(self, query: str, k: int = 10, rows: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """
+        Top ``k`` (docstore id, BM25 score) pairs; only documents sharing a
+        term with the query and, with ``rows``, only those rows (FAISS order).
+        """
+        n = len(self.doc_ids)
+        scores = np.zeros(n, dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            t = self._vocab.get(term)
+            if t is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            docs = self.post_docs[start:end]
+            tf = self.post_tf[start:end].astype(np.float32)
+            df = end - start
+            idf = np.log1p((n - df + 0.5) / (df + 0.5))
+            scores[docs] += idf * tf * (K1 + 1) / (tf + self._norm[docs])
+            matched = True
+        if not matched:
+            return []
+        hits = np.flatnonzero(scores) if rows is None else rows[scores[rows] > 0]
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(str(self.doc_ids[i]), float(scores[i])) for i in hits]
+
+    def save(self, path: Union[str, Path]) -> None:
+        # Write through a file object so numpy doesn't append another ".npz"
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                doc_ids=self.doc_ids,
+                doc_len=self.doc_len,
+                terms=self.terms,
+                offsets=self.offsets,
+                post_docs=self.post_docs,
+                post_tf=self.post_tf,
+            )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["doc_ids"], data["doc_len"], data["terms"], data["offsets"], data["post_docs"], data["post_tf"])
+
+
+def load_bm25(index_dir: Union[str, Path]) -> Optional[BM25Index]:
+    path = Path(index_dir) / BM25_FILENAME
+    if not path.exists():
+        return None
+    return BM25Index.load(path)
+
+
+def build_bm25(doc_ids: Sequence[str], documents: Iterable) -> BM25Index:
+    """BM25 index over ``documents`` (LangChain Documents) stored under ``doc_ids``."""
+    return BM25Index.build((doc_id, doc.page_content) for doc_id, doc in zip(doc_ids, documents))
@@ -1,63 +1,690 @@
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Sequence, Union, Optional
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, Union, Optional
 
-from langchain_community.document_loaders import PyPDFLoader
+import faiss
+import numpy as np
 from langchain_core.documents import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_ollama import OllamaEmbeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 
+# Make sibling modules importable as `ai.<module>` when this file is run as a script
+_PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
 
-def load_pdfs(paths: Sequence[Union[str, Path]]) -> List[Document]:
-    documents: List[Document] = []
+from ai.chunk_store import CHUNKS_FILENAME, SqliteDocstore, iter_documents, open_docstore, update_metadata, write_docstore
+from ai.dedup import DEFAULT_THRESHOLD as DEFAULT_DEDUP_THRESHOLD, ChunkDeduplicator, dedup_chunks
+from ai.embedding import BatchedEmbeddings
+from ai.embedding_cache import open_cache
+from ai.index_spec import SEARCH_PARAMS, IndexSpec, build_index, describe_index, parse_index_spec, set_search_params, train_index
+from ai.lexical import BM25_FILENAME, BM25Index, build_bm25, load_bm25
+from ai.manifest import (
+    diff_pages,
+    file_entry,
+    file_sha256,
+    ids_by_page,
+    load_manifest,
+    new_manifest,
+    save_manifest,
+)
+from ai.metadata_index import METADATA_INDEX_FILENAME, MetadataIndex, build_metadata_index, load_metadata_index
+from ai.ollama_clients import get_embeddings
+from ai.text_splitter import FastTextSplitter, tokenizer_lengths
+
+EMBED_CACHE_FILENAME = "embedding_cache.sqlite"
+INGEST_STATE_FILENAME = "ingest_state.json"
+# Chunk store of a streaming build before its first checkpoint
+BUILD_CHUNKS_FILENAME = ".build-" + CHUNKS_FILENAME
+INDEX_META_FILENAME = "index_meta.json"
+# Each save is written to its own "v-<n>" directory; CURRENT names the live one
+CURRENT_FILENAME = "CURRENT"
+_VERSION_PREFIX = "v-"
+# Superseded versions kept for handles still searching them
+KEEP_OLD_VERSIONS = 1
+# Files of an index saved before versioning, directly in its directory
+_INDEX_FILES = ("index.faiss", "index.pkl", CHUNKS_FILENAME, INDEX_META_FILENAME, BM25_FILENAME, METADATA_INDEX_FILENAME)
+# "sqlite": index.faiss + chunks.sqlite (lazy chunk reads); "pickle": LangChain's index.faiss + index.pkl
+DEFAULT_STORE = "sqlite"
+# progress(stage, done, total) with stage "pages" (parsed) or "chunks" (embedded); raising aborts the build
+ProgressCallback = Callable[[str, int, int], None]
+
+
+def _count_pdf_pages(path: Union[str, Path]) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(str(path)).pages)
+
+
+def _pdf_metadata(reader, path: str) -> dict:
+    """
+    File-level metadata shared by every page, with the same keys as LangChain's
+    PyPDFLoader: producer/creator/creationdate defaults overlaid with the PDF's
+    document info (lower-cased, dates as ISO strings), source and total_pages.
+    """
+    metadata = {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+    info = reader.metadata or {}
+    dates = {"/CreationDate": "creation_date", "/ModDate": "modification_date"}
+    for key in list(info):
+        name, value = str(key).lstrip("/").lower(), info[key]
+        if key in dates:
+            try:
+                value = getattr(info, dates[key]).isoformat()
+            except (AttributeError, ValueError):
+                pass
+        metadata[name] = value if isinstance(value, (str, int, float, bool)) else str(value)
+    metadata["source"] = path
+    metadata["total_pages"] = len(reader.pages)
+    return metadata
+
+
+def _load_pdf_range(path: str, start: int, stop: int) -> List[Document]:
+    # Runs in a worker process: parse only pages [start, stop) of one PDF
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    metadata = _pdf_metadata(reader, path)
+    labels = reader.page_labels
+    return [
+        _pdf_page_document(reader, page, metadata, labels[page]) for page in range(start, min(stop, len(reader.pages)))
+    ]
+
+
+def _pdf_page_document(reader, page: int, file_metadata: dict, label: str) -> Document:
+    # ``label`` comes from a list computed once per file: pypdf rebuilds reader.page_labels on every access
+    text = (reader.pages[page].extract_text() or "").strip()
+    metadata = {**file_metadata, "page": page, "page_label": label}
+    return Document(page_content=text, metadata=metadata)
+
+
+def iter_pdf_pages(
+    paths: Sequence[Union[str, Path]],
+    start: Tuple[int, int] = (0, 0),
+    reopen_every: int = 200,
+) -> Iterator[Tuple[int, Document]]:
+    """
+    Yield (file_index, page Document) one page at a time, beginning at
+    ``start`` = (file index, page). The reader is re-opened every
+    ``reopen_every`` pages so pypdf's object cache does not grow with the file.
+    """
+    from pypdf import PdfReader
+
+    first_file, first_page = start
+    for file_idx in range(first_file, len(paths)):
+        path = str(paths[file_idx])
+        page = first_page if file_idx == first_file else 0
+        reader = PdfReader(path)
+        metadata = _pdf_metadata(reader, path)
+        labels = reader.page_labels
+        while page < metadata["total_pages"]:
+            if page and page % reopen_every == 0:
+                reader = PdfReader(path)
+            yield file_idx, _pdf_page_document(reader, page, metadata, labels[page])
+            page += 1
+
+
+def _plan_pdf_tasks(paths: Sequence[Union[str, Path]], pages_per_task: int) -> List[Tuple[str, int, int]]:
+    """Split PDFs into (path, start_page, stop_page) tasks, in input order."""
+    tasks: List[Tuple[str, int, int]] = []
+    step = max(1, pages_per_task)
     for p in paths:
-        loader = PyPDFLoader(str(p))
-        documents.extend(loader.load())
+        total = _count_pdf_pages(p)
+        for start in range(0, total, step):
+            tasks.append((str(p), start, min(start + step, total)))
+    return tasks
+
+
+def load_pdfs(
+    paths: Sequence[Union[str, Path]],
+    workers: int = 1,
+    pages_per_task: int = 64,
+    progress: Optional[ProgressCallback] = None,
+) -> List[Document]:
+    """
+    Load PDF pages as Documents.
+
+    With ``workers`` > 1 (or <= 0 for one per CPU) files are parsed in a process
+    pool, and PDFs longer than ``pages_per_task`` are further split into page
+    ranges. Results are reassembled in input order (file, then page). Both
+    paths parse pages the same way, so the output does not depend on ``workers``.
+    ``progress`` is called with ("pages", parsed, total) as pages come in.
+    """
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        total = sum(_count_pdf_pages(p) for p in paths) if progress else 0
+        documents: List[Document] = []
+        for _, doc in iter_pdf_pages(paths):
+            documents.append(doc)
+            if progress:
+                progress("pages", len(documents), total)
+        return documents
+
+    tasks = _plan_pdf_tasks(paths, pages_per_task)
+    total = sum(stop - start for _, start, stop in tasks)
+    documents = []
+    with ProcessPoolExecutor(max_workers=min(workers, max(1, len(tasks)))) as pool:
+        futures = [pool.submit(_load_pdf_range, path, start, stop) for path, start, stop in tasks]
+        for fut in futures:
+            documents.extend(fut.result())
+            if progress:
+                progress("pages", len(documents), total)
     return documents
 
 
-def split_documents(documents: List[Document], chunk_size: int = 250, chunk_overlap: int = 50) -> List[Document]:
-    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+def split_documents(
+    documents: List[Document],
+    chunk_size: int = 250,
+    chunk_overlap: int = 50,
+    splitter: Optional[FastTextSplitter] = None,
+) -> List[Document]:
+    """Split ``documents`` into sanitized, non-empty chunks (``splitter`` overrides size/overlap)."""
+    if splitter is None:
+        splitter = FastTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
     return splitter.split_documents(documents)
 
 
-def _sanitize_text(text: str) -> str:
-    # Remove invalid surrogate code points and any undecodable bytes
-    return (text or "").encode("utf-8", errors="ignore").decode("utf-8", errors="ignore")
+def _batched_embeddings(
+    emb_model: str,
+    base_url: str,
+    batch_size: int,
+    max_in_flight: int,
+    cache=None,
+    progress: Optional[ProgressCallback] = None,
+) -> BatchedEmbeddings:
+    return BatchedEmbeddings(
+        get_embeddings(emb_model, base_url),
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+        cache=cache,
+        model=emb_model,
+        progress=(lambda done, total: progress("chunks", done, total)) if progress else None,
+    )
 
 
-def _sanitize_documents(documents: List[Document]) -> List[Document]:
-    cleaned: List[Document] = []
-    for d in documents:
-        txt = _sanitize_text(d.page_content)
-        if txt.strip():
-            cleaned.append(Document(page_content=txt, metadata=d.metadata))
-    return cleaned
+def _new_store(embeddings, spec: IndexSpec, vectors: np.ndarray, train_size: int, docstore=None) -> FAISS:
+    """Empty FAISS store with an index built for ``spec`` and, if needed, trained on ``vectors``."""
+    index = build_index(spec, vectors.shape[1], min(len(vectors), train_size))
+    train_index(index, vectors, train_size=train_size)
+    return FAISS(embeddings, index, docstore if docstore is not None else InMemoryDocstore(), {})
 
 
-def build_index_from_docs(documents: List[Document], emb_model: str = "nomic-embed-text", base_url: str = "http://localhost:11434") -> FAISS:
-    chunks = split_documents(documents)
-    chunks = _sanitize_documents(chunks)
-    embeddings = OllamaEmbeddings(model=emb_model, base_url=base_url)
-    return FAISS.from_documents(chunks, embeddings)
+def build_index_from_docs(
+    documents: List[Document],
+    emb_model: str = "nomic-embed-text",
+    base_url: str = "http://localhost:11434",
+    batch_size: int = 64,
+    max_in_flight: int = 4,
+    cache_path: Optional[Union[str, Path]] = None,
+    cache_max_mb: int = 1024,
+    index_spec: str = "flat",
+    train_size: int = 50000,
+    splitter: Optional[FastTextSplitter] = None,
+    dedup_threshold: float = DEFAULT_DEDUP_THRESHOLD,
+    progress: Optional[ProgressCallback] = None,
+    verbose: bool = False,
+) -> FAISS:
+    """
+    Split, sanitize and embed ``documents`` into a FAISS store.
+
+    ``index_spec`` selects the index type (see ``ai.index_spec.parse_index_spec``):
+    "flat" (exact), "hnsw:M=..,efSearch=..", "ivf:nlist=..,nprobe=.." or
+    "ivfpq:nlist=..,m=..,nbits=..,nprobe=..". IVF variants are trained on a random
+    sample of at most ``train_size`` vectors. ``splitter`` overrides the default
+    250/50-character chunking, e.g. with token-based sizing. Chunks at least
+    ``dedup_threshold`` similar to an earlier one (repeated headers, footers,
+    boilerplate) are dropped before embedding; 0 (the default) keeps every chunk.
+    ``progress`` receives ("chunks", embedded, total) updates.
+    """
+    spec = parse_index_spec(index_spec)
+    chunks, removed = dedup_chunks(split_documents(documents, splitter=splitter), dedup_threshold)
+    if verbose:
+        print(f"Removed {removed} near-duplicate chunks, {len(chunks)} left to embed")
+    cache = open_cache(cache_path, max_mb=cache_max_mb)
+    embeddings = _batched_embeddings(emb_model, base_url, batch_size, max_in_flight, cache, progress)
+    try:
+        if spec.kind == "flat":
+            db = FAISS.from_documents(chunks, embeddings)
+        else:
+            texts = [c.page_content for c in chunks]
+            vectors = embeddings.embed_documents(texts)
+            db = _new_store(embeddings, spec, np.array(vectors, dtype=np.float32), train_size)
+            db.add_embeddings(list(zip(texts, vectors)), metadatas=[c.metadata for c in chunks])
+    finally:
+        # The store keeps this client for queries; detach build-only hooks
+        embeddings.progress = None
+        if cache is not None:
+            embeddings.cache = None
+            cache.close()
+    if verbose:
+        print(embeddings.stats.summary())
+    return db
 
 
-def build_index_from_pdf_paths(paths: Sequence[Union[str, Path]], emb_model: str = "nomic-embed-text", base_url: str = "http://localhost:11434") -> FAISS:
-    documents = load_pdfs(paths)
-    return build_index_from_docs(documents, emb_model=emb_model, base_url=base_url)
+def build_index_from_pdf_paths(
+    paths: Sequence[Union[str, Path]],
+    emb_model: str = "nomic-embed-text",
+    base_url: str = "http://localhost:11434",
+    workers: int = 1,
+    pages_per_task: int = 64,
+    batch_size: int = 64,
+    max_in_flight: int = 4,
+    cache_path: Optional[Union[str, Path]] = None,
+    cache_max_mb: int = 1024,
+    index_spec: str = "flat",
+    train_size: int = 50000,
+    splitter: Optional[FastTextSplitter] = None,
+    dedup_threshold: float = DEFAULT_DEDUP_THRESHOLD,
+    verbose: bool = False,
+) -> FAISS:
+    documents = load_pdfs(paths, workers=workers, pages_per_task=pages_per_task)
+    return build_index_from_docs(
+        documents,
+        emb_model=emb_model,
+        base_url=base_url,
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+        cache_path=cache_path,
+        cache_max_mb=cache_max_mb,
+        index_spec=index_spec,
+        train_size=train_size,
+        splitter=splitter,
+        dedup_threshold=dedup_threshold,
+        verbose=verbose,
+    )
 
 
-def save_index(db: FAISS, out_dir: Union[str, Path]) -> Path:
+def build_lexical_index(db: FAISS) -> BM25Index:
+    """BM25 index over every chunk of ``db``, keyed by docstore id."""
+    ordered = [doc_id for _, doc_id in sorted(db.index_to_docstore_id.items())]
+    return build_bm25(ordered, iter_documents(db.docstore, ordered))
+
+
+def build_store_metadata_index(db: FAISS) -> MetadataIndex:
+    """Source and page side index over every chunk of ``db``, keyed by FAISS row."""
+    ordered = [doc_id for _, doc_id in sorted(db.index_to_docstore_id.items())]
+    return build_metadata_index(iter_documents(db.docstore, ordered))
+
+
+def current_index_dir(index_dir: Union[str, Path]) -> Path:
+    """
+    Directory holding the live files of a saved index: the version named in
+    ``CURRENT``, or ``index_dir`` itself for indices saved before versioning.
+    """
+    index_dir = Path(index_dir)
+    try:
+        name = (index_dir / CURRENT_FILENAME).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return index_dir
+    return index_dir / name
+
+
+def index_exists(index_dir: Union[str, Path]) -> bool:
+    return (current_index_dir(index_dir) / "index.faiss").exists()
+
+
+def saved_index_spec(index_dir: Union[str, Path]) -> Optional[str]:
+    """Index spec a saved index was built with, from its index_meta.json (None if unknown)."""
+    meta_file = current_index_dir(index_dir) / INDEX_META_FILENAME
+    if not meta_file.exists():
+        return None
+    with open(meta_file, "r", encoding="utf-8") as f:
+        return json.load(f).get("index_spec")
+
+
+def _write_current(out_path: Path, version: str, attempts: int = 5) -> None:
+    """Point CURRENT at ``version``; the only file save_index ever replaces."""
+    tmp = out_path / (CURRENT_FILENAME + ".tmp")
+    tmp.write_text(version, encoding="utf-8")
+    for attempt in range(attempts):
+        try:
+            os.replace(tmp, out_path / CURRENT_FILENAME)
+            return
+        except PermissionError:
+            # Windows: a reader has CURRENT open for the moment it takes to read it
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.05 * (attempt + 1))
+
+
+def _remove_old_versions(out_path: Path, current: str) -> None:
+    """
+    Delete versions older than the newest ``KEEP_OLD_VERSIONS`` non-current ones,
+    and the files of indices saved before versioning. Files still open or
+    mapped by a handle cannot be deleted on Windows; they are retried at the next save.
+    """
+    old = sorted(p for p in out_path.iterdir() if p.is_dir() and p.name.startswith(_VERSION_PREFIX) and p.name != current)
+    for path in old[:max(0, len(old) - KEEP_OLD_VERSIONS)]:
+        shutil.rmtree(path, ignore_errors=True)
+    for name in _INDEX_FILES:
+        try:
+            (out_path / name).unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+def save_index(db: FAISS, out_dir: Union[str, Path], store: str = DEFAULT_STORE, side_indexes: bool = True) -> Path:
+    """
+    Save ``db`` to ``out_dir`` as a new version. All files (index.faiss, the
+    docstore with its FAISS row -> id positions, side indexes) are written into
+    a fresh ``v-<n>`` subdirectory, and ``CURRENT`` is switched to it last, so a
+    crash or a concurrent reader only ever sees a complete, matching set. No file
+    an open handle reads or memory-maps is overwritten (Windows refuses that),
+    and the previous version is kept for handles still searching it.
+
+    A SQLite docstore is copied into the new version and ``db`` continues on
+    that copy. With ``side_indexes`` a BM25 index of the chunks (bm25.npz) and a
+    source/page metadata index (metadata_index.npz) are built alongside;
+    intermediate checkpoints pass False, and load_index builds them if missing.
+    """
     out_path = Path(out_dir)
     out_path.mkdir(parents=True, exist_ok=True)
-    db.save_local(str(out_path))
+    if store not in ("sqlite", "pickle"):
+        raise ValueError(f"Unknown index store: {store}")
+    # Write into a scratch dir and rename it into place so readers never see half-written files
+    tmp_path = Path(tempfile.mkdtemp(prefix=".tmp-", dir=str(out_path)))
+    try:
+        if store == "pickle":
+            db.save_local(str(tmp_path))
+        else:
+            faiss.write_index(db.index, str(tmp_path / "index.faiss"))
+            write_docstore(tmp_path / CHUNKS_FILENAME, db.docstore, db.index_to_docstore_id)
+        with open(tmp_path / INDEX_META_FILENAME, "w", encoding="utf-8") as f:
+            json.dump({"index_spec": str(describe_index(db.index))}, f)
+        db.lexical = None
+        db.metadata_index = None
+        if side_indexes:
+            db.lexical = build_lexical_index(db)
+            db.lexical.save(tmp_path / BM25_FILENAME)
+            db.metadata_index = build_store_metadata_index(db)
+            db.metadata_index.save(tmp_path / METADATA_INDEX_FILENAME)
+        stamp = time.time_ns()
+        while (out_path / f"{_VERSION_PREFIX}{stamp:020d}").exists():
+            stamp += 1
+        version_path = out_path / f"{_VERSION_PREFIX}{stamp:020d}"
+        os.rename(tmp_path, version_path)
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    _write_current(out_path, version_path.name)
+    if store == "sqlite" and isinstance(db.docstore, SqliteDocstore):
+        # Keep adding to the saved copy: the old file stays as it was for other handles and goes with its version
+        old_docstore, db.docstore = db.docstore, SqliteDocstore(version_path / CHUNKS_FILENAME)
+        old_docstore.close()
+    if not getattr(db, "mmapped", False):
+        db.index_file = version_path / "index.faiss"
+    db.index_dir = out_path
+    _remove_old_versions(out_path, version_path.name)
     return out_path
 
 
-def load_index(index_dir: Union[str, Path], emb_model: str = "nomic-embed-text", base_url: str = "http://localhost:11434") -> FAISS:
-    embeddings = OllamaEmbeddings(model=emb_model, base_url=base_url)
-    # allow_dangerous_deserialization is needed for pickle-based docstore
-    return FAISS.load_local(str(index_dir), embeddings, allow_dangerous_deserialization=True)
+def _save_side_index(side_index: Union[BM25Index, MetadataIndex], index_dir: Union[str, Path], filename: str) -> None:
+    tmp_file = Path(index_dir) / (filename + ".tmp")
+    try:
+        side_index.save(tmp_file)
+        os.replace(tmp_file, Path(index_dir) / filename)
+    except OSError as e:
+        print(f"Could not save {filename} for {index_dir}: {e}")
+
+
+def _read_faiss_index(index_file: Path, mmap: bool):
+    if mmap:
+        # Map the file read-only so processes share one copy through the OS page cache.
+        # Flat storage needs IO_FLAG_MMAP_IFC (faiss >= 1.9); IO_FLAG_MMAP covers IVF lists.
+        for flag in (getattr(faiss, "IO_FLAG_MMAP_IFC", None), faiss.IO_FLAG_MMAP):
+            if flag is None:
+                continue
+            try:
+                return faiss.read_index(str(index_file), flag | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                continue
+    return faiss.read_index(str(index_file))
+
+
+def load_index(
+    index_dir: Union[str, Path],
+    emb_model: str = "nomic-embed-text",
+    base_url: str = "http://localhost:11434",
+    mmap: bool = False,
+) -> FAISS:
+    """
+    Load a saved index. With ``mmap=True`` index.faiss is memory-mapped read-only
+    instead of copied into the process; such a store must not be added to or
+    deleted from (reload without ``mmap`` to modify it).
+    """
+    embeddings = get_embeddings(emb_model, base_url)
+    root_dir, index_dir = Path(index_dir), current_index_dir(index_dir)
+    index_file = index_dir / "index.faiss"
+    index = _read_faiss_index(index_file, mmap)
+    docstore = open_docstore(index_dir)
+    if docstore is not None:
+        # Only the vectors are read up front; chunk text is fetched per search hit
+        db = FAISS(embeddings, index, docstore, docstore.positions())
+    else:
+        # Pickle-based docstore (LangChain's save_local format); only load trusted files
+        with open(Path(index_dir) / "index.pkl", "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        db = FAISS(embeddings, index, docstore, index_to_docstore_id)
+    db.index_file = index_file
+    db.index_dir = root_dir
+    db.mmapped = mmap
+    db.lexical = load_bm25(index_dir)
+    if db.lexical is None:
+        # Indices saved before BM25 existed (or mid-build checkpoints): build it once and keep it
+        db.lexical = build_lexical_index(db)
+        _save_side_index(db.lexical, index_dir, BM25_FILENAME)
+    db.metadata_index = load_metadata_index(index_dir)
+    if db.metadata_index is None or len(db.metadata_index) != db.index.ntotal:
+        db.metadata_index = build_store_metadata_index(db)
+        _save_side_index(db.metadata_index, index_dir, METADATA_INDEX_FILENAME)
+    # Re-apply the query-time parameters recorded at build time
+    saved_spec = saved_index_spec(root_dir)
+    if saved_spec is not None:
+        spec = parse_index_spec(saved_spec)
+        set_search_params(db.index, **{k: v for k, v in spec.params.items() if k in SEARCH_PARAMS})
+    return db
+
+
+def _mapped_rss(path: Path) -> Optional[int]:
+    """Resident bytes of this process's mappings of ``path`` (Linux only)."""
+    try:
+        with open("/proc/self/smaps", "r") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    target = str(path.resolve())
+    total = 0
+    in_target = False
+    for line in lines:
+        head = line.split(None, 1)[0]
+        if "-" in head and not head.endswith(":"):
+            # Mapping header: "start-end perms offset dev inode [path]"
+            in_target = line.rstrip().endswith(target)
+        elif in_target and head == "Rss:":
+            total += int(line.split()[1]) * 1024
+    return total
+
+
+def index_memory_info(db: FAISS) -> dict:
+    """
+    Split an index's footprint into private heap bytes and bytes mapped from
+    index.faiss (shared through the page cache). ``mapped_resident_bytes`` is how
+    much of the mapping is currently paged in, or None where unavailable.
+    Sizes are estimated from index.faiss, which closely matches the in-memory size.
+    """
+    index_file = getattr(db, "index_file", None)
+    if index_file is not None and index_file.exists():
+        size = index_file.stat().st_size
+    else:
+        # Built in this process and not loaded from disk: raw float32 vectors
+        size = db.index.ntotal * db.index.d * 4
+    if getattr(db, "mmapped", False):
+        # Only vector storage is mapped; an HNSW graph is still read onto the heap
+        heap = max(0, size - db.index.ntotal * db.index.d * 4) if isinstance(db.index, faiss.IndexHNSW) else 0
+        return {
+            "mmap": True,
+            "heap_bytes": heap,
+            "mapped_bytes": size - heap,
+            "mapped_resident_bytes": _mapped_rss(index_file),
+        }
+    return {"mmap": False, "heap_bytes": size, "mapped_bytes": 0, "mapped_resident_bytes": 0}
+
+
+def _load_ingest_state(out_path: Path) -> Optional[dict]:
+    state_file = out_path / INGEST_STATE_FILENAME
+    if not state_file.exists():
+        return None
+    with open(state_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_ingest_state(out_path: Path, state: dict) -> None:
+    tmp = out_path / (INGEST_STATE_FILENAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, out_path / INGEST_STATE_FILENAME)
+
+
+def build_index_streaming(
+    paths: Sequence[Union[str, Path]],
+    out_dir: Union[str, Path],
+    emb_model: str = "nomic-embed-text",
+    base_url: str = "http://localhost:11434",
+    batch_size: int = 64,
+    max_in_flight: int = 4,
+    cache_path: Optional[Union[str, Path]] = None,
+    cache_max_mb: int = 1024,
+    checkpoint_pages: int = 100,
+    store: str = DEFAULT_STORE,
+    index_spec: str = "flat",
+    train_size: int = 50000,
+    splitter: Optional[FastTextSplitter] = None,
+    dedup_threshold: float = DEFAULT_DEDUP_THRESHOLD,
+    verbose: bool = False,
+) -> FAISS:
+    """
+    Build an index page by page: load page -> split -> sanitize -> embed batch -> add.
+
+    At most ``batch_size * max_in_flight`` chunks (plus one page) are held before
+    being embedded and added, so memory no longer scales with the input size.
+    Every ``checkpoint_pages`` pages the index and a resume position are saved to
+    ``out_dir``; re-running with the same paths continues from the last checkpoint.
+    With the SQLite store, chunk text goes straight to ``chunks.sqlite`` instead
+    of accumulating in memory. IVF index types first buffer ``train_size`` chunks
+    to train on, which raises the ceiling to that many chunks. Near-duplicate
+    chunks are removed across the whole build, as in ``build_index_from_docs``:
+    the deduplicator keeps a 1 KiB signature per kept chunk, and a chunk that
+    turns up again later updates the stored ``occurrences`` of the first copy.
+    """
+    spec = parse_index_spec(index_spec)
+    out_path = Path(out_dir)
+    out_path.mkdir(parents=True, exist_ok=True)
+    sources = [str(p) for p in paths]
+
+    db: Optional[FAISS] = None
+    position = (0, 0)
+    state = _load_ingest_state(out_path)
+    if (
+        state is not None
+        and state.get("paths") == sources
+        and state.get("emb_model") == emb_model
+        and index_exists(out_path)
+    ):
+        db = load_index(out_path, emb_model=emb_model, base_url=base_url)
+        position = (state["file"], state["page"])
+        # Drop vectors saved after the checkpoint's state was written
+        if db.index.ntotal > state["ntotal"]:
+            if describe_index(db.index).supports_truncate:
+                db.index.remove_ids(np.arange(state["ntotal"], db.index.ntotal, dtype=np.int64))
+                db.index_to_docstore_id = {i: d for i, d in db.index_to_docstore_id.items() if i < state["ntotal"]}
+            else:
+                # HNSW cannot drop the extra vectors; start over
+                if isinstance(db.docstore, SqliteDocstore):
+                    db.docstore.close()
+                db, position = None, (0, 0)
+        if db is not None and verbose:
+            print(f"Resuming at {sources[position[0]] if position[0] < len(sources) else 'end'} page {position[1]} ({state['ntotal']} chunks indexed)")
+
+    if db is None:
+        # Fresh build: chunks go to a scratch store until the first checkpoint copies them into a version
+        (out_path / BUILD_CHUNKS_FILENAME).unlink(missing_ok=True)
+
+    # Duplicates are found across flushes; kept_ids maps the deduplicator's positions to docstore ids
+    dedup = ChunkDeduplicator(dedup_threshold)
+    kept_ids: List[str] = []
+    if db is not None and dedup_threshold > 0:
+        # Resumed build: later chunks are compared with those indexed before the checkpoint too
+        ordered = [doc_id for _, doc_id in sorted(db.index_to_docstore_id.items())]
+        for doc_id, doc in zip(ordered, iter_documents(db.docstore, ordered)):
+            dedup.seed(doc)
+            kept_ids.append(doc_id)
+
+    cache = open_cache(cache_path, max_mb=cache_max_mb)
+    embeddings = _batched_embeddings(emb_model, base_url, batch_size, max_in_flight, cache)
+    window = max(1, batch_size * max_in_flight)
+    pending: List[Document] = []
+
+    def flush(final: bool = False) -> None:
+        nonlocal db
+        if not pending:
+            return
+        if db is None and spec.needs_training and len(pending) < train_size and not final:
+            # Keep buffering until there is a full training sample
+            return
+        chunks, touched = dedup.add(pending)
+        pending.clear()
+        if touched:
+            # Chunks already added turned up again: record the new pages on their stored copies
+            update_metadata(db.docstore, {kept_ids[p]: dedup.metadata(p) for p in touched})
+        if not chunks:
+            return
+        texts = [c.page_content for c in chunks]
+        vectors = embeddings.embed_documents(texts)
+        if db is None:
+            docstore = SqliteDocstore(out_path / BUILD_CHUNKS_FILENAME) if store == "sqlite" else None
+            db = _new_store(embeddings, spec, np.array(vectors, dtype=np.float32), train_size, docstore)
+        kept_ids.extend(db.add_embeddings(list(zip(texts, vectors)), metadatas=[c.metadata for c in chunks]))
+
+    try:
+        pages_since_checkpoint = 0
+        for file_idx, page in iter_pdf_pages(sources, start=position):
+            pending.extend(split_documents([page], splitter=splitter))
+            if len(pending) >= window:
+                flush()
+            pages_since_checkpoint += 1
+            if pages_since_checkpoint >= checkpoint_pages:
+                flush()
+                if db is not None:
+                    save_index(db, out_path, store=store, side_indexes=False)
+                    _save_ingest_state(out_path, {
+                        "paths": sources,
+                        "emb_model": emb_model,
+                        "file": file_idx,
+                        "page": page.metadata["page"] + 1,
+                        "ntotal": db.index.ntotal,
+                    })
+                pages_since_checkpoint = 0
+        flush(final=True)
+    finally:
+        if cache is not None:
+            embeddings.cache = None
+            cache.close()
+
+    if db is None:
+        raise ValueError("No text could be extracted from the given PDFs")
+    save_index(db, out_path, store=store)
+    (out_path / INGEST_STATE_FILENAME).unlink(missing_ok=True)
+    (out_path / BUILD_CHUNKS_FILENAME).unlink(missing_ok=True)
+    if verbose:
+        print(f"Removed {dedup.removed} near-duplicate chunks")
+        print(embeddings.stats.summary())
+    return db
 
 
 def get_pdf_index_name(pdf_path: Union[str, Path]) -> str:
@@ -76,6 +703,14 @@ def get_or_create_pdf_index(
     indices_dir: Union[str, Path],
     emb_model: str = "nomic-embed-text",
     base_url: str = "http://localhost:11434",
+    batch_size: int = 64,
+    max_in_flight: int = 4,
+    cache_path: Optional[Union[str, Path]] = None,
+    cache_max_mb: int = 1024,
+    index_spec: str = "flat",
+    dedup_threshold: float = DEFAULT_DEDUP_THRESHOLD,
+    mmap: bool = False,
+    progress: Optional[ProgressCallback] = None,
 ) -> FAISS:
     """
     Load existing index for a PDF or create a new one if it doesn't exist.
@@ -85,11 +720,22 @@ def get_or_create_pdf_index(
         indices_dir: Directory to store all indices
         emb_model: Ollama embedding model name
         base_url: Ollama base URL
+        batch_size: Chunks per embedding request when building
+        max_in_flight: Concurrent embedding requests when building
+        cache_path: Embedding cache file (default: indices_dir/embedding_cache.sqlite)
+        cache_max_mb: Size limit of the embedding cache before LRU eviction
+        index_spec: FAISS index type for new builds (e.g. "flat", "hnsw:M=32"); an existing
+            index that has to be rebuilt keeps the type it was saved with
+        dedup_threshold: Near-duplicate chunk threshold for new builds (0 disables); refreshes
+            and rebuilds use the one recorded in the index's manifest
+        mmap: Memory-map an up-to-date existing index instead of reading it into memory
+        progress: Called with ("pages" | "chunks", done, total) while building; raising aborts
     
     Returns:
         FAISS vector store for the PDF
     """
-    pdf_path = Path(pdf_path)
+    # One spelling per file: the index directory, manifest key and chunk source all use the absolute path
+    pdf_path = Path(pdf_path).absolute()
     indices_dir = Path(indices_dir)
     indices_dir.mkdir(parents=True, exist_ok=True)
     
@@ -97,25 +743,169 @@ def get_or_create_pdf_index(
     index_name = get_pdf_index_name(pdf_path)
     index_path = indices_dir / index_name
     
+    build_kwargs = dict(
+        emb_model=emb_model,
+        base_url=base_url,
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+        cache_path=cache_path or indices_dir / EMBED_CACHE_FILENAME,
+        cache_max_mb=cache_max_mb,
+        dedup_threshold=dedup_threshold,
+        progress=progress,
+    )
+
     # Check if index already exists
-    if index_path.exists() and (index_path / "index.faiss").exists():
-        # Load existing index
-        return load_index(index_path, emb_model=emb_model, base_url=base_url)
-    else:
-        # Create new index from PDF
-        db = build_index_from_pdf_paths([pdf_path], emb_model=emb_model, base_url=base_url)
-        save_index(db, index_path)
+    if index_exists(index_path):
+        # Rebuilds keep the index type (and its parameters) the existing index was built with
+        index_spec = saved_index_spec(index_path) or index_spec
+        # Load existing index and bring it up to date with the PDF on disk
+        manifest = load_manifest(index_path)
+        if manifest is not None:
+            build_kwargs["dedup_threshold"] = manifest.get("dedup_threshold", dedup_threshold)
+        # Without an entry for this file the index cannot be patched (it may hold another spelling's chunks)
+        entry = manifest["files"].get(str(pdf_path)) if manifest is not None else None
+        if entry is not None and manifest.get("emb_model") == emb_model:
+            if entry.get("sha256") == file_sha256(pdf_path):
+                return load_index(index_path, emb_model=emb_model, base_url=base_url, mmap=mmap)
+            # Changed PDF: patch the index in memory (only flat indices can drop vectors in place, so rebuild below)
+            db = load_index(index_path, emb_model=emb_model, base_url=base_url)
+            if describe_index(db.index).supports_remove:
+                return refresh_pdf_index(db, pdf_path, index_path, manifest, **build_kwargs)
+
+    # Create new index from PDF (also replaces indices built before manifests existed)
+    pages = load_pdfs([pdf_path], progress=progress)
+    db = build_index_from_docs(pages, index_spec=index_spec, **build_kwargs)
+    save_index(db, index_path)
+    manifest = new_manifest(emb_model)
+    manifest["dedup_threshold"] = build_kwargs["dedup_threshold"]
+    manifest["files"][str(pdf_path)] = file_entry(
+        file_sha256(pdf_path), pages, ids_by_page(db.index_to_docstore_id, db.docstore)
+    )
+    save_manifest(index_path, manifest)
+    return db
+
+
+def refresh_pdf_index(
+    db: FAISS,
+    pdf_path: Union[str, Path],
+    index_path: Union[str, Path],
+    manifest: dict,
+    emb_model: str = "nomic-embed-text",
+    base_url: str = "http://localhost:11434",
+    batch_size: int = 64,
+    max_in_flight: int = 4,
+    cache_path: Optional[Union[str, Path]] = None,
+    cache_max_mb: int = 1024,
+    dedup_threshold: float = DEFAULT_DEDUP_THRESHOLD,
+    progress: Optional[ProgressCallback] = None,
+) -> FAISS:
+    """
+    Re-embed only the pages of ``pdf_path`` whose chunks changed since the
+    manifest was written, deleting their old chunks from ``db`` and adding the
+    new ones. The whole document is deduplicated again (with the manifest's
+    threshold, else ``dedup_threshold``), because the first copy of a repeated
+    chunk may sit on a changed page: unchanged pages whose kept chunks or
+    ``occurrences`` differ as a result are refreshed too, so the index ends up
+    with the chunks a full rebuild would keep. The index is saved before the
+    manifest, so a crash in between only causes the same pages to be refreshed again.
+    Raises ValueError if the manifest has no entry for the file: rebuild instead.
+    """
+    pdf_path = Path(pdf_path).absolute()
+    source = str(pdf_path)
+    sha256 = file_sha256(pdf_path)
+    entry = manifest.get("files", {}).get(source)
+    if entry is None:
+        raise ValueError(f"Manifest of {index_path} has no entry for {source}; rebuild the index")
+    if entry.get("sha256") == sha256:
         return db
 
+    pages = load_pdfs([pdf_path], progress=progress)
+    changed, removed = diff_pages(entry, pages)
+    chunks, _ = dedup_chunks(split_documents(pages), manifest.setdefault("dedup_threshold", dedup_threshold))
+    chunks_by_page: Dict[int, List[Document]] = {}
+    for chunk in chunks:
+        chunks_by_page.setdefault(int(chunk.metadata.get("page", 0)), []).append(chunk)
+
+    live_ids = set(db.index_to_docstore_id.values())
+    dirty = set(changed) | set(removed)
+    for page, info in entry["pages"].items():
+        if int(page) in dirty:
+            continue
+        ids = [doc_id for doc_id in info.get("ids", []) if doc_id in live_ids]
+        stored = [(d.page_content, d.metadata.get("occurrences")) for d in iter_documents(db.docstore, ids)]
+        if stored != [(c.page_content, c.metadata.get("occurrences")) for c in chunks_by_page.get(int(page), [])]:
+            dirty.add(int(page))
+    stale_ids = [
+        doc_id
+        for page in sorted(dirty)
+        for doc_id in entry["pages"].get(str(page), {}).get("ids", [])
+        if doc_id in live_ids
+    ]
+    if stale_ids:
+        db.delete(stale_ids)
+
+    chunks = [c for page in sorted(dirty) for c in chunks_by_page.get(page, [])]
+    page_ids = {
+        (source, int(page)): info.get("ids", [])
+        for page, info in entry["pages"].items()
+        if int(page) not in dirty
+    }
+    if chunks:
+        cache = open_cache(cache_path, max_mb=cache_max_mb)
+        embeddings = _batched_embeddings(emb_model, base_url, batch_size, max_in_flight, cache, progress)
+        try:
+            vectors = embeddings.embed_documents([c.page_content for c in chunks])
+        finally:
+            if cache is not None:
+                cache.close()
+        new_ids = db.add_embeddings(
+            list(zip([c.page_content for c in chunks], vectors)),
+            metadatas=[c.metadata for c in chunks],
+        )
+        for chunk, doc_id in zip(chunks, new_ids):
+            page_ids.setdefault((source, int(chunk.metadata.get("page", 0))), []).append(doc_id)
+
+    save_index(db, index_path)
+    manifest.setdefault("files", {})[source] = file_entry(sha256, pages, page_ids)
+    save_manifest(index_path, manifest)
+    return db
+
 
 def build_and_save_index_from_pdf_paths(
     paths: Sequence[Union[str, Path]],
     out_dir: Union[str, Path],
     emb_model: str = "nomic-embed-text",
     base_url: str = "http://localhost:11434",
+    workers: int = 1,
+    pages_per_task: int = 64,
+    batch_size: int = 64,
+    max_in_flight: int = 4,
+    cache_path: Optional[Union[str, Path]] = None,
+    cache_max_mb: int = 1024,
+    index_spec: str = "flat",
+    train_size: int = 50000,
+    store: str = DEFAULT_STORE,
+    splitter: Optional[FastTextSplitter] = None,
+    dedup_threshold: float = DEFAULT_DEDUP_THRESHOLD,
+    verbose: bool = False,
 ) -> Path:
-    db = build_index_from_pdf_paths(paths, emb_model=emb_model, base_url=base_url)
-    return save_index(db, out_dir)
+    db = build_index_from_pdf_paths(
+        paths,
+        emb_model=emb_model,
+        base_url=base_url,
+        workers=workers,
+        pages_per_task=pages_per_task,
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+        cache_path=cache_path,
+        cache_max_mb=cache_max_mb,
+        index_spec=index_spec,
+        train_size=train_size,
+        splitter=splitter,
+        dedup_threshold=dedup_threshold,
+        verbose=verbose,
+    )
+    return save_index(db, out_dir, store=store)
 
 
 if __name__ == "__main__":
@@ -127,6 +917,21 @@ if __name__ == "__main__":
     parser.add_argument("--out", type=str, help="Output directory for FAISS index", default="faiss_index")
     parser.add_argument("--emb", type=str, help="Embedding model tag (Ollama)", default="nomic-embed-text")
     parser.add_argument("--base", type=str, help="Ollama base URL", default="http://localhost:11434")
+    parser.add_argument("--workers", type=int, help="PDF parsing processes (1 = serial, 0 = one per CPU)", default=1)
+    parser.add_argument("--pages-per-task", type=int, help="Split PDFs longer than this into page ranges when --workers > 1", default=64)
+    parser.add_argument("--batch-size", type=int, help="Chunks per embedding request", default=64)
+    parser.add_argument("--max-in-flight", type=int, help="Concurrent embedding requests to Ollama", default=4)
+    parser.add_argument("--cache", type=str, help="Embedding cache file (empty string disables)", default=EMBED_CACHE_FILENAME)
+    parser.add_argument("--cache-max-mb", type=int, help="Embedding cache size limit in MB (LRU eviction)", default=1024)
+    parser.add_argument("--stream", action="store_true", help="Ingest page by page with bounded memory and resumable checkpoints")
+    parser.add_argument("--checkpoint-pages", type=int, help="Pages between checkpoints in --stream mode", default=100)
+    parser.add_argument("--store", choices=["sqlite", "pickle"], help="Docstore format saved next to index.faiss", default=DEFAULT_STORE)
+    parser.add_argument("--index", type=str, help="Index type: flat, hnsw:M=32,efSearch=64, ivf:nlist=1024,nprobe=16 or ivfpq:nlist=1024,m=16,nbits=8,nprobe=16", default="flat")
+    parser.add_argument("--train-size", type=int, help="Max vectors sampled to train IVF indices", default=50000)
+    parser.add_argument("--chunk-size", type=int, help="Maximum chunk length (characters, or tokens with --tokenizer)", default=250)
+    parser.add_argument("--chunk-overlap", type=int, help="Overlap carried between consecutive chunks", default=50)
+    parser.add_argument("--dedup-threshold", type=float, help="Drop chunks at least this similar (MinHash Jaccard) to an earlier chunk, e.g. 0.9; 0 disables. Chunks differing only in a part number are ~0.95 similar", default=DEFAULT_DEDUP_THRESHOLD)
+    parser.add_argument("--tokenizer", type=str, help="Hugging Face tokenizer to size chunks in tokens instead of characters", default="")
 
     args = parser.parse_args()
 
@@ -141,5 +946,48 @@ if __name__ == "__main__":
     if not pdfs:
         raise SystemExit("No PDFs provided. Use --pdf path or --dir directory.")
 
-    out_path = build_and_save_index_from_pdf_paths(pdfs, args.out, emb_model=args.emb, base_url=args.base)
+    splitter = FastTextSplitter(
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        lengths=tokenizer_lengths(args.tokenizer) if args.tokenizer else None,
+    )
+
+    if args.stream:
+        build_index_streaming(
+            pdfs,
+            args.out,
+            emb_model=args.emb,
+            base_url=args.base,
+            batch_size=args.batch_size,
+            max_in_flight=args.max_in_flight,
+            cache_path=args.cache,
+            cache_max_mb=args.cache_max_mb,
+            checkpoint_pages=args.checkpoint_pages,
+            store=args.store,
+            index_spec=args.index,
+            train_size=args.train_size,
+            splitter=splitter,
+            dedup_threshold=args.dedup_threshold,
+            verbose=True,
+        )
+        out_path = Path(args.out)
+    else:
+        out_path = build_and_save_index_from_pdf_paths(
+            pdfs,
+            args.out,
+            emb_model=args.emb,
+            base_url=args.base,
+            workers=args.workers,
+            pages_per_task=args.pages_per_task,
+            batch_size=args.batch_size,
+            max_in_flight=args.max_in_flight,
+            cache_path=args.cache,
+            cache_max_mb=args.cache_max_mb,
+            store=args.store,
+            index_spec=args.index,
+            train_size=args.train_size,
+            splitter=splitter,
+            dedup_threshold=args.dedup_threshold,
+            verbose=True,
+        )
     print(f"Saved FAISS index to {out_path}")
\ No newline at end of file
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from langchain_core.documents import Document
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path: Union[str, Path]) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def page_sha256(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8", errors="ignore")).hexdigest()
+
+
+def load_manifest(index_dir: Union[str, Path]) -> Optional[Dict[str, Any]]:
+    path = Path(index_dir) / MANIFEST_FILENAME
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(index_dir: Union[str, Path], manifest: Dict[str, Any]) -> Path:
+    """Write the manifest via a temp file + rename so readers never see a partial file."""
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".manifest-", suffix=".json", dir=str(index_dir))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp, index_dir / MANIFEST_FILENAME)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return index_dir / MANIFEST_FILENAME
+
+
+def ids_by_page(index_to_docstore_id: Dict[int, str], docstore: Any) -> Dict[Tuple[str, int], List[str]]:
+    """Group docstore ids by the (source, page) metadata of their chunks."""
+    grouped: Dict[Tuple[str, int], List[str]] = {}
+    for _, doc_id in sorted(index_to_docstore_id.items()):
+        doc = docstore.search(doc_id)
+        if not isinstance(doc, Document):
+            continue
+        key = (str(doc.metadata.get("source", "")), int(doc.metadata.get("page", 0)))
+        grouped.setdefault(key, []).append(doc_id)
+    return grouped
+
+
+def file_entry(sha256: str, pages: Sequence[Document], page_ids: Dict[Tuple[str, int], List[str]]) -> Dict[str, Any]:
+    """Manifest entry for one source file: its content hash and per-page hash + chunk ids."""
+    entry: Dict[str, Any] = {"sha256": sha256, "pages": {}}
+    for doc in pages:
+        source = str(doc.metadata.get("source", ""))
+        page = int(doc.metadata.get("page", 0))
+        entry["pages"][str(page)] = {
+            "sha256": page_sha256(doc.page_content),
+            "ids": page_ids.get((source, page), []),
+        }
+    return entry
+
+
+def new_manifest(emb_model: str) -> Dict[str, Any]:
+    return {"version": MANIFEST_VERSION, "emb_model": emb_model, "files": {}}
+
+
+def diff_pages(entry: Dict[str, Any], pages: Sequence[Document]) -> Tuple[List[int], List[int]]:
+    """
+    Compare freshly loaded pages against a manifest file entry.
+
+    Returns (pages to (re)embed, pages that no longer exist).
+    """
+    old = entry.get("pages", {})
+    current = {int(d.metadata.get("page", 0)): page_sha256(d.page_content) for d in pages}
+    changed = [p for p, h in sorted(current.items()) if old.get(str(p), {}).get("sha256") != h]
+    removed = sorted(int(p) for p in old if int(p) not in current)
+    return changed, removed
@@ -0,0 +1,109 @@
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+METADATA_INDEX_FILENAME = "metadata_index.npz"
+# A page filter entry: one page, or an inclusive [first, last] range (numbered like the chunks' "page" metadata)
+PageFilter = Union[int, Sequence[int]]
+
+
+def page_range(entry: PageFilter) -> Tuple[int, int]:
+    """Inclusive (first, last) pages of a page filter entry; raises ValueError for anything else."""
+    if isinstance(entry, (int, np.integer)):
+        return int(entry), int(entry)
+    if isinstance(entry, (str, bytes)) or not isinstance(entry, Sequence) or len(entry) not in (1, 2):
+        raise ValueError(f"Page filter entries must be a page number or a [first, last] range, got {entry!r}")
+    if not all(isinstance(page, (int, np.integer)) for page in entry):
+        raise ValueError(f"Page range bounds must be page numbers, got {entry!r}")
+    return int(entry[0]), int(entry[-1])
+
+
+class MetadataIndex:
+    """
+    Side index from chunk metadata to FAISS rows, saved as one .npz next to
+    index.faiss: each source's rows as a sorted CSR slice, and each row's
+    page number (-1 when unknown). Chunks are added in page order, so a page
+    range of one source usually comes out as one contiguous row range.
+    """
+
+    def __init__(self, sources: np.ndarray, offsets: np.ndarray, rows: np.ndarray, pages: np.ndarray):
+        self.sources = sources
+        self.offsets = offsets
+        self.rows = rows
+        self.pages = pages
+        names = sources.tolist()
+        self._by_source = {name: i for i, name in enumerate(names)}
+        # File names too, so a filter can say "report.pdf" instead of the full path
+        self._by_name = {}
+        for i, name in enumerate(names):
+            self._by_name.setdefault(os.path.basename(name), []).append(i)
+
+    @classmethod
+    def build(cls, metadatas: Iterable[dict]) -> "MetadataIndex":
+        """Index chunk metadata given in FAISS row order."""
+        by_source = {}
+        pages: List[int] = []
+        for row, metadata in enumerate(metadatas):
+            by_source.setdefault(str(metadata.get("source", "")), []).append(row)
+            page = metadata.get("page")
+            pages.append(int(page) if isinstance(page, (int, np.integer)) or str(page).isdigit() else -1)
+        sources = sorted(by_source)
+        offsets = np.zeros(len(sources) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(by_source[s]) for s in sources])
+        rows = np.fromiter((row for s in sources for row in by_source[s]), dtype=np.int64, count=int(offsets[-1]))
+        return cls(np.array(sources, dtype=str), offsets, rows, np.array(pages, dtype=np.int32))
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def _source_ids(self, sources: Sequence[str]) -> List[int]:
+        ids = set()
+        for source in sources:
+            if source in self._by_source:
+                ids.add(self._by_source[source])
+            else:
+                ids.update(self._by_name.get(os.path.basename(source), []))
+        return sorted(ids)
+
+    def select(self, sources: Optional[Sequence[str]] = None, pages: Optional[Sequence[PageFilter]] = None) -> np.ndarray:
+        """
+        Sorted FAISS rows of chunks from any of ``sources`` (full path or file
+        name) on any of ``pages``; raises ValueError for a malformed page entry.
+        """
+        if sources:
+            parts = [self.rows[self.offsets[i]:self.offsets[i + 1]] for i in self._source_ids(sources)]
+            rows = np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+        else:
+            rows = np.arange(len(self.pages), dtype=np.int64)
+        if pages:
+            row_pages = self.pages[rows]
+            keep = np.zeros(len(rows), dtype=bool)
+            for entry in pages:
+                first, last = page_range(entry)
+                keep |= (row_pages >= first) & (row_pages <= last)
+            rows = rows[keep]
+        return rows
+
+    def save(self, path: Union[str, Path]) -> None:
+        # Write through a file object so numpy doesn't append another ".npz"
+        with open(path, "wb") as f:
+            np.savez(f, sources=self.sources, offsets=self.offsets, rows=self.rows, pages=self.pages)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "MetadataIndex":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["sources"], data["offsets"], data["rows"], data["pages"])
+
+
+def load_metadata_index(index_dir: Union[str, Path]) -> Optional[MetadataIndex]:
+    path = Path(index_dir) / METADATA_INDEX_FILENAME
+    if not path.exists():
+        return None
+    return MetadataIndex.load(path)
+
+
+def build_metadata_index(documents: Iterable) -> MetadataIndex:
+    """Metadata index over ``documents`` (LangChain Documents) in FAISS row order."""
+    return MetadataIndex.build(doc.metadata for doc in documents)
@@ -0,0 +1,143 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+import httpx
+from langchain_ollama import OllamaEmbeddings, OllamaLLM
+
+# How long Ollama keeps a model loaded after a request ("30m", "1h", seconds, or -1 for forever)
+_keep_alive: Union[int, str] = "30m"
+_max_connections = 16
+# LLM wrappers differ only in generation options; keep the most recently used ones
+_MAX_LLMS = 32
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+
+_lock = threading.Lock()
+_transports: Dict[str, Tuple[httpx.HTTPTransport, httpx.AsyncHTTPTransport]] = {}
+_embeddings: Dict[Tuple[str, str], OllamaEmbeddings] = {}
+_llms: "OrderedDict[Tuple[str, str, int, float], OllamaLLM]" = OrderedDict()
+
+
+def parse_keep_alive(value: Union[int, str, None]) -> Union[int, str]:
+    """Ollama wants a number of seconds or a duration string with a unit; "-1" must be sent as a number."""
+    if value is None or value == "":
+        return _keep_alive
+    if isinstance(value, str) and value.lstrip("-").isdigit():
+        return int(value)
+    return value
+
+
+def keep_alive_seconds(value: Union[int, str]) -> int:
+    """keep_alive as whole seconds ("1h30m" -> 5400); OllamaEmbeddings only accepts an int."""
+    if isinstance(value, int):
+        return value
+    parts = _DURATION_PART.findall(value)
+    if not parts or "".join(n + u for n, u in parts) != value.replace(" ", ""):
+        raise ValueError(f"Invalid keep_alive duration: {value!r}")
+    return int(sum(float(n) * _UNIT_SECONDS[u] for n, u in parts))
+
+
+def configure(keep_alive: Union[int, str, None] = None, max_connections: Optional[int] = None) -> None:
+    """Set keep_alive and the per-host connection limit; clients created earlier are dropped."""
+    global _keep_alive, _max_connections
+    with _lock:
+        _keep_alive = parse_keep_alive(keep_alive)
+        if max_connections:
+            _max_connections = max_connections
+        _transports.clear()
+        _embeddings.clear()
+        _llms.clear()
+
+
+def _transport_kwargs(base_url: str) -> Dict[str, Dict]:
+    # Caller holds _lock. One connection pool per host: every wrapper's httpx client for that host is
+    # built on the same sync/async transports, so they share keep-alive connections.
+    transports = _transports.get(base_url)
+    if transports is None:
+        limits = httpx.Limits(max_connections=_max_connections, max_keepalive_connections=_max_connections)
+        transports = (httpx.HTTPTransport(limits=limits), httpx.AsyncHTTPTransport(limits=limits))
+        _transports[base_url] = transports
+    return {"sync_client_kwargs": {"transport": transports[0]}, "async_client_kwargs": {"transport": transports[1]}}
+
+
+def get_embeddings(model: str, base_url: str) -> OllamaEmbeddings:
+    """Process-wide embeddings client for (model, host)."""
+    key = (model, base_url)
+    with _lock:
+        emb = _embeddings.get(key)
+        if emb is None:
+            emb = OllamaEmbeddings(
+                model=model,
+                base_url=base_url,
+                keep_alive=keep_alive_seconds(_keep_alive),
+                **_transport_kwargs(base_url),
+            )
+            _embeddings[key] = emb
+        return emb
+
+
+def get_llm(model: str, base_url: str, num_predict: int = 256, temperature: float = 0.2) -> OllamaLLM:
+    """Shared LLM client for the given generation options, on the host's pooled connections."""
+    key = (model, base_url, num_predict, temperature)
+    with _lock:
+        llm = _llms.get(key)
+        if llm is None:
+            llm = OllamaLLM(
+                model=model,
+                base_url=base_url,
+                temperature=temperature,
+                num_predict=num_predict,
+                keep_alive=_keep_alive,
+                **_transport_kwargs(base_url),
+            )
+            _llms[key] = llm
+            while len(_llms) > _MAX_LLMS:
+                _llms.popitem(last=False)
+        else:
+            _llms.move_to_end(key)
+        return llm
+
+
+def _first_token_ms(llm: OllamaLLM) -> float:
+    started = time.perf_counter()
+    stream = llm.stream("Hi")
+    try:
+        next(stream, None)
+    finally:
+        stream.close()
+    return (time.perf_counter() - started) * 1000
+
+
+def _embed_ms(emb: OllamaEmbeddings) -> float:
+    started = time.perf_counter()
+    emb.embed_query("warm-up")
+    return (time.perf_counter() - started) * 1000
+
+
+def warm_up(llm_model: Optional[str], emb_model: Optional[str], base_url: str) -> Dict[str, Dict[str, float]]:
+    """
+    Load the models into Ollama (kept for keep_alive) and time a request
+    twice: the first (cold) includes the model load, the second is warm.
+    Returns {model: {"cold_ms", "warm_ms"}}; failures are logged and skipped.
+    """
+    timings: Dict[str, Dict[str, float]] = {}
+    probes = []
+    if emb_model:
+        emb = get_embeddings(emb_model, base_url)
+        probes.append((emb_model, "embedding", lambda: _embed_ms(emb)))
+    if llm_model:
+        llm = get_llm(llm_model, base_url, num_predict=1)
+        probes.append((llm_model, "first token", lambda: _first_token_ms(llm)))
+    for model, what, probe in probes:
+        try:
+            cold = probe()
+            warm = probe()
+        except Exception as e:
+            print(f"Warm-up of {model} failed: {e}", flush=True)
+            continue
+        timings[model] = {"cold_ms": round(cold, 1), "warm_ms": round(warm, 1)}
+        print(f"Warm-up {model}: cold {what} {cold:.0f} ms, warm {warm:.0f} ms (keep_alive={_keep_alive})", flush=True)
+    return timings
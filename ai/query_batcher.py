@@ -0,0 +1,108 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Dict, List, Sequence, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+# Histogram bucket upper bounds; the last bucket is open-ended
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+WAIT_MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+
+def _bucket(value: float, bounds: Sequence[float]) -> str:
+    for bound in bounds:
+        if value <= bound:
+            return f"<={bound}"
+    return f">{bounds[-1]}"
+
+
+class QueryEmbeddingBatcher(Embeddings):
+    """
+    Coalesces concurrent ``embed_query`` calls into batched ``embed_documents`` calls.
+
+    A background thread takes the first waiting query, collects more for up
+    to ``window_ms`` after it arrived (or until ``max_batch``), embeds the
+    distinct texts in one request and hands each caller its vector. A lone
+    query waits at most ``window_ms``; queries that arrive while a batch is
+    in flight go out together in the next one without further waiting.
+    ``aembed_query`` awaits the same batches without blocking the event loop.
+    """
+
+    def __init__(self, embeddings: Embeddings, window_ms: float = 2.0, max_batch: int = 32):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", "")
+        self.window = max(0.0, window_ms) / 1000
+        self.max_batch = max(1, max_batch)
+        self.batches = 0
+        self.requests = 0
+        self.batch_sizes: Counter = Counter()
+        self.wait_ms: Counter = Counter()
+        self._stats_lock = threading.Lock()
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="query-embed-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        fut: Future = Future()
+        self._queue.put((text, fut, time.perf_counter()))
+        return fut
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def _collect(self) -> List[Tuple[str, Future, float]]:
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            dispatched = time.perf_counter()
+            texts = list(dict.fromkeys(text for text, _, _ in batch))
+            try:
+                vectors = dict(zip(texts, self.embeddings.embed_documents(texts)))
+            except Exception as e:
+                for _, fut, _ in batch:
+                    fut.set_exception(e)
+            else:
+                for text, fut, _ in batch:
+                    fut.set_result(vectors[text])
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.batch_sizes[_bucket(len(batch), BATCH_SIZE_BUCKETS)] += 1
+                for _, _, enqueued in batch:
+                    self.wait_ms[_bucket((dispatched - enqueued) * 1000, WAIT_MS_BUCKETS)] += 1
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "batch_size_histogram": {
+                    label: self.batch_sizes[label]
+                    for label in [f"<={b}" for b in BATCH_SIZE_BUCKETS] + [f">{BATCH_SIZE_BUCKETS[-1]}"]
+                },
+                "wait_ms_histogram": {
+                    label: self.wait_ms[label]
+                    for label in [f"<={b}" for b in WAIT_MS_BUCKETS] + [f">{WAIT_MS_BUCKETS[-1]}"]
+                },
+            }
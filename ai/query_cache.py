@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from ai.embedding_cache import normalize_text
+
+
+class QueryEmbeddingCache:
+    """
+    In-memory LRU of query embeddings keyed by (embedding model, normalized query).
+
+    Holds at most ``max_entries`` vectors; entries older than ``ttl_seconds``
+    are treated as misses and re-embedded. Each entry remembers how long its
+    embedding request took, so ``stats()`` can report the latency saved by hits.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        # key -> (vector, created_at, embed_seconds)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[List[float], float, float]]" = OrderedDict()
+
+    @staticmethod
+    def _key(model: str, query: str) -> Tuple[str, str]:
+        return model, normalize_text(query).casefold()
+
+    def get(self, model: str, query: str) -> Optional[List[float]]:
+        key = self._key(model, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[2]
+            return entry[0]
+
+    def put(self, model: str, query: str, vector: List[float], embed_seconds: float = 0.0) -> None:
+        key = self._key(model, query)
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic(), embed_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def embed_query(self, embeddings: Embeddings, query: str, model: Optional[str] = None) -> List[float]:
+        """``embeddings.embed_query(query)``, served from the cache when possible."""
+        if model is None:
+            model = str(getattr(embeddings, "model", ""))
+        vector = self.get(model, query)
+        if vector is None:
+            started = time.perf_counter()
+            vector = embeddings.embed_query(query)
+            self.put(model, query, vector, time.perf_counter() - started)
+        return vector
+
+    async def aembed_query(self, embeddings: Embeddings, query: str, model: Optional[str] = None) -> List[float]:
+        """Async ``embed_query`` through the cache, for callers on an event loop."""
+        if model is None:
+            model = str(getattr(embeddings, "model", ""))
+        vector = self.get(model, query)
+        if vector is None:
+            started = time.perf_counter()
+            vector = await embeddings.aembed_query(query)
+            self.put(model, query, vector, time.perf_counter() - started)
+        return vector
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
@@ -0,0 +1,38 @@
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+# Defaults tuned for nomic-embed-text: on-topic chunks usually score 0.55-0.8, off-topic ones below 0.45
+DEFAULT_MIN_SCORE = 0.45
+DEFAULT_MAX_DROP = 0.15
+
+
+def relevance_from_l2(distance: float) -> float:
+    """Cosine similarity from FAISS's squared L2 distance (Ollama's /api/embed returns unit vectors)."""
+    return max(-1.0, min(1.0, 1.0 - float(distance) / 2.0))
+
+
+def select_relevant(
+    scored: Sequence[Tuple[Document, float]],
+    k: int,
+    min_score: float = DEFAULT_MIN_SCORE,
+    max_drop: Optional[float] = DEFAULT_MAX_DROP,
+) -> List[Document]:
+    """
+    Adaptive top-k over (document, squared L2 distance) pairs: keep at most
+    ``k`` chunks whose relevance is at least ``min_score`` and no more than
+    ``max_drop`` below the best one, so a strong hit isn't padded with weak
+    ones. Kept chunks carry ``score`` (relevance) and ``distance`` in their
+    metadata. Returns [] when nothing clears the bar.
+    """
+    ranked = sorted(((relevance_from_l2(dist), float(dist), doc) for doc, dist in scored), key=lambda r: -r[0])
+    if not ranked:
+        return []
+    floor = min_score
+    if max_drop is not None:
+        floor = max(floor, ranked[0][0] - max_drop)
+    return [
+        Document(page_content=doc.page_content, metadata={**doc.metadata, "score": round(score, 4), "distance": dist})
+        for score, dist, doc in ranked[:k]
+        if score >= floor
+    ]
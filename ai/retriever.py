@@ -0,0 +1,205 @@
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from ai.chunk_store import iter_documents
+
+DEFAULT_LAMBDA_MULT = 0.5
+# A filter this narrow on a graph or IVF index is searched exactly over just its vectors:
+# cheaper than walking the graph past non-matching nodes, and exact
+EXACT_SEARCH_MAX_ROWS = 512
+
+
+def default_fetch_k(k: int) -> int:
+    """Candidates MMR chooses from."""
+    return max(10, k * 5)
+
+
+def mmr_select(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = DEFAULT_LAMBDA_MULT) -> List[int]:
+    """
+    Maximal marginal relevance over ``candidates`` (one vector per row) by
+    cosine similarity, like LangChain's but with NumPy doing the work: one
+    matrix-vector product per pick updates every candidate's redundancy.
+    Returns row positions in pick order.
+    """
+    n = len(candidates)
+    if n == 0 or k <= 0:
+        return []
+    norms = np.linalg.norm(candidates, axis=1)
+    unit = candidates / np.where(norms == 0, 1.0, norms)[:, None]
+    q_norm = float(np.linalg.norm(query))
+    relevance = unit @ (query / (q_norm or 1.0))
+    redundancy = np.full(n, -np.inf, dtype=np.float32)
+    picked = np.zeros(n, dtype=bool)
+    selected = [int(np.argmax(relevance))]
+    picked[selected[0]] = True
+    while len(selected) < min(k, n):
+        np.maximum(redundancy, unit @ unit[selected[-1]], out=redundancy)
+        score = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        score[picked] = -np.inf
+        best = int(np.argmax(score))
+        selected.append(best)
+        picked[best] = True
+    return selected
+
+
+def id_selector(rows: np.ndarray) -> faiss.IDSelector:
+    """Selector for sorted FAISS ``rows``: a range when they are contiguous, else a hashed set."""
+    if len(rows) and int(rows[-1]) - int(rows[0]) + 1 == len(rows):
+        return faiss.IDSelectorRange(int(rows[0]), int(rows[-1]) + 1)
+    return faiss.IDSelectorBatch(np.ascontiguousarray(rows, dtype=np.int64))
+
+
+def search_parameters(
+    index: faiss.Index,
+    selector: Optional[faiss.IDSelector] = None,
+    efSearch: Optional[int] = None,
+    nprobe: Optional[int] = None,
+) -> Optional[faiss.SearchParameters]:
+    """
+    Parameters for one search call: restrict ``index`` to ``selector`` and
+    override its efSearch/nprobe without touching the shared index (unset
+    values keep the index's own). None when a plain search does the same.
+    """
+    kwargs = {"sel": selector} if selector is not None else {}
+    if isinstance(index, faiss.IndexHNSW):
+        if selector is None and efSearch is None:
+            return None
+        return faiss.SearchParametersHNSW(efSearch=int(efSearch or index.hnsw.efSearch), **kwargs)
+    if isinstance(index, faiss.IndexIVF):
+        if selector is None and nprobe is None:
+            return None
+        return faiss.SearchParametersIVF(nprobe=max(1, min(int(nprobe or index.nprobe), index.nlist)), **kwargs)
+    return faiss.SearchParameters(**kwargs) if selector is not None else None
+
+
+class NativeRetriever:
+    """
+    Vector search straight on a loaded FAISS store for one settings tuple
+    (mode, k, fetch_k, lambda_mult). Hits come from ``index.search`` (MMR
+    candidates from ``index.search_and_reconstruct``, so their vectors arrive
+    in the same call) and their chunks from the docstore in one batch.
+    Searches restricted to a set of rows (see ``MetadataIndex.select``) pass
+    a FAISS ID selector, so filtering happens inside the search, and
+    efSearch/nprobe are passed per call rather than set on the index, which
+    concurrent requests share. Returns the
+    same (Document, squared L2 distance) pairs as LangChain's
+    ``*_with_score_by_vector`` methods. Get instances from :func:`get_retriever`.
+    """
+
+    def __init__(
+        self,
+        db: FAISS,
+        k: int = 4,
+        mode: str = "similarity",
+        fetch_k: Optional[int] = None,
+        lambda_mult: float = DEFAULT_LAMBDA_MULT,
+    ):
+        if mode not in ("similarity", "mmr"):
+            raise ValueError(f"Unknown retrieval mode for vector search: {mode}")
+        self.db = db
+        self.k = k
+        self.mode = mode
+        self.fetch_k = max(k, fetch_k or default_fetch_k(k)) if mode == "mmr" else k
+        self.lambda_mult = lambda_mult
+
+    def _exact(self, query: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        vectors = self.db.index.reconstruct_batch(rows)
+        distances = ((vectors - query) ** 2).sum(axis=1)
+        order = np.argsort(distances, kind="stable")[:self.fetch_k]
+        return distances[order], rows[order], vectors[order] if self.mode == "mmr" else None
+
+    def _candidates(
+        self, query: np.ndarray, params: Optional[faiss.SearchParameters] = None
+    ) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        index = self.db.index
+        if self.mode != "mmr":
+            distances, rows = index.search(query, self.fetch_k, params=params)
+            return distances[0], rows[0], None
+        try:
+            distances, rows, vectors = index.search_and_reconstruct(query, self.fetch_k, params=params)
+            vectors = vectors[0]
+        except RuntimeError:
+            # Index types without search_and_reconstruct: reconstruct the hits in one batch
+            distances, rows = index.search(query, self.fetch_k, params=params)
+            found = rows[0][rows[0] != -1]
+            vectors = np.zeros((len(rows[0]), index.d), dtype=np.float32)
+            vectors[rows[0] != -1] = index.reconstruct_batch(found)
+        return distances[0], rows[0], vectors
+
+    def search_rows(
+        self,
+        query: Sequence[float],
+        rows: Optional[np.ndarray] = None,
+        efSearch: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (squared L2 distances, FAISS rows) of the top hits, best first; with
+        ``rows`` (sorted FAISS rows) only among those chunks. ``efSearch`` and
+        ``nprobe`` apply to this search only (ignored by other index types).
+        """
+        q = np.asarray([query], dtype=np.float32)
+        if rows is None:
+            distances, rows, vectors = self._candidates(q, search_parameters(self.db.index, None, efSearch, nprobe))
+        elif not len(rows):
+            return np.zeros(0, dtype=np.float32), rows
+        else:
+            found = None
+            if len(rows) <= EXACT_SEARCH_MAX_ROWS and not isinstance(self.db.index, faiss.IndexFlat):
+                try:
+                    found = self._exact(q[0], rows)
+                except RuntimeError:
+                    # Not reconstructable (IVF without a direct map): filter inside the search instead
+                    pass
+            if found is None:
+                # SearchParameters doesn't own its selector; keep it referenced until the search returns
+                selector = id_selector(rows)
+                found = self._candidates(q, search_parameters(self.db.index, selector, efSearch, nprobe))
+            distances, rows, vectors = found
+        valid = rows != -1
+        distances, rows = distances[valid], rows[valid]
+        if vectors is not None:
+            order = mmr_select(q[0], vectors[valid], self.k, self.lambda_mult)
+            distances, rows = distances[order], rows[order]
+        return distances, rows
+
+    def search(
+        self,
+        query: Sequence[float],
+        rows: Optional[np.ndarray] = None,
+        efSearch: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[Tuple[Document, float]]:
+        """Top hits as (document, squared L2 distance), best first; see :meth:`search_rows`."""
+        distances, rows = self.search_rows(query, rows, efSearch, nprobe)
+        ids = [self.db.index_to_docstore_id[int(row)] for row in rows]
+        docs = iter_documents(self.db.docstore, ids)
+        return [(doc, float(dist)) for doc, dist in zip(docs, distances)]
+
+
+_retrievers_lock = threading.Lock()
+
+
+def get_retriever(
+    db: FAISS,
+    k: int = 4,
+    mode: str = "similarity",
+    fetch_k: Optional[int] = None,
+    lambda_mult: float = DEFAULT_LAMBDA_MULT,
+) -> NativeRetriever:
+    """The retriever for ``db`` and these settings, created on first use and dropped with the store."""
+    key = (k, mode, fetch_k, lambda_mult)
+    with _retrievers_lock:
+        # Kept on the store itself: a registry keyed by the store would be kept alive by its retrievers
+        per_db = getattr(db, "native_retrievers", None)
+        if per_db is None:
+            per_db = db.native_retrievers = {}
+        retriever = per_db.get(key)
+        if retriever is None:
+            retriever = per_db[key] = NativeRetriever(db, k, mode, fetch_k, lambda_mult)
+        return retriever
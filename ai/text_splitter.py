@@ -0,0 +1,139 @@
+from typing import Callable, List, Optional, Sequence
+
+from langchain_core.documents import Document
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+# Maps a batch of strings to their lengths (characters or tokens)
+LengthsFunction = Callable[[Sequence[str]], List[int]]
+
+
+def sanitize_text(text: str) -> str:
+    # Remove invalid surrogate code points and any undecodable bytes
+    return (text or "").encode("utf-8", errors="ignore").decode("utf-8", errors="ignore")
+
+
+def char_lengths(pieces: Sequence[str]) -> List[int]:
+    return list(map(len, pieces))
+
+
+def tokenizer_lengths(tokenizer_name: str) -> LengthsFunction:
+    """
+    Lengths in tokens of a Hugging Face tokenizer (e.g. one matching the chat
+    model, so a 250-token chunk means the same for Korean and English text).
+    Each call encodes the whole batch of pieces at once.
+    """
+    try:
+        from transformers import AutoTokenizer
+    except ImportError as e:
+        raise ImportError("Token-based chunk sizing requires the 'transformers' package") from e
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+
+    def lengths(pieces: Sequence[str]) -> List[int]:
+        if not pieces:
+            return []
+        encoded = tokenizer(list(pieces), add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    return lengths
+
+
+def _split_keep_separator(text: str, separator: str) -> List[str]:
+    # Same pieces as re.split with the separator kept at the start of each following piece
+    if not separator:
+        return list(text)
+    first, *rest = text.split(separator)
+    pieces = [first] + [separator + p for p in rest]
+    return [p for p in pieces if p]
+
+
+class FastTextSplitter:
+    """
+    Drop-in replacement for ``RecursiveCharacterTextSplitter`` (default
+    separators, separators kept, whitespace stripped) producing the same chunks.
+
+    Separators are found with plain substring scans instead of regexes, piece
+    lengths are measured once per recursion level in a single batch, and the
+    overlap window is a moving start offset rather than a list that is copied
+    on every pop. ``lengths`` switches sizing from characters to e.g.
+    tokenizer tokens (see :func:`tokenizer_lengths`).
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 250,
+        chunk_overlap: int = 50,
+        separators: Optional[List[str]] = None,
+        lengths: Optional[LengthsFunction] = None,
+    ):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must not exceed chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = list(separators) if separators is not None else list(DEFAULT_SEPARATORS)
+        self.lengths = lengths or char_lengths
+
+    def split_text(self, text: str) -> List[str]:
+        return self._split(text, self.separators)
+
+    def _split(self, text: str, separators: List[str]) -> List[str]:
+        separator = separators[-1]
+        remaining: List[str] = []
+        for i, sep in enumerate(separators):
+            if sep == "":
+                separator = sep
+                break
+            if sep in text:
+                separator = sep
+                remaining = separators[i + 1:]
+                break
+
+        pieces = _split_keep_separator(text, separator)
+        lengths = self.lengths(pieces)
+        chunks: List[str] = []
+        good: List[str] = []
+        good_lengths: List[int] = []
+        for piece, n in zip(pieces, lengths):
+            if n < self.chunk_size:
+                good.append(piece)
+                good_lengths.append(n)
+                continue
+            if good:
+                chunks.extend(self._merge(good, good_lengths))
+                good, good_lengths = [], []
+            if remaining:
+                chunks.extend(self._split(piece, remaining))
+            else:
+                chunks.append(piece)
+        if good:
+            chunks.extend(self._merge(good, good_lengths))
+        return chunks
+
+    def _merge(self, pieces: List[str], lengths: List[int]) -> List[str]:
+        """Pack consecutive pieces into chunks of at most chunk_size, carrying up to chunk_overlap into the next."""
+        size, overlap = self.chunk_size, self.chunk_overlap
+        chunks: List[str] = []
+        start = 0
+        total = 0
+        for end, n in enumerate(lengths):
+            if total + n > size and end > start:
+                chunk = "".join(pieces[start:end]).strip()
+                if chunk:
+                    chunks.append(chunk)
+                while total > overlap or (total + n > size and total > 0):
+                    total -= lengths[start]
+                    start += 1
+            total += n
+        chunk = "".join(pieces[start:]).strip()
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def split_documents(self, documents: Sequence[Document]) -> List[Document]:
+        """Sanitize each document's text, split it and drop empty chunks in one pass."""
+        chunks: List[Document] = []
+        for doc in documents:
+            for text in self.split_text(sanitize_text(doc.page_content)):
+                if text.strip():
+                    chunks.append(Document(page_content=text, metadata=dict(doc.metadata)))
+        return chunks
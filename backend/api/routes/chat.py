@@ -1,37 +1,119 @@
 from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Optional, Tuple
 import asyncio
+import threading
 
 from core.config import settings
-from core.database import get_db, get_current_pdf_path
-from services.chat_service import ChatService
+from core.database import get_current_handle
+from services.admission import Saturated, get_admission
+from services.chat_service import ChatService, format_sse
+from services.job_service import IndexNotReady, resolve_index
 from models.chat import ChatRequest, ChatResponse, Source
 
 router = APIRouter()
 
+def _resolve_db(request: ChatRequest) -> Tuple[Optional[Any], Optional[str]]:
+    """Search the requested document, or the process-wide current one"""
+    if request.pdf_path:
+        return resolve_index(request.pdf_path), request.pdf_path
+    current = get_current_handle()
+    if current is None:
+        return None, None
+    return current.db, current.pdf_path
+
+def _busy(e: Saturated) -> HTTPException:
+    return HTTPException(status_code=429, detail=e.to_dict(), headers={"Retry-After": str(e.retry_after)})
+
 @router.post("/chat", response_model=ChatResponse)
 async def send_message(request: ChatRequest):
     """Send a message to the AI chatbot"""
     try:
-        # Get current database
-        db = get_db()
-        current_pdf = get_current_pdf_path()
+        # Loading a shard touches the disk, so resolve off the event loop
+        db, current_pdf = await asyncio.to_thread(_resolve_db, request)
         
         # Initialize chat service
         chat_service = ChatService()
+        chat_settings = request.settings.model_dump()
         
-        # Process the message
-        response = await chat_service.process_message(
-            message=request.message,
-            db=db,
-            settings=request.settings,
-            current_pdf=current_pdf
-        )
+        # Retrieve first: answer-cache hits are served without waiting for an LLM slot
+        prepared = await chat_service.prepare_async(request.message, db, chat_settings)
+        if prepared.cached is not None:
+            return await chat_service.process_message(request.message, db, chat_settings, current_pdf, prepared)
+        
+        # Wait for an LLM slot (or fail fast with 429), then generate the answer
+        async with get_admission().slot_async():
+            response = await chat_service.process_message(
+                message=request.message,
+                db=db,
+                settings=chat_settings,
+                current_pdf=current_pdf,
+                prepared=prepared
+            )
         
         return response
         
+    except Saturated as e:
+        raise _busy(e)
+    except IndexNotReady as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "job_id": e.job.id})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to process message: {str(e)}")
+
+@router.post("/chat/stream")
+async def stream_message(request: ChatRequest):
+    """Send a message and stream the answer as Server-Sent Events (sources, tokens, stats)"""
+    chat_service = ChatService()
+    chat_settings = request.settings.model_dump()
+    try:
+        db, current_pdf = await asyncio.to_thread(_resolve_db, request)
+        prepared = await chat_service.prepare_async(request.message, db, chat_settings)
+        # Answer-cache hits are replayed without an LLM slot
+        release = await get_admission().acquire_async() if prepared.cached is None else None
+    except Saturated as e:
+        raise _busy(e)
+    except IndexNotReady as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "job_id": e.job.id})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process message: {str(e)}")
+    
+    cancel = threading.Event()
+    events = chat_service.stream_message(
+        message=request.message,
+        db=db,
+        settings=chat_settings,
+        current_pdf=current_pdf,
+        cancel=cancel,
+        prepared=prepared
+    )
+    
+    async def release_slot():
+        # A coroutine, so Starlette runs it on the event loop: asyncio.Semaphore is not thread-safe
+        if release is not None:
+            release()
+    
+    async def body():
+        try:
+            # Retrieval and generation block, so each step runs in the threadpool
+            while True:
+                item = await run_in_threadpool(next, events, None)
+                if item is None:
+                    break
+                yield format_sse(*item)
+        finally:
+            # Client went away (the response task is cancelled) or the stream ended
+            cancel.set()
+            await release_slot()
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also frees the slot if the body never started; release is idempotent
+        background=BackgroundTask(release_slot)
+    )
 
 @router.get("/chat/history")
 async def get_chat_history():
@@ -3,6 +3,11 @@ from datetime import datetime
 import psutil
 import os
 
+from core.database import get_db, get_index_registry
+from services.index_service import IndexService
+from services.admission import get_admission
+from services.chat_service import get_answer_cache, get_query_batcher_stats, get_query_cache
+
 router = APIRouter()
 
 @router.get("/health")
@@ -16,5 +21,11 @@ async def health_check():
             "cpu_percent": psutil.cpu_percent(),
             "memory_percent": psutil.virtual_memory().percent,
             "disk_percent": psutil.disk_usage('/').percent
-        }
+        },
+        "memory": IndexService().get_memory_info(get_db()),
+        "index_cache": get_index_registry().stats(),
+        "query_cache": get_query_cache().stats(),
+        "query_batcher": get_query_batcher_stats(),
+        "answer_cache": get_answer_cache().stats(),
+        "chat_admission": get_admission().stats()
     }
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, HTTPException
+
+from services.job_service import get_job_manager
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Progress of a background index build"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a background index build"""
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File
+from fastapi.responses import FileResponse, JSONResponse
 from typing import List
 import os
 import glob
@@ -7,9 +7,9 @@ from pathlib import Path
 from datetime import datetime
 
 from core.config import settings
-from core.database import get_db, set_db, get_current_pdf_path
+from core.database import get_db, get_current_pdf_path
 from services.pdf_service import PDFService
-from services.index_service import IndexService
+from services.job_service import load_pdf_in_background
 from models.pdf import PDFDocument, LoadPDFRequest
 
 router = APIRouter()
@@ -39,24 +39,63 @@ async def load_pdf(request: LoadPDFRequest, background_tasks: BackgroundTasks):
         if current_pdf == pdf_path:
             return {"success": True, "message": "PDF already loaded", "pdf_path": pdf_path}
         
-        # Load or create index
-        index_service = IndexService()
-        db = await index_service.get_or_create_pdf_index(pdf_path)
+        # Build/load the index in the background; it becomes current when the job finishes
+        job = load_pdf_in_background(pdf_path)
         
-        # Set as current database
-        set_db(db, pdf_path)
-        
-        return {
+        return JSONResponse(status_code=202, content={
             "success": True, 
-            "message": f"Successfully loaded {os.path.basename(pdf_path)}",
-            "pdf_path": pdf_path
-        }
+            "message": f"Loading {os.path.basename(pdf_path)}",
+            "pdf_path": pdf_path,
+            "job_id": job.id,
+            "job": job.to_dict()
+        })
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load PDF: {str(e)}")
 
+@router.post("/upload-pdf")
+async def upload_pdf(file: UploadFile = File(...)):
+    """Upload a PDF, save it to pdf_directory and build its FAISS index in the background"""
+    try:
+        filename = file.filename or ""
+        if not filename:
+            raise HTTPException(status_code=400, detail="No selected file")
+        # Basic validation
+        if not filename.lower().endswith('.pdf'):
+            raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+        
+        dest_dir = Path(settings.pdf_directory)
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        dest_path = dest_dir / Path(filename).name
+        # If a file with same name exists, append a counter
+        counter = 1
+        base_name = dest_path.stem
+        suffix = dest_path.suffix
+        while dest_path.exists():
+            dest_path = dest_dir / f"{base_name}_{counter}{suffix}"
+            counter += 1
+        
+        with open(dest_path, "wb") as out:
+            while chunk := await file.read(1024 * 1024):
+                out.write(chunk)
+        
+        job = load_pdf_in_background(str(dest_path))
+        
+        return JSONResponse(status_code=202, content={
+            "success": True,
+            "name": dest_path.name,
+            "path": str(dest_path),
+            "selected": True,
+            "job_id": job.id
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to upload PDF: {str(e)}")
+
 @router.get("/pdf-content")
 async def get_pdf_content(path: str):
     """Get PDF file content for viewing"""
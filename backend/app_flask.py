@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
 from datetime import datetime
 import psutil
@@ -12,10 +12,13 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 from core.config import settings
-from core.database import get_db, set_db, get_current_pdf_path, initialize_db
-from services.chat_service import ChatService
+from core.database import get_db, get_current_pdf_path, get_current_handle, initialize_db, get_index_registry
+from services.chat_service import ChatService, format_sse, get_answer_cache, get_query_batcher_stats, get_query_cache
 from services.pdf_service import PDFService
 from services.index_service import IndexService
+from services.admission import Saturated, get_admission
+from services.ollama_service import init_ollama_clients
+from services.job_service import IndexNotReady, get_job_manager, load_pdf_in_background, resolve_index
 
 app = Flask(__name__)
 
@@ -35,6 +38,7 @@ CORS(app, origins=[
 # Initialize on startup
 with app.app_context():
     import asyncio
+    init_ollama_clients()
     asyncio.run(initialize_db())
     print("Database initialized")
     print("AI Chatbot API started successfully!")
@@ -51,7 +55,13 @@ def health_check():
             "cpu_percent": psutil.cpu_percent(),
             "memory_percent": psutil.virtual_memory().percent,
             "disk_percent": psutil.disk_usage('/').percent if os.name != 'nt' else psutil.disk_usage('C:\\').percent
-        }
+        },
+        "memory": IndexService().get_memory_info(get_db()),
+        "index_cache": get_index_registry().stats(),
+        "query_cache": get_query_cache().stats(),
+        "query_batcher": get_query_batcher_stats(),
+        "answer_cache": get_answer_cache().stats(),
+        "chat_admission": get_admission().stats()
     })
 
 # PDF endpoints
@@ -89,19 +99,16 @@ def load_pdf():
                 "pdf_path": pdf_path
             })
         
-        # Load or create index
-        index_service = IndexService()
-        import asyncio
-        db = asyncio.run(index_service.get_or_create_pdf_index(pdf_path))
-        
-        # Set as current database
-        set_db(db, pdf_path)
+        # Build/load the index in the background; it becomes current when the job finishes
+        job = load_pdf_in_background(pdf_path)
         
         return jsonify({
             "success": True,
-            "message": f"Successfully loaded {os.path.basename(pdf_path)}",
-            "pdf_path": pdf_path
-        })
+            "message": f"Loading {os.path.basename(pdf_path)}",
+            "pdf_path": pdf_path,
+            "job_id": job.id,
+            "job": job.to_dict()
+        }), 202
         
     except Exception as e:
         return jsonify({"error": f"Failed to load PDF: {str(e)}"}), 500
@@ -166,22 +173,37 @@ def upload_pdf():
 
         file.save(str(dest_path))
 
-        # Build or load FAISS index for the uploaded PDF and set as current DB
-        index_service = IndexService()
-        import asyncio
-        db = asyncio.run(index_service.get_or_create_pdf_index(str(dest_path)))
-        set_db(db, str(dest_path))
+        # Build the FAISS index for the uploaded PDF in the background; it is selected once ready
+        job = load_pdf_in_background(str(dest_path))
 
-        # Return info so frontend can select it immediately
+        # Return info so frontend can select it immediately and poll the job
         return jsonify({
             "success": True,
             "name": dest_path.name,
             "path": str(dest_path),
-            "selected": True
-        })
+            "selected": True,
+            "job_id": job.id
+        }), 202
     except Exception as e:
         return jsonify({"error": f"Failed to upload PDF: {str(e)}"}), 500
 
+# Index build jobs
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Progress of a background index build"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a background index build"""
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
 # Chat endpoints
 @app.route('/api/chat', methods=['POST'])
 def send_message():
@@ -194,29 +216,101 @@ def send_message():
         if not message:
             return jsonify({"error": "message is required"}), 400
         
-        # Get current database
-        db = get_db()
-        current_pdf = get_current_pdf_path()
+        # Search the requested document, or the process-wide current one
+        pdf_path = data.get('pdf_path')
+        if pdf_path:
+            db = resolve_index(pdf_path)
+            current_pdf = pdf_path
+        else:
+            current = get_current_handle()
+            db = current.db if current is not None else None
+            current_pdf = current.pdf_path if current is not None else None
         
         # Initialize chat service
         chat_service = ChatService()
         
-        # Process the message
-        import asyncio
-        response = asyncio.run(chat_service.process_message(
-            message=message,
-            db=db,
-            settings=chat_settings,
-            current_pdf=current_pdf
-        ))
+        # Retrieve first: answer-cache hits are served without waiting for an LLM slot
+        prepared = chat_service.prepare(message, db, chat_settings)
+        if prepared.cached is not None:
+            response = chat_service.answer(message, db, chat_settings, current_pdf, prepared)
+        else:
+            # Wait for an LLM slot (or fail fast with 429), then generate the answer on this thread
+            with get_admission().slot():
+                response = chat_service.answer(
+                    message=message,
+                    db=db,
+                    settings=chat_settings,
+                    current_pdf=current_pdf,
+                    prepared=prepared
+                )
         
         return jsonify({
             "answer": response.answer,
-            "sources": [{"content": s.content, "metadata": s.metadata} for s in response.sources]
+            "sources": [{"content": s.content, "metadata": s.metadata} for s in response.sources],
+            "context": response.context
         })
         
+    except Saturated as e:
+        return jsonify(e.to_dict()), 429, {"Retry-After": str(e.retry_after)}
+    except IndexNotReady as e:
+        return jsonify({"error": str(e), "job_id": e.job.id}), 409
+    except Exception as e:
+        return jsonify({"error": f"Failed to process message: {str(e)}"}), 500
+
+@app.route('/api/chat/stream', methods=['POST'])
+def stream_message():
+    """Send a message and stream the answer as Server-Sent Events (sources, tokens, stats)"""
+    data = request.get_json()
+    message = data.get('message')
+    if not message:
+        return jsonify({"error": "message is required"}), 400
+    
+    chat_service = ChatService()
+    chat_settings = data.get('settings', {})
+    try:
+        pdf_path = data.get('pdf_path')
+        if pdf_path:
+            db = resolve_index(pdf_path)
+            current_pdf = pdf_path
+        else:
+            current = get_current_handle()
+            db = current.db if current is not None else None
+            current_pdf = current.pdf_path if current is not None else None
+        prepared = chat_service.prepare(message, db, chat_settings)
+        # Answer-cache hits are replayed without an LLM slot
+        release = get_admission().acquire() if prepared.cached is None else None
+    except Saturated as e:
+        return jsonify(e.to_dict()), 429, {"Retry-After": str(e.retry_after)}
+    except IndexNotReady as e:
+        return jsonify({"error": str(e), "job_id": e.job.id}), 409
     except Exception as e:
         return jsonify({"error": f"Failed to process message: {str(e)}"}), 500
+    
+    events = chat_service.stream_message(
+        message=message,
+        db=db,
+        settings=chat_settings,
+        current_pdf=current_pdf,
+        prepared=prepared
+    )
+    
+    def generate():
+        # The WSGI server closes this generator when the client disconnects, which closes the Ollama stream
+        try:
+            for event, payload in events:
+                yield format_sse(event, payload)
+        finally:
+            events.close()
+    
+    response = Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # The slot is held until the stream is closed (finished or client gone)
+    if release is not None:
+        response.call_on_close(release)
+    return response
 
 @app.route('/api/chat/history', methods=['GET'])
 def get_chat_history():
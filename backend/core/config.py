@@ -15,10 +15,27 @@ class Settings(BaseSettings):
     ollama_host: str = "http://localhost:11434"
     ollama_embed_model: str = "nomic-embed-text"
     ollama_llm_model: str = "qwen2.5:3b-instruct"
+    ollama_keep_alive: str = "30m"  # how long Ollama keeps models loaded after a request ("-1" = forever)
+    ollama_max_connections: int = 16  # pooled HTTP connections per Ollama host
+    ollama_warmup: bool = True  # load the LLM and embedding models at startup
     
     # FAISS Settings
     faiss_index_dir: str = "faiss_indices"
     faiss_global_index_dir: str = "faiss_index"
+    faiss_index_spec: str = "flat"  # flat | hnsw:M=32,efSearch=64 | ivf:nlist=1024,nprobe=16 | ivfpq:...
+    faiss_nprobe: Optional[int] = None  # IVF query-time override
+    faiss_ef_search: Optional[int] = None  # HNSW query-time override
+    faiss_mmap: bool = True  # map index.faiss read-only so workers share it via the page cache
+    shard_search_workers: int = 8  # threads for cross-document (per-PDF shard) search
+    index_cache_max_mb: int = 2048  # loaded indices kept in memory (LRU beyond this)
+    preload_pdfs: list = []  # PDF paths whose indices are loaded at startup
+    
+    # Ingest Settings
+    embed_batch_size: int = 64
+    embed_max_in_flight: int = 4
+    embed_cache_max_mb: int = 1024
+    index_build_workers: int = 2  # concurrent background index-build jobs
+    dedup_threshold: float = 0.0  # drop chunks this similar to an earlier one (e.g. 0.9); 0 keeps near-duplicates such as part-number variants
     
     # PDF Settings
     pdf_directory: str = "docx"
@@ -28,7 +45,20 @@ class Settings(BaseSettings):
     default_top_k: int = 4
     default_max_tokens: int = 256
     default_max_context_chars: int = 4000
+    default_max_context_tokens: int = 1024  # prompt context budget, counted with CONTEXT_TOKENIZER
+    context_tokenizer: Optional[str] = None  # Hugging Face tokenizer matching the LLM (needs transformers); estimated if unset
     default_retrieval_mode: str = "similarity"
+    query_cache_max_entries: int = 1024  # cached query embeddings (LRU)
+    query_cache_ttl_seconds: float = 3600
+    query_batch_window_ms: float = 2  # how long a query embedding waits for others to batch with
+    query_batch_max_size: int = 32  # max queries per batched embedding call
+    answer_cache_max_entries: int = 512  # cached answers (LRU); 0 disables the answer cache
+    answer_cache_threshold: float = 0.95  # min cosine similarity between query embeddings to reuse an answer
+    chat_max_concurrency: int = 2  # chat requests generating at once (match OLLAMA_NUM_PARALLEL)
+    chat_max_queue: int = 16  # chat requests waiting for a slot; beyond this they get 429
+    retrieval_min_score: float = 0.45  # min cosine relevance for a chunk to enter the prompt
+    retrieval_max_score_drop: float = 0.15  # adaptive k: drop chunks this far below the best score
+    hybrid_rrf_k: int = 60  # reciprocal rank fusion constant for hybrid (BM25 + vector) retrieval
     
     # Security
     secret_key: str = "your-secret-key-change-in-production"
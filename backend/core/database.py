@@ -1,38 +1,153 @@
-from typing import Optional
+from typing import Any, Dict, Optional
+import itertools
 import os
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
 from langchain_community.vectorstores import FAISS
 from langchain_ollama import OllamaEmbeddings
 from core.config import settings
 
-# Global database instance
-_db: Optional[FAISS] = None
-_current_pdf_path: Optional[str] = None
+@dataclass(frozen=True)
+class IndexHandle:
+    """
+    One published version of a loaded index. Handles are never modified:
+    publishing a rebuilt index swaps in a new handle, and requests that already
+    took the old one finish their search on it.
+    """
+    db: FAISS
+    version: Any = None  # version of the saved files (e.g. index.faiss mtime)
+    generation: int = 1  # bumped every time this key is republished
+    nbytes: int = 0
+    pdf_path: Optional[str] = None
+    last_used: list = field(default_factory=lambda: [0], compare=False, repr=False)
+
+class IndexRegistry:
+    """
+    Loaded FAISS stores keyed by index directory, evicted least-recently-used
+    once their combined size exceeds ``max_bytes``.
+
+    Reads take no lock: a lookup is a single dict read of an immutable
+    IndexHandle, and recency is a counter stamped on the handle. Only
+    publishing and eviction serialize on the registry lock. ``get`` with a
+    ``version`` treats a handle for different saved files as a miss; ``peek``
+    returns whatever is published. The most recently published store is
+    always kept, even if it alone exceeds the budget.
+    """
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._handles: Dict[str, IndexHandle] = {}
+        self._clock = itertools.count(1)
+        self._bytes = 0
+        # Counters are updated without a lock; under heavy concurrency they are approximate
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def peek(self, key: str) -> Optional[IndexHandle]:
+        handle = self._handles.get(key)
+        if handle is None:
+            self.misses += 1
+            return None
+        handle.last_used[0] = next(self._clock)
+        self.hits += 1
+        return handle
+    
+    def get(self, key: str, version: Any = None) -> Optional[FAISS]:
+        handle = self._handles.get(key)
+        if handle is None or handle.version != version:
+            self.misses += 1
+            return None
+        handle.last_used[0] = next(self._clock)
+        self.hits += 1
+        return handle.db
+    
+    def put(self, key: str, db: FAISS, version: Any = None, nbytes: int = 0, pdf_path: Optional[str] = None) -> IndexHandle:
+        """Publish ``db`` under ``key``, replacing (not mutating) any previous handle"""
+        with self._lock:
+            old = self._handles.get(key)
+            handle = IndexHandle(
+                db=db,
+                version=version,
+                generation=old.generation + 1 if old is not None else 1,
+                nbytes=nbytes,
+                pdf_path=pdf_path if pdf_path is not None else (old.pdf_path if old is not None else None),
+            )
+            handle.last_used[0] = next(self._clock)
+            self._handles[key] = handle
+            self._bytes += nbytes - (old.nbytes if old is not None else 0)
+            # Stores still referenced elsewhere (e.g. by an in-flight search) stay alive until released
+            while self._bytes > self.max_bytes and len(self._handles) > 1:
+                lru = min((k for k in self._handles if k != key), key=lambda k: self._handles[k].last_used[0])
+                self._bytes -= self._handles.pop(lru).nbytes
+                self.evictions += 1
+            return handle
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._handles),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+# Process-wide default index (used by requests that do not name a document).
+# Stored as one handle so the index and its PDF path are always read together.
+_current: Optional[IndexHandle] = None
+_registry = IndexRegistry(settings.index_cache_max_mb * 1024 * 1024)
 
 async def initialize_db():
-    """Initialize the database connection"""
-    global _db, _current_pdf_path
-    _db = None
-    _current_pdf_path = None
+    """Initialize the database connection and preload frequently used indices"""
+    global _current
+    _current = None
+    if settings.preload_pdfs:
+        # Imported here: the services themselves import this module
+        from services.index_service import IndexService
+        index_service = IndexService()
+        loaded = 0
+        for pdf_path in settings.preload_pdfs:
+            if not index_service.index_exists(pdf_path):
+                print(f"Skipping preload of {pdf_path}: no index built yet")
+                continue
+            try:
+                await index_service.get_or_create_pdf_index(pdf_path)
+                loaded += 1
+            except Exception as e:
+                print(f"Failed to preload {pdf_path}: {e}")
+        print(f"Preloaded {loaded} indices")
     # Avoid non-ASCII output for better Windows console compatibility
     print("Database initialized")
 
+def get_index_registry() -> IndexRegistry:
+    """Get the cache of loaded indices"""
+    return _registry
+
 def get_db() -> Optional[FAISS]:
     """Get the current database instance"""
-    return _db
+    current = _current
+    return current.db if current is not None else None
 
 def set_db(db: FAISS, pdf_path: Optional[str] = None):
     """Set the current database instance"""
-    global _db, _current_pdf_path
-    _db = db
-    _current_pdf_path = pdf_path
+    global _current
+    _current = IndexHandle(db=db, pdf_path=pdf_path)
+
+def get_current_handle() -> Optional[IndexHandle]:
+    """Get the current index and its PDF path as one consistent snapshot"""
+    return _current
 
 def get_current_pdf_path() -> Optional[str]:
     """Get the current PDF path"""
-    return _current_pdf_path
+    current = _current
+    return current.pdf_path if current is not None else None
 
 def clear_db():
     """Clear the current database instance"""
-    global _db, _current_pdf_path
-    _db = None
-    _current_pdf_path = None
+    global _current
+    _current = None
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import time
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def summary(name: str, latencies: List[float]) -> str:
+    ms = [v * 1000 for v in latencies]
+    return (
+        f"{name:>7}: n={len(ms)} p50={percentile(ms, 50):.0f} ms "
+        f"p95={percentile(ms, 95):.0f} ms max={max(ms, default=0):.0f} ms"
+    )
+
+
+async def chat_worker(client: httpx.AsyncClient, url: str, body: Dict, count: int, statuses: Counter, latencies: List[float]) -> None:
+    for _ in range(count):
+        started = time.perf_counter()
+        try:
+            r = await client.post(url, json=body)
+            statuses[r.status_code] += 1
+            if r.status_code == 429:
+                # Back off as the server suggests, like a well-behaved client
+                await asyncio.sleep(min(float(r.headers.get("Retry-After", 1)), 5))
+                continue
+        except httpx.HTTPError as e:
+            statuses[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - started)
+
+
+async def health_probe(client: httpx.AsyncClient, url: str, interval: float, stop: asyncio.Event, latencies: List[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            await client.get(url)
+            latencies.append(time.perf_counter() - started)
+        except httpx.HTTPError as e:
+            print(f"health check failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def main(args: argparse.Namespace) -> None:
+    base = args.url.rstrip("/")
+    body = {"message": args.message, "settings": {"maxTokens": args.max_tokens, "bypassCache": True}}
+    statuses: Counter = Counter()
+    chat_latencies: List[float] = []
+    health_latencies: List[float] = []
+    stop = asyncio.Event()
+    per_client = max(1, args.requests // args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout) as client:
+        probe = asyncio.create_task(health_probe(client, f"{base}/api/health", args.health_interval, stop, health_latencies))
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            chat_worker(client, f"{base}/api/chat", body, per_client, statuses, chat_latencies)
+            for _ in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+    print(f"{args.concurrency} clients x {per_client} chat requests in {elapsed:.1f}s; status counts: {dict(statuses)}")
+    print(summary("chat", chat_latencies))
+    print(summary("health", health_latencies))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the chat endpoint and check that /api/health stays responsive.")
+    parser.add_argument("--url", type=str, default="http://localhost:16005")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent chat clients")
+    parser.add_argument("--requests", type=int, default=64, help="Total chat requests")
+    parser.add_argument("--message", type=str, default="Summarize the document in one sentence.")
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--health-interval", type=float, default=0.2, help="Seconds between health checks")
+    parser.add_argument("--timeout", type=float, default=300)
+    asyncio.run(main(parser.parse_args()))
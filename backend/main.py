@@ -9,13 +9,15 @@ from pathlib import Path
 from typing import List, Optional
 import uvicorn
 
-from api.routes import chat, pdfs, health
+from api.routes import chat, pdfs, health, jobs
 from core.config import settings
 from core.database import get_db, initialize_db
+from services.ollama_service import init_ollama_clients
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    init_ollama_clients()
     await initialize_db()
     print("AI Chatbot API started successfully!")
     yield
@@ -47,6 +49,7 @@ app.add_middleware(
 app.include_router(health.router, prefix="/api", tags=["health"])
 app.include_router(pdfs.router, prefix="/api", tags=["pdfs"])
 app.include_router(chat.router, prefix="/api", tags=["chat"])
+app.include_router(jobs.router, prefix="/api", tags=["jobs"])
 
 # Mount static files for PDF serving
 if os.path.exists("static"):
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Union
 
 class Source(BaseModel):
     content: str
@@ -7,15 +7,26 @@ class Source(BaseModel):
 
 class ChatSettings(BaseModel):
     topK: int = 4
-    retrievalMode: str = "similarity"
+    retrievalMode: str = "similarity"  # similarity | mmr | hybrid (BM25 + vector, RRF) | keyword (BM25 only)
     maxTokens: int = 256
     maxContextChars: int = 4000
+    minScore: Optional[float] = None  # relevance threshold (cosine); defaults to RETRIEVAL_MIN_SCORE
+    maxContextTokens: Optional[int] = None  # context token budget; defaults to DEFAULT_MAX_CONTEXT_TOKENS
     showContext: bool = False
+    nprobe: Optional[int] = None
+    efSearch: Optional[int] = None
+    shards: Optional[List[str]] = None  # PDF paths whose indices to search together
+    allShards: bool = False  # search every per-PDF index
+    sources: Optional[List[str]] = None  # only chunks from these PDFs (full path or file name)
+    pages: Optional[List[Union[int, List[int]]]] = None  # only these pages / inclusive [first, last] ranges (0-based, like metadata.page)
+    bypassCache: bool = False  # skip the semantic answer cache for this request
 
 class ChatRequest(BaseModel):
     message: str
     settings: ChatSettings
+    pdf_path: Optional[str] = None  # document to search; defaults to the one loaded via /load-pdf
 
 class ChatResponse(BaseModel):
     answer: str
     sources: List[Source]
+    context: Optional[dict] = None  # context packing stats (tokens, tokens_saved, ...)
@@ -0,0 +1,144 @@
+import asyncio
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, Optional
+
+from core.config import settings
+
+
+class Saturated(Exception):
+    """All LLM slots are busy and the wait queue is full"""
+
+    def __init__(self, queue_position: int, retry_after: int):
+        super().__init__(f"Server busy: {queue_position - 1} requests already waiting")
+        self.queue_position = queue_position
+        self.retry_after = retry_after
+
+    def to_dict(self) -> Dict[str, int]:
+        return {"message": str(self), "queue_position": self.queue_position, "retry_after": self.retry_after}
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded wait queue in front of the LLM.
+
+    At most ``max_concurrent`` requests hold a slot; up to ``max_queue``
+    more wait for one. Anything beyond that is rejected at once with
+    Saturated, carrying the position it would have had in the queue and a
+    Retry-After estimate from the recent average request time.
+
+    The FastAPI app waits with the async entry points (``acquire_async``,
+    ``slot_async``) and the threaded Flask app with the blocking ones; a
+    process should use only one kind, as each has its own semaphore.
+    """
+
+    def __init__(self, max_concurrent: int = 2, max_queue: int = 16):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.avg_seconds = 0.0
+        self._lock = threading.Lock()
+        self._sync_slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._async_slots: Optional[asyncio.Semaphore] = None
+
+    def _enter(self) -> None:
+        with self._lock:
+            if self.active + self.waiting >= self.max_concurrent + self.max_queue:
+                self.rejected += 1
+                position = self.waiting + 1
+                # Every slot frees up about once per average request time
+                retry_after = max(1, math.ceil(self.avg_seconds * position / self.max_concurrent))
+                raise Saturated(position, retry_after)
+            self.waiting += 1
+
+    def _admitted(self) -> float:
+        with self._lock:
+            self.waiting -= 1
+            self.active += 1
+        return time.perf_counter()
+
+    def _leave(self, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.active -= 1
+            self.avg_seconds = elapsed if not self.avg_seconds else 0.8 * self.avg_seconds + 0.2 * elapsed
+
+    def _abandon(self) -> None:
+        with self._lock:
+            self.waiting -= 1
+
+    def _release_once(self, started: float, semaphore) -> Callable[[], None]:
+        released = threading.Event()
+
+        def release() -> None:
+            # Idempotent: streaming responses release from more than one place
+            if not released.is_set():
+                released.set()
+                self._leave(started)
+                semaphore.release()
+
+        return release
+
+    async def acquire_async(self) -> Callable[[], None]:
+        """Wait for a slot and return its release function; raises Saturated instead of queueing past the limit"""
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrent)
+        self._enter()
+        try:
+            await self._async_slots.acquire()
+        except BaseException:
+            self._abandon()
+            raise
+        return self._release_once(self._admitted(), self._async_slots)
+
+    def acquire(self) -> Callable[[], None]:
+        """Blocking variant of ``acquire_async`` for threaded servers"""
+        self._enter()
+        try:
+            self._sync_slots.acquire()
+        except BaseException:
+            self._abandon()
+            raise
+        return self._release_once(self._admitted(), self._sync_slots)
+
+    @asynccontextmanager
+    async def slot_async(self):
+        release = await self.acquire_async()
+        try:
+            yield
+        finally:
+            release()
+
+    @contextmanager
+    def slot(self):
+        release = self.acquire()
+        try:
+            yield
+        finally:
+            release()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "rejected": self.rejected,
+                "avg_seconds": round(self.avg_seconds, 3),
+            }
+
+
+_admission = AdmissionController(
+    max_concurrent=settings.chat_max_concurrency,
+    max_queue=settings.chat_max_queue
+)
+
+
+def get_admission() -> AdmissionController:
+    """Get the process-wide chat admission controller"""
+    return _admission
@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class CachedAnswer:
+    scope: str
+    version: Any
+    key: Hashable
+    vector: np.ndarray
+    answer: str
+    sources: List[Any]
+
+
+def index_scope(db: Any) -> Tuple[str, Any]:
+    """
+    (identity, version) of a loaded index: its directory and the saved version's
+    index.faiss path and mtime, or the in-memory store itself
+    """
+    index_file = getattr(db, "index_file", None)
+    if index_file is not None:
+        try:
+            mtime = index_file.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        return str(getattr(db, "index_dir", index_file)), (str(index_file), mtime, db.index.ntotal)
+    return f"memory:{id(db)}", db.index.ntotal
+
+
+class SemanticAnswerCache:
+    """
+    Answers to earlier questions, reused for new questions whose query
+    embedding has cosine similarity >= ``threshold`` with a cached one.
+
+    An entry only matches within the same index scope and version and the
+    same ``key`` (LLM model + retrieval settings). Looking up a scope with a
+    new version drops that scope's older entries, so a rebuilt index never
+    serves answers retrieved from the previous one. At most ``max_entries``
+    are kept, evicting least recently used.
+    """
+
+    def __init__(self, max_entries: int = 512, threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._next_id = 0
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm > 0 else v
+
+    def _invalidate(self, scope: str, version: Any) -> None:
+        # Caller holds self._lock
+        stale = [i for i, e in self._entries.items() if e.scope == scope and e.version != version]
+        for i in stale:
+            del self._entries[i]
+        self.invalidations += len(stale)
+
+    def lookup(self, scope: str, version: Any, key: Hashable, vector: List[float]) -> Optional[CachedAnswer]:
+        if self.max_entries <= 0:
+            return None
+        query = self._unit(vector)
+        with self._lock:
+            self._invalidate(scope, version)
+            candidates = [(i, e) for i, e in self._entries.items() if e.scope == scope and e.key == key]
+            if candidates:
+                sims = np.stack([e.vector for _, e in candidates]) @ query
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return entry
+            self.misses += 1
+            return None
+
+    def store(self, scope: str, version: Any, key: Hashable, vector: List[float], answer: str, sources: List[Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        entry = CachedAnswer(scope, version, key, self._unit(vector), answer, list(sources))
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
@@ -1,33 +1,299 @@
-from typing import Optional, Any, Dict
-from langchain_ollama import OllamaLLM
+import asyncio
+import heapq
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Any, Dict, Iterator, List, NamedTuple, Tuple
+import numpy as np
+from langchain_core.documents import Document
 from langchain_core.prompts import PromptTemplate
 
 from core.config import settings
+from services.index_service import IndexService
+
+# Ensure the project root (containing the `ai` package) is on sys.path
+_PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from ai.chunk_store import iter_documents
+from ai.context_packer import context_token_lengths, pack_context
+from ai.lexical import is_exact_match_query
+from ai.loader import build_store_metadata_index
+from ai.ollama_clients import get_embeddings, get_llm
+from ai.query_batcher import QueryEmbeddingBatcher
+from ai.relevance import relevance_from_l2, select_relevant
+from ai.retriever import get_retriever
+from ai.query_cache import QueryEmbeddingCache
+from services.answer_cache import CachedAnswer, SemanticAnswerCache, index_scope
+
+# Shared pool for fanning one query out over per-PDF shards; FAISS releases the GIL while searching
+_shard_pool = ThreadPoolExecutor(max_workers=settings.shard_search_workers, thread_name_prefix="shard-search")
+# Query embeddings shared by all requests (users repeat the same questions)
+_query_cache = QueryEmbeddingCache(
+    max_entries=settings.query_cache_max_entries,
+    ttl_seconds=settings.query_cache_ttl_seconds
+)
+
+# Answers reused for near-identical questions against the same index version and settings
+_answer_cache = SemanticAnswerCache(
+    max_entries=settings.answer_cache_max_entries,
+    threshold=settings.answer_cache_threshold
+)
+
+# One micro-batcher per embedding model and host: concurrent cache misses share one embed call
+_batchers: Dict[Tuple[str, Optional[str]], QueryEmbeddingBatcher] = {}
+_batchers_lock = threading.Lock()
+
+def _query_embedder(embeddings: Any) -> QueryEmbeddingBatcher:
+    key = (str(getattr(embeddings, "model", "")), getattr(embeddings, "base_url", None))
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = QueryEmbeddingBatcher(
+                embeddings,
+                window_ms=settings.query_batch_window_ms,
+                max_batch=settings.query_batch_max_size
+            )
+            _batchers[key] = batcher
+        return batcher
+
+def get_query_batcher_stats() -> Dict[str, Dict]:
+    """Batch-size and wait-time histograms of the query-embedding batchers, by model"""
+    with _batchers_lock:
+        return {model: batcher.stats() for (model, _), batcher in _batchers.items()}
+
+# Token counter for context packing (a Hugging Face tokenizer is loaded on first use)
+_context_lengths = None
+_context_lengths_lock = threading.Lock()
+
+def _context_token_lengths():
+    global _context_lengths
+    with _context_lengths_lock:
+        if _context_lengths is None:
+            _context_lengths = context_token_lengths(settings.context_tokenizer)
+        return _context_lengths
+
+def get_query_cache() -> QueryEmbeddingCache:
+    """Get the shared query-embedding cache"""
+    return _query_cache
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """Get the shared semantic answer cache"""
+    return _answer_cache
+
+class PreparedMessage(NamedTuple):
+    """Retrieved context and prompt for a message; on an answer-cache hit ``prompt`` is None and ``cached`` is set"""
+    prompt: Optional[str]
+    sources: List[Any]
+    cached: Optional[CachedAnswer]
+    cache_key: Optional[tuple]
+    query: Optional[List[float]]
+    context: Optional[Dict]
+    started: float
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
 class ChatService:
     def __init__(self):
         self.llm_model = settings.ollama_llm_model
+        self.emb_model = settings.ollama_embed_model
         self.base_url = settings.ollama_host
+        self.nprobe = settings.faiss_nprobe
+        self.ef_search = settings.faiss_ef_search
+        self.rrf_k = settings.hybrid_rrf_k
+        self.max_context_tokens = settings.default_max_context_tokens
+        self.min_score = settings.retrieval_min_score
+        self.max_score_drop = settings.retrieval_max_score_drop
     
-    async def process_message(
+    def _min_score(self, chat_settings: Dict) -> float:
+        min_score = chat_settings.get('minScore')
+        return self.min_score if min_score is None else min_score
+    
+    def _search_params(self, chat_settings: Dict) -> Dict[str, Optional[int]]:
+        """ANN query-time knobs for one search (ignored for flat indices); passed per call, never set on the shared index"""
+        return {
+            "efSearch": chat_settings.get('efSearch') or self.ef_search,
+            "nprobe": chat_settings.get('nprobe') or self.nprobe,
+        }
+    
+    @staticmethod
+    def _filter_rows(db: Any, chat_settings: Dict) -> Optional[np.ndarray]:
+        """FAISS rows allowed by the ``sources``/``pages`` filters, or None when the request has none"""
+        sources, pages = chat_settings.get('sources'), chat_settings.get('pages')
+        if not sources and not pages:
+            return None
+        metadata_index = getattr(db, "metadata_index", None)
+        if metadata_index is None or len(metadata_index) != db.index.ntotal:
+            # Stores not loaded through load_index (or changed since): index their metadata once
+            metadata_index = db.metadata_index = build_store_metadata_index(db)
+        return metadata_index.select(sources, pages)
+    
+    @staticmethod
+    def _lexical_only(message: str, chat_settings: Dict) -> bool:
+        """BM25 alone answers keyword mode, and exact-match queries (codes, acronyms, "quotes") in hybrid mode"""
+        mode = chat_settings.get('retrievalMode', 'similarity')
+        return mode == "keyword" or (mode == "hybrid" and is_exact_match_query(message))
+    
+    def _hybrid_search(
+        self,
+        message: str,
+        query: Optional[List[float]],
+        stores: Dict[str, Any],
+        top_k: int,
+        chat_settings: Dict,
+        tag_shard: bool = False
+    ) -> List[Document]:
+        """
+        BM25 and (when ``query`` is given) vector search over every store in
+        parallel, fused with reciprocal rank fusion: rrf_score = sum of
+        1 / (rrf_k + rank) over the two rankings. Vector hits below the
+        relevance bar are left out of their ranking; BM25 hits always count.
+        """
+        fetch_k = max(20, top_k * 4)
+        allowed = {name: self._filter_rows(db, chat_settings) for name, db in stores.items()}
+        
+        def vector(name: str, db: Any):
+            if db.index.d != len(query):
+                print(f"Skipping shard {name}: built with a different embedding model")
+                return []
+            distances, rows = get_retriever(db, fetch_k).search_rows(
+                query, allowed[name], **self._search_params(chat_settings)
+            )
+            return [(float(dist), name, db.index_to_docstore_id[int(row)]) for dist, row in zip(distances, rows)]
+        
+        def lexical(name: str, db: Any):
+            bm25 = getattr(db, "lexical", None)
+            if bm25 is None:
+                return []
+            return [(score, name, doc_id) for doc_id, score in bm25.search(message, fetch_k, allowed[name])]
+        
+        lexical_futures = [_shard_pool.submit(lexical, name, db) for name, db in stores.items()]
+        vector_futures = [_shard_pool.submit(vector, name, db) for name, db in stores.items()] if query is not None else []
+        # Across shards, BM25 scores are only roughly comparable (each has its own IDF); RRF only uses the ranks
+        vector_hits = heapq.nsmallest(fetch_k, (h for f in vector_futures for h in f.result()), key=lambda h: h[0])
+        relevance = {(name, doc_id): relevance_from_l2(dist) for dist, name, doc_id in vector_hits}
+        if vector_hits:
+            floor = max(self._min_score(chat_settings), relevance_from_l2(vector_hits[0][0]) - self.max_score_drop)
+            vector_hits = [h for h in vector_hits if relevance[(h[1], h[2])] >= floor]
+        rankings = [
+            vector_hits,
+            heapq.nlargest(fetch_k, (h for f in lexical_futures for h in f.result()), key=lambda h: h[0]),
+        ]
+        fused: Dict[Tuple[str, str], float] = {}
+        for ranking in rankings:
+            for rank, (_, name, doc_id) in enumerate(ranking, start=1):
+                fused[(name, doc_id)] = fused.get((name, doc_id), 0.0) + 1.0 / (self.rrf_k + rank)
+        top = heapq.nlargest(top_k, fused.items(), key=lambda kv: kv[1])
+        
+        # Fetch only the winning chunks, one batch per store
+        wanted: Dict[str, List[str]] = {}
+        for (name, doc_id), _ in top:
+            wanted.setdefault(name, []).append(doc_id)
+        found = {
+            (name, doc_id): doc
+            for name, ids in wanted.items()
+            for doc_id, doc in zip(ids, iter_documents(stores[name].docstore, ids))
+        }
+        docs = []
+        for key, score in top:
+            doc = found[key]
+            metadata = {**doc.metadata, "rrf_score": score}
+            if key in relevance:
+                metadata["score"] = round(relevance[key], 4)
+            if tag_shard:
+                metadata["shard"] = key[0]
+            docs.append(Document(page_content=doc.page_content, metadata=metadata))
+        return docs
+    
+    def _search_shards(
+        self,
+        query: List[float],
+        shards: Dict[str, Any],
+        top_k: int,
+        retrieval_mode: str,
+        chat_settings: Dict
+    ) -> List[Document]:
+        """Search every shard in parallel and keep the overall most relevant chunks (adaptive top_k)"""
+        def search(name: str, db: Any):
+            if db.index.d != len(query):
+                print(f"Skipping shard {name}: built with a different embedding model")
+                return []
+            hits = get_retriever(db, top_k, retrieval_mode).search(
+                query, self._filter_rows(db, chat_settings), **self._search_params(chat_settings)
+            )
+            return [
+                (Document(page_content=doc.page_content, metadata={**doc.metadata, "shard": name}), score)
+                for doc, score in hits
+            ]
+        
+        futures = [_shard_pool.submit(search, name, db) for name, db in shards.items()]
+        hits = [hit for fut in futures for hit in fut.result()]
+        return select_relevant(hits, top_k, self._min_score(chat_settings), self.max_score_drop)
+    
+    def prepare(
         self,
         message: str,
         db: Optional[Any],
         settings: Dict,
-        current_pdf: Optional[str] = None
-    ):
-        """Process a chat message and return a response"""
+        query: Optional[List[float]] = None
+    ) -> PreparedMessage:
+        """
+        Retrieve context and build the prompt (blocking: embedding and FAISS search).
+        
+        Needs no LLM, so servers run it before taking an admission slot and
+        answer-cache hits never wait for one. ``query`` is the already
+        computed query embedding, if any.
+        """
+        from models.chat import Source
         
+        started = time.perf_counter()
         # Extract settings
         top_k = settings.get('topK', 4)
         retrieval_mode = settings.get('retrievalMode', 'similarity')
         max_tokens = settings.get('maxTokens', 256)
         max_context_chars = settings.get('maxContextChars', 4000)
+        max_context_tokens = settings.get('maxContextTokens') or self.max_context_tokens
+        context_stats = None
         
         ctx_docs = []
         
-        if db is None:
+        # Cross-document mode: search the chosen (or all) per-PDF indices instead of the loaded one
+        shards = {}
+        if settings.get('allShards') or settings.get('shards'):
+            shards = IndexService().get_shards(None if settings.get('allShards') else settings.get('shards'))
+            db = None
+        
+        # Embed the query once (through the shared cache) for both the answer cache and retrieval
+        cache_key = None
+        lexical_only = self._lexical_only(message, settings)
+        if (db is not None or shards) and not lexical_only:
+            if query is None:
+                query = _query_cache.embed_query(_query_embedder((db or next(iter(shards.values()))).embeddings), message)
+            if not settings.get('bypassCache'):
+                if shards:
+                    names = sorted(shards)
+                    scope = "shards:" + "|".join(names)
+                    version = tuple(index_scope(shards[name]) for name in names)
+                else:
+                    scope, version = index_scope(db)
+                cache_key = (scope, version, (
+                    self.llm_model, top_k, retrieval_mode, max_tokens, max_context_chars, max_context_tokens,
+                    self._min_score(settings),
+                    json.dumps(settings.get('sources')), json.dumps(settings.get('pages')),
+                    settings.get('efSearch'), settings.get('nprobe'),
+                ))
+                cached = _answer_cache.lookup(*cache_key, query)
+                if cached is not None:
+                    return PreparedMessage(None, cached.sources, cached, None, None, None, started)
+        
+        if db is None and not shards:
             # No index loaded, use general knowledge
             template = (
                 "You are a helpful assistant. Answer the question using your general knowledge.\n"
@@ -36,37 +302,40 @@ class ChatService:
             )
             prompt = PromptTemplate.from_template(template).format(question=message)
         else:
-            # Retrieve context from database
-            if retrieval_mode == "mmr":
-                retriever = db.as_retriever(
-                    search_type="mmr",
-                    search_kwargs={"k": top_k, "fetch_k": max(10, top_k * 5)}
-                )
+            if retrieval_mode in ("hybrid", "keyword"):
+                stores = shards or {"": db}
+                ctx_docs = self._hybrid_search(message, query, stores, top_k, settings, tag_shard=bool(shards))
+                if not ctx_docs and lexical_only and retrieval_mode == "hybrid":
+                    # Nothing matched literally: fall back to the vector side after all
+                    query = _query_cache.embed_query(_query_embedder(next(iter(stores.values())).embeddings), message)
+                    ctx_docs = self._hybrid_search(message, query, stores, top_k, settings, tag_shard=bool(shards))
+            elif shards:
+                ctx_docs = self._search_shards(query, shards, top_k, retrieval_mode, settings)
             else:
-                retriever = db.as_retriever(search_kwargs={"k": top_k})
-            
-            ctx_docs = retriever.invoke(message)
+                # Retrieve scored context from database (cached native retriever); weak matches are left out of the prompt
+                # Source/page filters become a FAISS ID selector, so only matching chunks are scanned
+                scored = get_retriever(db, top_k, retrieval_mode).search(
+                    query, self._filter_rows(db, settings), **self._search_params(settings)
+                )
+                ctx_docs = select_relevant(scored, top_k, self._min_score(settings), self.max_score_drop)
             
-            # Build context from retrieved documents
-            parts = []
-            total = 0
-            for d in ctx_docs:
-                text = d.page_content or ""
-                remaining = max_context_chars - total
-                if remaining <= 0:
-                    break
-                if len(text) > remaining:
-                    text = text[:remaining]
-                if text:
-                    parts.append(text)
-                    total += len(text)
+            # Build context from retrieved documents: merge overlapping chunks, drop repeats, pack to the token budget
+            packed = pack_context(
+                ctx_docs,
+                max_tokens=max_context_tokens,
+                lengths=_context_token_lengths(),
+                max_chars=max_context_chars
+            )
+            ctx_docs = packed.documents
+            # Returned as ChatResponse.context and in the stream's stats event
+            context_stats = packed.stats()
             
-            context = "\n\n".join(parts)
+            context = packed.text
             # Sanitize to avoid encoding issues
             context = context.encode("utf-8", errors="ignore").decode("utf-8", errors="ignore")
             
-            # Check if context is empty or very short
-            if not context.strip() or len(context.strip()) < 50:
+            # Nothing cleared the relevance bar: answer from general knowledge with a short prompt
+            if not context.strip():
                 template = (
                     "You are a helpful assistant. Answer the question using your general knowledge.\n"
                     "Be informative and helpful in your response.\n\n"
@@ -86,21 +355,136 @@ class ChatService:
                     context=context
                 )
         
-        # Generate response using LLM
-        llm = OllamaLLM(
-            model=self.llm_model,
-            base_url=self.base_url,
-            temperature=0.2,
-            num_predict=max_tokens
-        )
-        
-        answer = llm.invoke(prompt)
-        
-        # Create response object
-        from models.chat import ChatResponse, Source
         sources = [
             Source(content=doc.page_content, metadata=doc.metadata)
             for doc in ctx_docs
         ]
+        return PreparedMessage(prompt, sources, None, cache_key, query, context_stats, started)
+    
+    def _llm(self, max_tokens: int) -> Any:
+        # Shared client: pooled connections to Ollama, configured keep_alive
+        return get_llm(self.llm_model, self.base_url, num_predict=max_tokens, temperature=0.2)
+    
+    async def prepare_async(self, message: str, db: Optional[Any], settings: Dict) -> PreparedMessage:
+        """``prepare`` with the query embedded by the async Ollama client and the FAISS search in a worker thread"""
+        started = time.perf_counter()
+        query = None
+        has_index = db is not None or settings.get('allShards') or settings.get('shards')
+        if has_index and not self._lexical_only(message, settings):
+            # Every index is built with the configured embedding model
+            query = await _query_cache.aembed_query(_query_embedder(get_embeddings(self.emb_model, self.base_url)), message)
+        prepared = await asyncio.to_thread(self.prepare, message, db, settings, query)
+        return prepared._replace(started=started)
+    
+    async def process_message(
+        self,
+        message: str,
+        db: Optional[Any],
+        settings: Dict,
+        current_pdf: Optional[str] = None,
+        prepared: Optional[PreparedMessage] = None
+    ):
+        """
+        Process a chat message and return a response without blocking the
+        event loop: the query is embedded and the answer generated with the
+        async Ollama client, and the FAISS search runs in a worker thread.
+        """
+        from models.chat import ChatResponse
+        
+        if prepared is None:
+            prepared = await self.prepare_async(message, db, settings)
+        prompt, sources, cached, cache_key, query, context_stats, _ = prepared
+        if cached is not None:
+            return ChatResponse(answer=cached.answer, sources=sources)
+        
+        # Generate response using LLM
+        answer = await self._llm(settings.get('maxTokens', 256)).ainvoke(prompt)
+        if cache_key is not None:
+            _answer_cache.store(*cache_key, query, answer, sources)
+        
+        return ChatResponse(answer=answer, sources=sources, context=context_stats)
+    
+    def answer(
+        self,
+        message: str,
+        db: Optional[Any],
+        settings: Dict,
+        current_pdf: Optional[str] = None,
+        prepared: Optional[PreparedMessage] = None
+    ):
+        """Blocking variant of process_message for threaded servers (Flask)"""
+        from models.chat import ChatResponse
+        
+        prompt, sources, cached, cache_key, query, context_stats, _ = prepared or self.prepare(message, db, settings)
+        if cached is not None:
+            return ChatResponse(answer=cached.answer, sources=sources)
+        
+        answer = self._llm(settings.get('maxTokens', 256)).invoke(prompt)
+        if cache_key is not None:
+            _answer_cache.store(*cache_key, query, answer, sources)
+        
+        return ChatResponse(answer=answer, sources=sources, context=context_stats)
+    
+    def stream_message(
+        self,
+        message: str,
+        db: Optional[Any],
+        settings: Dict,
+        current_pdf: Optional[str] = None,
+        cancel: Optional[threading.Event] = None,
+        prepared: Optional[PreparedMessage] = None
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Streaming variant of process_message yielding (event, data) pairs:
+        one "sources" event, a "token" event per generated chunk, then a
+        "stats" event with time to first token and tokens/s (or an "error"
+        event). Closing the generator, or setting ``cancel`` from another
+        thread, closes the Ollama stream, which stops generation.
+        """
+        if prepared is None:
+            try:
+                prepared = self.prepare(message, db, settings)
+            except Exception as e:
+                yield "error", {"message": f"Failed to process message: {str(e)}"}
+                return
+        prompt, sources, cached, cache_key, query, context_stats, started = prepared
+        yield "sources", [source.model_dump() for source in sources]
+        
+        if cached is not None:
+            yield "token", cached.answer
+            yield "stats", {"cached": True, "ttft_ms": round((time.perf_counter() - started) * 1000, 1)}
+            return
+        
+        parts: List[str] = []
+        first_token_at = None
+        stream = self._llm(settings.get('maxTokens', 256)).stream(prompt)
+        try:
+            for chunk in stream:
+                if cancel is not None and cancel.is_set():
+                    return
+                if not chunk:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(chunk)
+                yield "token", chunk
+        except Exception as e:
+            yield "error", {"message": f"Generation failed: {str(e)}"}
+            return
+        finally:
+            # Runs on client disconnect too (GeneratorExit), dropping the connection to Ollama
+            stream.close()
         
-        return ChatResponse(answer=answer, sources=sources)
+        finished = time.perf_counter()
+        answer = "".join(parts)
+        if cache_key is not None:
+            _answer_cache.store(*cache_key, query, answer, sources)
+        generating = finished - first_token_at if first_token_at is not None else 0.0
+        yield "stats", {
+            "cached": False,
+            "ttft_ms": round((first_token_at - started) * 1000, 1) if first_token_at is not None else None,
+            "tokens": len(parts),
+            "tokens_per_s": round(len(parts) / generating, 1) if generating > 0 else None,
+            "total_ms": round((finished - started) * 1000, 1),
+            "context": context_stats,
+        }
@@ -1,10 +1,11 @@
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, List, Optional, Tuple
+import psutil
 from langchain_community.vectorstores import FAISS
-from langchain_ollama import OllamaEmbeddings
 
 from core.config import settings
+from core.database import get_index_registry
 import sys
 from pathlib import Path as _Path
 
@@ -13,7 +14,18 @@ _PROJECT_ROOT = _Path(__file__).resolve().parents[2]
 if str(_PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(_PROJECT_ROOT))
 
-from ai.loader import get_or_create_pdf_index, load_index, get_pdf_index_name
+from ai.loader import current_index_dir, get_or_create_pdf_index, index_exists, load_index, get_pdf_index_name, index_memory_info
+
+# (mtime, size) of each PDF when its cached index was last checked against it
+_verified_pdfs: Dict[str, Tuple[int, int]] = {}
+
+def _index_version(index_path: Path) -> Optional[str]:
+    """Version of a saved index for the registry: every save writes a new version directory"""
+    index_file = current_index_dir(index_path) / "index.faiss"
+    try:
+        return f"{index_file}:{index_file.stat().st_mtime_ns}"
+    except FileNotFoundError:
+        return None
 
 class IndexService:
     def __init__(self):
@@ -22,19 +34,51 @@ class IndexService:
         self.indices_dir = Path(settings.faiss_index_dir)
         self.global_index_dir = Path(settings.faiss_global_index_dir)
     
-    async def get_or_create_pdf_index(self, pdf_path: str) -> FAISS:
-        """Get or create FAISS index for a specific PDF"""
+    async def get_or_create_pdf_index(self, pdf_path: str, progress: Optional[Callable[[str, int, int], None]] = None) -> FAISS:
+        """Get or create FAISS index for a specific PDF; ``progress`` receives build updates"""
+        index_path = self.index_path(pdf_path)
+        stat = os.stat(pdf_path)
+        pdf_version = (stat.st_mtime_ns, stat.st_size)
+        # Unchanged PDF with a loaded index: skip hashing the PDF and reading the index
+        if _verified_pdfs.get(str(index_path)) == pdf_version:
+            db = get_index_registry().get(str(index_path), _index_version(index_path))
+            if db is not None:
+                return db
         try:
             # Use the loader function from the main project
             db = get_or_create_pdf_index(
                 pdf_path=pdf_path,
                 indices_dir=self.indices_dir,
                 emb_model=self.emb_model,
-                base_url=self.base_url
+                base_url=self.base_url,
+                batch_size=settings.embed_batch_size,
+                max_in_flight=settings.embed_max_in_flight,
+                cache_max_mb=settings.embed_cache_max_mb,
+                index_spec=settings.faiss_index_spec,
+                dedup_threshold=settings.dedup_threshold,
+                mmap=settings.faiss_mmap,
+                progress=progress
             )
-            return db
         except Exception as e:
             raise Exception(f"Failed to create/load index for {pdf_path}: {str(e)}")
+        self._remember(index_path, db, pdf_path)
+        _verified_pdfs[str(index_path)] = pdf_version
+        return db
+    
+    def _remember(self, index_path: Path, db: FAISS, pdf_path: Optional[str] = None) -> None:
+        """Publish a loaded index in the registry, sized by its heap plus mapped bytes"""
+        mem = index_memory_info(db)
+        get_index_registry().put(
+            str(index_path), db, _index_version(index_path), mem["heap_bytes"] + mem["mapped_bytes"], pdf_path
+        )
+    
+    def pdf_unchanged(self, pdf_path: str) -> bool:
+        """Whether the PDF is unchanged since its published index was last checked against it"""
+        stat = os.stat(pdf_path)
+        return _verified_pdfs.get(str(self.index_path(pdf_path))) == (stat.st_mtime_ns, stat.st_size)
+    
+    def index_path(self, pdf_path: str) -> Path:
+        return self.indices_dir / get_pdf_index_name(pdf_path)
     
     async def get_global_index(self) -> Optional[FAISS]:
         """Get the global FAISS index if it exists"""
@@ -45,19 +89,46 @@ class IndexService:
             db = load_index(
                 index_dir=self.global_index_dir,
                 emb_model=self.emb_model,
-                base_url=self.base_url
+                base_url=self.base_url,
+                mmap=settings.faiss_mmap
             )
             return db
         except Exception as e:
             print(f"Failed to load global index: {e}")
             return None
     
+    def shard_dirs(self, pdf_paths: Optional[List[str]] = None) -> Dict[str, Path]:
+        """Existing per-PDF index directories by name, for the given PDFs or all of them"""
+        if pdf_paths is None:
+            candidates = sorted(p for p in self.indices_dir.iterdir() if p.is_dir()) if self.indices_dir.exists() else []
+        else:
+            candidates = [self.indices_dir / get_pdf_index_name(p) for p in pdf_paths]
+        return {p.name: p for p in candidates if index_exists(p)}
+    
+    def load_shard(self, index_path: Path) -> FAISS:
+        """Load a per-PDF index for searching, reusing the loaded copy until a new version is saved"""
+        db = get_index_registry().get(str(index_path), _index_version(index_path))
+        if db is None:
+            db = load_index(index_dir=index_path, emb_model=self.emb_model, base_url=self.base_url, mmap=settings.faiss_mmap)
+            self._remember(index_path, db)
+        return db
+    
+    def get_shards(self, pdf_paths: Optional[List[str]] = None) -> Dict[str, FAISS]:
+        """Loaded shards by index name; PDFs without a built index are skipped rather than embedded"""
+        shards = {}
+        for name, index_path in self.shard_dirs(pdf_paths).items():
+            try:
+                shards[name] = self.load_shard(index_path)
+            except Exception as e:
+                print(f"Failed to load shard {name}: {e}")
+        return shards
+    
     def index_exists(self, pdf_path: str) -> bool:
         """Check if an index exists for a specific PDF"""
         try:
             index_name = get_pdf_index_name(pdf_path)
             index_path = self.indices_dir / index_name
-            return index_path.exists() and (index_path / "index.faiss").exists()
+            return index_exists(index_path)
         except Exception:
             return False
     
@@ -70,9 +141,11 @@ class IndexService:
             if not index_path.exists():
                 return {"exists": False}
             
-            # Get file sizes
-            faiss_file = index_path / "index.faiss"
-            pkl_file = index_path / "index.pkl"
+            # Get file sizes of the live version
+            version_path = current_index_dir(index_path)
+            faiss_file = version_path / "index.faiss"
+            pkl_file = version_path / "index.pkl"
+            chunks_file = version_path / "chunks.sqlite"
             
             info = {
                 "exists": True,
@@ -80,8 +153,22 @@ class IndexService:
                 "index_path": str(index_path),
                 "faiss_size": faiss_file.stat().st_size if faiss_file.exists() else 0,
                 "pkl_size": pkl_file.stat().st_size if pkl_file.exists() else 0,
+                "chunks_size": chunks_file.stat().st_size if chunks_file.exists() else 0,
             }
             
             return info
         except Exception as e:
             return {"exists": False, "error": str(e)}
+    
+    def get_memory_info(self, db: Optional[FAISS]) -> dict:
+        """Process memory plus the loaded index's heap vs memory-mapped bytes"""
+        mem = psutil.Process().memory_info()
+        info = {
+            "process_rss_bytes": mem.rss,
+            # Pages shared with other processes (e.g. mapped index files); Linux only
+            "process_shared_bytes": getattr(mem, "shared", None),
+            "index": None,
+        }
+        if db is not None:
+            info["index"] = index_memory_info(db)
+        return info
@@ -0,0 +1,242 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from core.config import settings
+from core.database import get_current_handle, get_index_registry, set_db
+from services.index_service import IndexService
+
+# Finished jobs kept around for GET /api/jobs/{id}
+_MAX_FINISHED_JOBS = 200
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class IndexNotReady(Exception):
+    """The requested PDF has no index yet; ``job`` is building it"""
+
+    def __init__(self, job: "IndexJob"):
+        super().__init__(f"Index for {job.pdf_path} is being built")
+        self.job = job
+
+
+@dataclass
+class IndexJob:
+    id: str
+    pdf_path: str
+    status: str = "queued"  # queued | running | done | failed | cancelled
+    pages_parsed: int = 0
+    pages_total: int = 0
+    chunks_embedded: int = 0
+    chunks_total: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    stage_started_at: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    future: Optional[Future] = field(default=None, repr=False)
+    callbacks: List[Callable[[Any], None]] = field(default_factory=list, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def progress(self, stage: str, done: int, total: int) -> None:
+        """Loader progress hook; raising here aborts the build at the next page or batch"""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+        if stage == "chunks" and not self.chunks_total:
+            self.stage_started_at = time.time()
+        if stage == "pages":
+            self.pages_parsed, self.pages_total = done, total
+        else:
+            self.chunks_embedded, self.chunks_total = done, total
+
+    def eta_seconds(self) -> Optional[float]:
+        """Remaining time extrapolated from the current stage's rate"""
+        if self.status != "running" or self.stage_started_at is None:
+            return None
+        if self.chunks_total:
+            done, total = self.chunks_embedded, self.chunks_total
+        else:
+            done, total = self.pages_parsed, self.pages_total
+        if not done or not total:
+            return None
+        elapsed = time.time() - self.stage_started_at
+        return round(elapsed / done * (total - done), 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "pdf_path": self.pdf_path,
+            "status": self.status,
+            "pages_parsed": self.pages_parsed,
+            "pages_total": self.pages_total,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_total": self.chunks_total,
+            "eta_seconds": self.eta_seconds(),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs index builds on a bounded thread pool so HTTP requests return at once.
+
+    Builds are single-flight per PDF: submitting a PDF that already has a
+    queued or running job returns that job (and adds the callback to it)
+    instead of embedding the document twice.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="index-build")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, IndexJob]" = OrderedDict()
+        self._active: Dict[str, IndexJob] = {}
+
+    def submit(self, pdf_path: str, on_done: Optional[Callable[[Any], None]] = None) -> IndexJob:
+        """Queue a build for ``pdf_path`` (or join the in-flight one); ``on_done(db)`` runs after success"""
+        with self._lock:
+            job = self._active.get(pdf_path)
+            if job is None:
+                job = IndexJob(id=uuid.uuid4().hex, pdf_path=pdf_path)
+                self._jobs[job.id] = job
+                self._active[pdf_path] = job
+                self._prune()
+                job.future = self._pool.submit(self._run, job)
+            if on_done is not None:
+                job.callbacks.append(on_done)
+        return job
+
+    def get(self, job_id: str) -> Optional[IndexJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[IndexJob]:
+        """Cancel a queued job immediately, or a running one at its next progress update"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            job.cancel_event.set()
+            if job.future is not None and job.future.cancel():
+                self._finish(job, "cancelled")
+        return job
+
+    def _run(self, job: IndexJob) -> None:
+        job.status = "running"
+        job.started_at = job.stage_started_at = time.time()
+        try:
+            db = asyncio.run(IndexService().get_or_create_pdf_index(job.pdf_path, progress=job.progress))
+        except Exception as e:
+            with self._lock:
+                if job.cancel_event.is_set():
+                    self._finish(job, "cancelled")
+                else:
+                    job.error = str(e)
+                    self._finish(job, "failed")
+            return
+        with self._lock:
+            self._finish(job, "done")
+            callbacks = list(job.callbacks)
+        for callback in callbacks:
+            try:
+                callback(db)
+            except Exception as e:
+                print(f"Index job {job.id} callback failed: {e}")
+
+    def _finish(self, job: IndexJob, status: str) -> None:
+        # Caller holds self._lock
+        job.status = status
+        job.finished_at = time.time()
+        if self._active.get(job.pdf_path) is job:
+            del self._active[job.pdf_path]
+
+    def _prune(self) -> None:
+        # Caller holds self._lock; drop the oldest finished jobs beyond the history limit
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - _MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Process-wide job manager, created on first use"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(max_workers=settings.index_build_workers)
+        return _manager
+
+
+_selected_pdf: Optional[str] = None
+
+
+def load_pdf_in_background(pdf_path: str) -> IndexJob:
+    """
+    Build or load the index for ``pdf_path`` as a job and make it the current
+    index when it is ready, unless another PDF has been requested since.
+    """
+    global _selected_pdf
+    _selected_pdf = pdf_path
+
+    def select(db: Any) -> None:
+        if _selected_pdf == pdf_path:
+            set_db(db, pdf_path)
+
+    return get_job_manager().submit(pdf_path, on_done=select)
+
+
+def _republish(pdf_path: str) -> Callable[[Any], None]:
+    """
+    ``on_done`` for refresh jobs: the job has already published the new
+    handle in the registry; if ``pdf_path`` is the current document, swap the
+    current handle too instead of leaving it on the superseded version.
+    """
+    def publish(db: Any) -> None:
+        current = get_current_handle()
+        if current is not None and current.pdf_path == pdf_path:
+            set_db(db, pdf_path)
+
+    return publish
+
+
+def resolve_index(pdf_path: str) -> Any:
+    """
+    Index to search for a request that names ``pdf_path``.
+
+    Serves the published handle without blocking. If the PDF changed since
+    that handle was checked, a background job refreshes it into a new saved
+    version and publishes a new handle when done (in the registry, and as the
+    current index if this is the current PDF); requests in flight keep
+    searching the old version, whose files are left in place.
+    Raises IndexNotReady (with the build job) if no index exists yet.
+    """
+    index_service = IndexService()
+    index_path = index_service.index_path(pdf_path)
+    handle = get_index_registry().peek(str(index_path))
+    if handle is None:
+        if not index_service.index_exists(pdf_path):
+            raise IndexNotReady(get_job_manager().submit(pdf_path, on_done=_republish(pdf_path)))
+        # Loading a saved index is cheap (memory-mapped); checking it against the PDF is left to the job
+        db = index_service.load_shard(index_path)
+        if not index_service.pdf_unchanged(pdf_path):
+            get_job_manager().submit(pdf_path, on_done=_republish(pdf_path))
+        return db
+    if not index_service.pdf_unchanged(pdf_path):
+        get_job_manager().submit(pdf_path, on_done=_republish(pdf_path))
+    return handle.db
@@ -0,0 +1,25 @@
+import sys
+import threading
+from pathlib import Path
+
+from core.config import settings
+
+# Ensure the project root (containing the `ai` package) is on sys.path
+_PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from ai.ollama_clients import configure, warm_up
+
+
+def init_ollama_clients() -> None:
+    """Apply the Ollama client settings and, if enabled, load the models in the background"""
+    configure(keep_alive=settings.ollama_keep_alive, max_connections=settings.ollama_max_connections)
+    if settings.ollama_warmup:
+        # Startup doesn't wait for Ollama; cold vs warm latencies are printed when the warm-up finishes
+        threading.Thread(
+            target=warm_up,
+            args=(settings.ollama_llm_model, settings.ollama_embed_model, settings.ollama_host),
+            name="ollama-warmup",
+            daemon=True
+        ).start()
@@ -18,6 +18,27 @@ type ChatMessage = {
 type ChatSource = { content: string; metadata: Record<string, unknown> }
 type ChatResponse = { answer: string; sources: ChatSource[] }
 type PDFDocument = { name: string; path: string }
+type IndexJob = {
+  job_id: string
+  pdf_path: string
+  status: 'queued' | 'running' | 'done' | 'failed' | 'cancelled'
+  pages_parsed: number
+  pages_total: number
+  chunks_embedded: number
+  chunks_total: number
+  eta_seconds: number | null
+  error: string | null
+}
+
+const JOB_POLL_MS = 1000
+
+function jobProgress(job: IndexJob): string {
+  if (job.status === 'queued') return 'Waiting to start...'
+  const eta = job.eta_seconds != null ? `, ~${Math.ceil(job.eta_seconds)}s left` : ''
+  if (job.chunks_total) return `Embedding chunks ${job.chunks_embedded}/${job.chunks_total}${eta}`
+  if (job.pages_total) return `Reading pages ${job.pages_parsed}/${job.pages_total}${eta}`
+  return 'Preparing index...'
+}
 
 const API_BASE = (import.meta as any).env.VITE_API_BASE ?? 'http://localhost:8000/api'
 
@@ -58,6 +79,9 @@ function App() {
   const [input, setInput] = useState('')
   const [loading, setLoading] = useState(false)
   const [showSources, setShowSources] = useState(false)
+  const [indexJob, setIndexJob] = useState<IndexJob | null>(null)
+  // PDF the user selected last; job updates and answers for other PDFs are dropped
+  const selectedPdfRef = useRef<string>('')
   const [settings, setSettings] = useState<ChatSettings>({
     topK: 4,
     retrievalMode: 'similarity',
@@ -66,6 +90,7 @@ function App() {
     showContext: false,
   })
   const messagesEndRef = useRef<HTMLDivElement | null>(null)
+  const indexing = indexJob !== null && (indexJob.status === 'queued' || indexJob.status === 'running')
 
   useEffect(() => {
     const fetchHealth = async () => {
@@ -94,16 +119,47 @@ function App() {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' })
   }, [messages])
 
+  // Poll a background index build until it finishes (or another PDF is selected)
+  async function waitForJob(jobId: string, pdfPath: string) {
+    while (selectedPdfRef.current === pdfPath) {
+      let job: IndexJob
+      try {
+        const res = await fetch(`${apiBase}/jobs/${jobId}`)
+        if (!res.ok) break
+        job = (await res.json()) as IndexJob
+      } catch {
+        break
+      }
+      if (selectedPdfRef.current !== pdfPath) return
+      if (job.status === 'done') {
+        setIndexJob(null)
+        return
+      }
+      setIndexJob(job)
+      if (job.status === 'failed' || job.status === 'cancelled') return
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_MS))
+    }
+    if (selectedPdfRef.current === pdfPath) setIndexJob(null)
+  }
+
   async function loadPdf(pdfPath: string, pdfName: string) {
+    selectedPdfRef.current = pdfPath
     setCurrentPdf(pdfPath)
     setCurrentPdfName(pdfName)
+    setIndexJob(null)
     setMessages([]) // Clear chat when switching documents
     try {
-      await fetch(`${apiBase}/load-pdf`, {
+      const res = await fetch(`${apiBase}/load-pdf`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ pdf_path: pdfPath }),
       })
+      const data = await res.json()
+      // 202: the index is built or loaded in the background
+      if (res.status === 202 && data?.job_id) {
+        if (data.job) setIndexJob(data.job as IndexJob)
+        await waitForJob(data.job_id, pdfPath)
+      }
     } catch {
       // ignore
     }
@@ -132,11 +188,7 @@ function App() {
       const res = await fetch(`${apiBase}/upload-pdf`, { method: 'POST', body: form })
       const data = await res.json()
       if (data?.success && data?.path) {
-        // If backend already selected/built index, just update current selection immediately
-        setCurrentPdf(data.path)
-        setCurrentPdfName(data.name || '')
-        setMessages([])
-        // Also refresh list to include it
+        // Refresh the list to include it and select it; loading joins the index job started by the upload
         await refreshPdfs(data.path)
       }
     } catch {
@@ -149,17 +201,41 @@ function App() {
   async function sendMessage() {
     const text = input.trim()
     if (!text) return
+    const pdfPath = currentPdf
     setInput('')
     setMessages((m) => [...m, { role: 'user', content: text }])
     setLoading(true)
     try {
+      // Name the document so the answer comes from it, not whichever PDF the server loaded last
       const res = await fetch(`${apiBase}/chat`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ message: text, settings }),
+        body: JSON.stringify({ message: text, settings, pdf_path: pdfPath || undefined }),
       })
-      const data = (await res.json()) as ChatResponse
-      setMessages((m) => [...m, { role: 'assistant', content: data.answer, sources: data.sources }])
+      const data = await res.json()
+      if (selectedPdfRef.current !== pdfPath) return // switched documents while waiting
+      if (res.status === 409) {
+        // No index yet: show the build progress and let the user ask again when it is done
+        setMessages((m) => [...m, { role: 'assistant', content: 'This document is still being indexed. Please ask again when indexing finishes.' }])
+        if (data?.detail?.job_id) waitForJob(data.detail.job_id, pdfPath)
+        return
+      }
+      if (res.status === 429) {
+        const retryAfter = res.headers.get('Retry-After') ?? data?.detail?.retry_after
+        const position = data?.detail?.queue_position
+        setMessages((m) => [...m, {
+          role: 'assistant',
+          content: `The server is busy${position != null ? ` (${position} requests ahead)` : ''}. Please try again${retryAfter ? ` in ${retryAfter}s` : ' shortly'}.`,
+        }])
+        return
+      }
+      if (!res.ok) {
+        const detail = typeof data?.detail === 'string' ? data.detail : data?.detail?.message
+        setMessages((m) => [...m, { role: 'assistant', content: detail || `Server error (${res.status}).` }])
+        return
+      }
+      const answer = data as ChatResponse
+      setMessages((m) => [...m, { role: 'assistant', content: answer.answer, sources: answer.sources }])
     } catch (e) {
       setMessages((m) => [...m, { role: 'assistant', content: 'Error contacting server.' }])
     } finally {
@@ -207,6 +283,22 @@ function App() {
                     title="Upload a PDF from your computer"
                   />
                 </div>
+                {indexJob && (
+                  <div className={`alert ${indexJob.status === 'failed' ? 'alert-error' : 'alert-info'} py-2 text-sm flex-col items-start`}>
+                    {indexJob.status === 'failed' ? (
+                      <span>Indexing failed: {indexJob.error}</span>
+                    ) : indexJob.status === 'cancelled' ? (
+                      <span>Indexing was cancelled</span>
+                    ) : (
+                      <>
+                        <span>Indexing {currentPdfName}: {jobProgress(indexJob)}</span>
+                        {indexJob.chunks_total > 0 && (
+                          <progress className="progress progress-primary w-full" value={indexJob.chunks_embedded} max={indexJob.chunks_total} />
+                        )}
+                      </>
+                    )}
+                  </div>
+                )}
                 {!currentPdf && (
                   <div className="alert alert-warning py-2 text-sm">
                     <svg xmlns="http://www.w3.org/2000/svg" className="stroke-current shrink-0 h-5 w-5" fill="none" viewBox="0 0 24 24"><path strokeLinecap="round" strokeLinejoin="round" strokeWidth="2" d="M12 9v2m0 4h.01m-6.938 4h13.856c1.54 0 2.502-1.667 1.732-3L13.732 4c-.77-1.333-2.694-1.333-3.464 0L3.34 16c-.77 1.333.192 3 1.732 3z" /></svg>
@@ -371,7 +463,7 @@ function App() {
             <div className="flex gap-2">
               <input
                 className="input input-bordered flex-1"
-                placeholder={currentPdf ? "Ask something about the document..." : "Select a document first..."}
+                placeholder={!currentPdf ? "Select a document first..." : indexing ? "Waiting for the document to be indexed..." : "Ask something about the document..."}
                 value={input}
                 onChange={(e) => setInput(e.target.value)}
                 onKeyDown={(e) => {
@@ -380,12 +472,12 @@ function App() {
                     sendMessage()
                   }
                 }}
-                disabled={loading || !currentPdf}
+                disabled={loading || !currentPdf || indexing}
               />
               <button 
                 className="btn btn-primary" 
                 onClick={sendMessage} 
-                disabled={loading || !currentPdf || !input.trim()}
+                disabled={loading || !currentPdf || indexing || !input.trim()}
               >
                 {loading ? <span className="loading loading-spinner loading-sm" /> : '📤 Send'}
               </button>
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# Import `ai.*` from the project root and backend modules (`core.*`, `services.*`) the way the backend does
+ROOT = Path(__file__).resolve().parents[1]
+for path in (ROOT, ROOT / "backend"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
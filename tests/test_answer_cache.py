@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("numpy")
+from services.answer_cache import SemanticAnswerCache
+
+
+def test_similar_questions_hit_within_scope_and_key():
+    cache = SemanticAnswerCache(max_entries=8, threshold=0.95)
+    cache.store("manual", "v1", "llama", [1.0, 0.0], "12 Nm", ["p3"])
+
+    hit = cache.lookup("manual", "v1", "llama", [0.99, 0.05])
+    assert hit is not None and hit.answer == "12 Nm" and hit.sources == ["p3"]
+    assert cache.lookup("manual", "v1", "llama", [0.0, 1.0]) is None  # different question
+    assert cache.lookup("manual", "v1", "mistral", [1.0, 0.0]) is None  # other model/settings
+    assert cache.lookup("other", "v1", "llama", [1.0, 0.0]) is None  # other index
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3
+
+
+def test_new_index_version_drops_the_scope_entries():
+    cache = SemanticAnswerCache(max_entries=8, threshold=0.95)
+    cache.store("manual", "v1", "llama", [1.0, 0.0], "12 Nm", [])
+    cache.store("guide", "v1", "llama", [1.0, 0.0], "Press reset", [])
+
+    assert cache.lookup("manual", "v2", "llama", [1.0, 0.0]) is None
+    assert cache.stats()["invalidations"] == 1
+    # The old version is gone for good, other indices keep their answers
+    assert cache.lookup("manual", "v1", "llama", [1.0, 0.0]) is None
+    assert cache.lookup("guide", "v1", "llama", [1.0, 0.0]).answer == "Press reset"
+
+
+def test_least_recently_used_answers_are_evicted():
+    cache = SemanticAnswerCache(max_entries=2, threshold=0.95)
+    cache.store("manual", "v1", "llama", [1.0, 0.0, 0.0], "a", [])
+    cache.store("manual", "v1", "llama", [0.0, 1.0, 0.0], "b", [])
+    assert cache.lookup("manual", "v1", "llama", [1.0, 0.0, 0.0]).answer == "a"
+    cache.store("manual", "v1", "llama", [0.0, 0.0, 1.0], "c", [])
+    assert cache.lookup("manual", "v1", "llama", [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("manual", "v1", "llama", [1.0, 0.0, 0.0]).answer == "a"
+
+
+def test_saving_an_index_changes_its_version(tmp_path):
+    pytest.importorskip("faiss")
+    from ai.loader import load_index, save_index
+    from services.answer_cache import index_scope
+    from test_index_store import make_store
+
+    save_index(make_store(["alpha", "beta"]), tmp_path)
+    scope, version = index_scope(load_index(tmp_path))
+    save_index(make_store(["alpha", "beta", "gamma"]), tmp_path)
+    new_scope, new_version = index_scope(load_index(tmp_path))
+    assert new_scope == scope and new_version != version
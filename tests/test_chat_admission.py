@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("langchain_ollama")
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+import api.routes.chat as chat_route
+from models.chat import ChatRequest, ChatSettings
+from services.admission import AdmissionController
+from services.answer_cache import CachedAnswer
+from services.chat_service import ChatService, PreparedMessage
+
+
+@pytest.fixture
+def admission(monkeypatch):
+    admission = AdmissionController(max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(chat_route, "get_admission", lambda: admission)
+    monkeypatch.setattr(chat_route, "_resolve_db", lambda request: (None, None))
+    return admission
+
+
+def prepared(cached_answer=None):
+    cached = None
+    if cached_answer is not None:
+        cached = CachedAnswer("scope", 1, "key", np.zeros(2, dtype=np.float32), cached_answer, [])
+    return PreparedMessage(None if cached else "prompt", [], cached, None, None, None, 0.0)
+
+
+def request():
+    return ChatRequest(message="What is the torque?", settings=ChatSettings())
+
+
+def test_cache_hit_is_served_without_a_slot(admission, monkeypatch):
+    async def run(result):
+        async def prepare_async(self, message, db, settings):
+            return result
+
+        monkeypatch.setattr(ChatService, "prepare_async", prepare_async)
+        release = await admission.acquire_async()  # the only slot is busy and nothing may queue
+        try:
+            return await chat_route.send_message(request())
+        finally:
+            release()
+
+    assert asyncio.run(run(prepared("12 Nm"))).answer == "12 Nm"
+    with pytest.raises(HTTPException) as busy:
+        asyncio.run(run(prepared()))
+    assert busy.value.status_code == 429
+
+
+def test_stream_releases_its_slot_on_the_event_loop(admission, monkeypatch):
+    on_loop = []
+    leave = admission._leave
+
+    def record_leave(started):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        leave(started)
+
+    async def prepare_async(self, message, db, settings):
+        return prepared()
+
+    def stream_message(self, message, db, settings, current_pdf=None, cancel=None, prepared=None):
+        yield "token", "12 Nm"
+
+    monkeypatch.setattr(admission, "_leave", record_leave)
+    monkeypatch.setattr(ChatService, "prepare_async", prepare_async)
+    monkeypatch.setattr(ChatService, "stream_message", stream_message)
+    app = FastAPI()
+    app.include_router(chat_route.router)
+    with TestClient(app) as client:
+        response = client.post("/chat/stream", json=request().model_dump())
+    assert response.status_code == 200 and "12 Nm" in response.text
+    assert on_loop == [True]
+    assert admission.stats()["active"] == 0
@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.documents import Document
+
+from ai.context_packer import pack_context
+
+
+def words(pieces):
+    return [len(piece.split()) for piece in pieces]
+
+
+def chunk(text, page=1, source="manual.pdf"):
+    return Document(page_content=text, metadata={"source": source, "page": page})
+
+
+def test_overlapping_chunks_of_a_page_are_merged_and_repeats_dropped():
+    first = chunk("Prime the pump before the first start. Open the vent valve until water flows.")
+    second = chunk("Open the vent valve until water flows. Then close it and start the motor.")
+    packed = pack_context([first, second, chunk(first.page_content), chunk("Unrelated note.", page=7)], 1000, words)
+
+    assert packed.text == (
+        "Prime the pump before the first start. Open the vent valve until water flows. "
+        "Then close it and start the motor.\n\nUnrelated note."
+    )
+    assert (packed.merged, packed.duplicates) == (1, 1)
+    assert packed.tokens < packed.tokens_raw and not packed.truncated
+
+
+def test_blocks_are_added_in_rank_order_within_the_token_budget():
+    best = chunk(" ".join(["torque"] * 10), page=1)
+    long = chunk(" ".join(f"step{i}" for i in range(100)), page=2)
+    packed = pack_context([best, long], 50, words)
+
+    # The second block is cut to the 40 words left
+    assert packed.truncated
+    assert packed.tokens == 50
+    assert packed.text.split("\n\n")[1] == " ".join(f"step{i}" for i in range(40))
+
+    # Too little room left for a useful tail: the block is dropped
+    packed = pack_context([best, long], 30, words)
+    assert packed.text == best.page_content and packed.documents == [best]
+
+
+def test_character_budget_also_applies():
+    packed = pack_context([chunk("a" * 50, page=1), chunk("b" * 50, page=2)], 1000, words, max_chars=60)
+    # The tail of the second block fills exactly the characters left
+    assert packed.text == "a" * 50 + "\n\n" + "b" * 8 and packed.truncated
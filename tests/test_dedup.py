@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+from langchain_core.documents import Document
+
+from ai.dedup import ChunkDeduplicator, dedup_chunks
+
+FOOTER = "Confidential - ACME Corp. Do not distribute without written permission from the legal department."
+
+
+def pages(n: int):
+    chunks = []
+    for page in range(n):
+        chunks.append(Document(page_content=f"Section {page}: torque the bolts on assembly {page * 7} to spec.", metadata={"page": page}))
+        chunks.append(Document(page_content=FOOTER, metadata={"page": page}))
+    return chunks
+
+
+def copy(chunks):
+    return [Document(page_content=c.page_content, metadata=dict(c.metadata)) for c in chunks]
+
+
+def test_windows_keep_the_same_chunks_as_one_pass():
+    whole, removed = dedup_chunks(copy(pages(12)), 0.9)
+    dedup = ChunkDeduplicator(0.9)
+    streamed, touched_any = [], []
+    chunks = copy(pages(12))
+    for i in range(0, len(chunks), 5):
+        kept, touched = dedup.add(chunks[i:i + 5])
+        streamed.extend(kept)
+        touched_any.extend(touched)
+    assert [(c.page_content, c.metadata) for c in streamed] == [(c.page_content, c.metadata) for c in whole]
+    assert dedup.removed == removed == 11
+    # The footer was kept in the first window and reported again by later ones
+    assert touched_any and set(touched_any) == {1}
+    assert len(whole[1].metadata["occurrences"]) == 12
+
+
+def test_part_numbers_are_kept_by_default():
+    text = "Replace the filter cartridge using part number AB-{} after every 500 hours of operation. Torque the housing bolts to 12 Nm."
+    chunks = [Document(page_content=text.format(n), metadata={"page": 0}) for n in (1000, 1001)]
+    kept, removed = dedup_chunks(chunks)
+    assert removed == 0 and len(kept) == 2
@@ -0,0 +1,59 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.embeddings import Embeddings
+
+import ai.embedding_cache as embedding_cache
+from ai.embedding import BatchedEmbeddings
+from ai.embedding_cache import EmbeddingCache, text_key
+
+
+class CountingEmbeddings(Embeddings):
+    """Vector = [len(text), 1, 2, 3]; remembers every text it was asked to embed"""
+
+    def __init__(self):
+        self.seen = []
+
+    def embed_documents(self, texts):
+        self.seen.extend(texts)
+        return [[float(len(t)), 1.0, 2.0, 3.0] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_cached_texts_are_not_embedded_again(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite")
+    inner = CountingEmbeddings()
+    embeddings = BatchedEmbeddings(inner, batch_size=2, cache=cache, model="m")
+
+    first = embeddings.embed_documents(["alpha", "beta", "alpha"])
+    assert inner.seen == ["alpha", "beta"]
+    # Whitespace differences normalize to the same entry
+    second = embeddings.embed_documents(["beta", "  alpha ", "gamma"])
+    assert inner.seen == ["alpha", "beta", "gamma"]
+    assert second[:2] == [first[1], first[0]]
+    assert (embeddings.stats.cache_hits, embeddings.stats.cache_misses) == (2, 4)
+
+    # Entries are per model
+    other = BatchedEmbeddings(inner, cache=cache, model="other")
+    other.embed_documents(["alpha"])
+    assert inner.seen[-1] == "alpha"
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    clock = iter(range(1, 100))
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: next(clock))
+    vector = [0.0, 1.0, 2.0, 3.0]  # 16 bytes as float32
+    cache = EmbeddingCache(tmp_path / "cache.sqlite", max_bytes=48)
+    for text in ("a", "b", "c"):
+        cache.put_many("m", [(text_key(text), vector)])
+    assert cache.get_many("m", [text_key("a")])  # a is now the most recently used
+    cache.put_many("m", [(text_key("d"), vector)])
+
+    # Over the limit: the oldest entries go until the cache is back under 90% of it
+    kept = cache.get_many("m", [text_key(t) for t in "abcd"])
+    assert set(kept) == {text_key("a"), text_key("d")}
+    assert cache.size_bytes() <= 48 * 0.9
+    cache.close()
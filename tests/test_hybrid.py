@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_ollama")
+pytest.importorskip("pydantic_settings")
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from ai.chunk_store import iter_documents
+from ai.lexical import BM25Index, build_bm25, is_exact_match_query, tokenize
+from services.chat_service import ChatService
+
+
+def test_tokenize_keeps_codes_and_splits_korean_into_bigrams():
+    assert tokenize("Replace AB-1234 now") == ["replace", "ab-1234", "ab", "1234", "now"]
+    assert tokenize("삼성전자는") == ["삼성", "성전", "전자", "자는"]
+    assert is_exact_match_query("AB-1234") and is_exact_match_query('"torque spec"')
+    assert not is_exact_match_query("how do I reset the pump")
+
+
+def test_bm25_ranks_by_term_weight():
+    index = BM25Index.build([
+        ("a", "pump overview and motor"),
+        ("b", "pump seal kit"),
+        ("c", "seal seal seal replacement"),
+        ("d", "warranty terms"),
+    ])
+    assert [doc_id for doc_id, _ in index.search("seal")] == ["c", "b"]
+    # The rarer term counts for more
+    assert [doc_id for doc_id, _ in index.search("pump kit")] == ["b", "a"]
+    assert index.search("gearbox") == []
+    # Restricted to rows, in FAISS order
+    assert [doc_id for doc_id, _ in index.search("seal", rows=np.array([1]))] == ["b"]
+
+
+def test_hybrid_search_fuses_ranks():
+    texts = ["motor overview", "pump seal kit", "seal seal replacement"]
+    vectors = [[1.0, 0.0], [0.8, 0.6], [0.0, 1.0]]
+    db = FAISS.from_embeddings(list(zip(texts, vectors)), embedding=lambda text: [1.0, 0.0])
+    ordered = [doc_id for _, doc_id in sorted(db.index_to_docstore_id.items())]
+    db.lexical = build_bm25(ordered, iter_documents(db.docstore, ordered))
+    service = ChatService()
+    service.rrf_k, service.max_score_drop = 60, 2.0
+
+    docs = service._hybrid_search("seal", [1.0, 0.0], {"": db}, 3, {"minScore": -1.0})
+
+    # Vector ranking: motor, pump, seal-seal; BM25 ranking: seal-seal, pump
+    assert [d.page_content for d in docs] == ["seal seal replacement", "pump seal kit", "motor overview"]
+    expected = [1 / 63 + 1 / 61, 1 / 62 + 1 / 62, 1 / 61]
+    assert [d.metadata["rrf_score"] for d in docs] == pytest.approx(expected)
+    assert docs[2].metadata["score"] == 1.0
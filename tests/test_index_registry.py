@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("langchain_ollama")
+pytest.importorskip("pydantic_settings")
+from core.database import IndexRegistry
+
+
+def test_least_recently_used_indices_are_evicted_by_bytes():
+    registry = IndexRegistry(max_bytes=250)
+    dbs = {name: object() for name in "abcd"}
+    for name in "abc":
+        registry.put(name, dbs[name], version=1, nbytes=100)
+    # c pushed the total to 300: a, the least recently used, went first
+    assert registry.peek("a") is None
+    assert registry.get("b", version=1) is dbs["b"]  # b is now more recent than c
+    registry.put("d", dbs["d"], version=1, nbytes=100)
+    assert registry.peek("c") is None
+    assert [registry.get(name, version=1) for name in "bd"] == [dbs["b"], dbs["d"]]
+    assert registry.stats()["bytes"] == 200 and registry.stats()["evictions"] == 2
+
+
+def test_latest_store_is_kept_even_over_budget():
+    registry = IndexRegistry(max_bytes=50)
+    db = object()
+    registry.put("big", db, nbytes=100)
+    assert registry.get("big") is db
+
+
+def test_republishing_swaps_in_a_new_handle():
+    registry = IndexRegistry(max_bytes=1000)
+    old_db, new_db = object(), object()
+    old = registry.put("manual", old_db, version="v1", nbytes=10, pdf_path="manual.pdf")
+    new = registry.put("manual", new_db, version="v2", nbytes=20)
+
+    # A request holding the old handle keeps searching the old store
+    assert old.db is old_db and old.generation == 1
+    assert new.db is new_db and new.generation == 2 and new.pdf_path == "manual.pdf"
+    assert registry.peek("manual") is new
+    # A lookup for the superseded files is a miss
+    assert registry.get("manual", version="v1") is None
+    assert registry.stats()["bytes"] == 20
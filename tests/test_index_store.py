@@ -0,0 +1,232 @@
+import zlib
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_ollama")
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+import ai.loader as loader
+from ai.loader import current_index_dir, load_index, save_index
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic 8-d vectors seeded by the text, so no Ollama is needed"""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        return np.random.default_rng(zlib.crc32(text.encode("utf-8"))).random(8).tolist()
+
+
+def make_store(texts, source="manual.pdf"):
+    return FAISS.from_texts(
+        texts, HashEmbeddings(), metadatas=[{"source": source, "page": i} for i in range(len(texts))]
+    )
+
+
+def write_pdf(path, pages):
+    """Stand-in PDF for fake_pdfs: page texts separated by form feeds"""
+    path.write_text("\f".join(pages), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def fake_pdfs(monkeypatch):
+    """Parse write_pdf files and embed with HashEmbeddings, so get_or_create_pdf_index runs without Ollama"""
+
+    def load_pdfs(paths, progress=None, **kwargs):
+        return [doc for _, doc in iter_pdf_pages(paths)]
+
+    def iter_pdf_pages(paths, start=(0, 0), **kwargs):
+        for file_idx in range(start[0], len(paths)):
+            texts = Path(paths[file_idx]).read_text(encoding="utf-8").split("\f")
+            for page in range(start[1] if file_idx == start[0] else 0, len(texts)):
+                yield file_idx, Document(page_content=texts[page], metadata={"source": str(paths[file_idx]), "page": page})
+
+    monkeypatch.setattr(loader, "load_pdfs", load_pdfs)
+    monkeypatch.setattr(loader, "iter_pdf_pages", iter_pdf_pages)
+    monkeypatch.setattr(loader, "get_embeddings", lambda model, base_url: HashEmbeddings())
+
+
+def test_failed_save_keeps_previous_version(tmp_path, monkeypatch):
+    db = make_store(["alpha", "beta", "gamma"])
+    save_index(db, tmp_path)
+    first = current_index_dir(tmp_path)
+
+    def fail(_db):
+        raise RuntimeError("crash while saving")
+
+    db.add_texts(["delta"], metadatas=[{"source": "manual.pdf", "page": 3}])
+    monkeypatch.setattr(loader, "build_lexical_index", fail)
+    with pytest.raises(RuntimeError):
+        save_index(db, tmp_path)
+
+    assert current_index_dir(tmp_path) == first
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".tmp-")]
+    monkeypatch.undo()
+    loaded = load_index(tmp_path)
+    assert loaded.index.ntotal == 3
+    assert sorted(loaded.docstore.positions()) == [0, 1, 2]
+    assert [d.page_content for d in loaded.docstore.mget(list(loaded.index_to_docstore_id.values())).values()]
+
+
+def test_saved_index_spec_round_trips(tmp_path):
+    from ai.index_spec import build_index, parse_index_spec
+    from ai.loader import saved_index_spec
+
+    db = make_store(["alpha", "beta", "gamma"])
+    db.index = build_index(parse_index_spec("hnsw:M=8,efSearch=24"), 8, 3)
+    db.index.add(np.random.default_rng(0).random((3, 8), dtype=np.float32))
+    save_index(db, tmp_path)
+    assert parse_index_spec(saved_index_spec(tmp_path)).params["efSearch"] == 24
+    assert parse_index_spec(saved_index_spec(tmp_path)).kind == "hnsw"
+
+
+def test_save_leaves_files_of_open_indices_alone(tmp_path, monkeypatch):
+    import os
+    import shutil
+    from pathlib import Path
+
+    from ai.loader import CURRENT_FILENAME
+    from ai.retriever import get_retriever
+
+    db = make_store(["alpha", "beta", "gamma"])
+    save_index(db, tmp_path)
+    old = load_index(tmp_path, mmap=True)
+    old_dir = current_index_dir(tmp_path)
+
+    real_replace = os.replace
+    real_rmtree = shutil.rmtree
+
+    def windows_replace(src, dst):
+        # Windows refuses to replace a file another handle has open or mapped; readers only hold CURRENT briefly
+        if Path(dst).exists() and Path(dst).name != CURRENT_FILENAME:
+            raise PermissionError(f"{dst} is in use")
+        real_replace(src, dst)
+
+    def windows_rmtree(path, ignore_errors=False, **kwargs):
+        # Files of the mapped version cannot be deleted while mapped
+        if Path(path) != old_dir:
+            real_rmtree(path, ignore_errors=ignore_errors)
+
+    monkeypatch.setattr(loader.os, "replace", windows_replace)
+    monkeypatch.setattr(loader.shutil, "rmtree", windows_rmtree)
+    for page, text in enumerate(["delta", "epsilon", "zeta"], start=3):
+        db.add_texts([text], metadatas=[{"source": "manual.pdf", "page": page}])
+        save_index(db, tmp_path)
+
+    assert old_dir.exists() and current_index_dir(tmp_path) != old_dir
+    hits = get_retriever(old, 3).search(HashEmbeddings().embed_query("alpha"))
+    assert sorted(doc.page_content for doc, _ in hits) == ["alpha", "beta", "gamma"]
+    assert load_index(tmp_path).index.ntotal == 6
+
+    # Once the handle is gone the next save removes the stale version
+    old.docstore.close()
+    del old
+    monkeypatch.undo()
+    save_index(db, tmp_path)
+    assert not old_dir.exists()
+
+
+def test_refresh_leaves_old_handle_searchable(tmp_path):
+    from ai.chunk_store import iter_documents
+
+    save_index(make_store(["alpha", "beta", "gamma"]), tmp_path)
+    old = load_index(tmp_path, mmap=True)
+    old_ids = [doc_id for _, doc_id in sorted(old.index_to_docstore_id.items())]
+
+    # What refresh_pdf_index does: drop a page's chunks, add new ones, save
+    refreshed = load_index(tmp_path)
+    refreshed.embedding_function = HashEmbeddings()
+    refreshed.delete([old_ids[1]])
+    refreshed.add_texts(["beta revised"], metadatas=[{"source": "manual.pdf", "page": 1}])
+    save_index(refreshed, tmp_path)
+
+    assert [d.page_content for d in iter_documents(old.docstore, old_ids)] == ["alpha", "beta", "gamma"]
+    current = load_index(tmp_path)
+    texts = [d.page_content for d in iter_documents(current.docstore, current.index_to_docstore_id.values())]
+    assert sorted(texts) == ["alpha", "beta revised", "gamma"]
+    # Deleted chunks are pruned from the new version only
+    assert old_ids[1] not in current.docstore.mget([old_ids[1]])
+
+
+def test_path_spellings_share_one_manifest_entry(tmp_path, monkeypatch, fake_pdfs):
+    from ai.loader import get_or_create_pdf_index, get_pdf_index_name
+    from ai.manifest import load_manifest, save_manifest
+
+    pdf = write_pdf(tmp_path / "manual.pdf", ["alpha", "beta", "gamma"])
+    indices = tmp_path / "indices"
+    monkeypatch.chdir(tmp_path)
+    assert get_or_create_pdf_index("manual.pdf", indices).index.ntotal == 3
+    assert get_or_create_pdf_index(pdf, indices).index.ntotal == 3
+
+    # Manifests written before paths were made absolute: no entry for this spelling means a full rebuild
+    index_path = indices / get_pdf_index_name(pdf)
+    manifest = load_manifest(index_path)
+    manifest["files"] = {"manual.pdf": manifest["files"][str(pdf)]}
+    save_manifest(index_path, manifest)
+    db = get_or_create_pdf_index(pdf, indices)
+    assert db.index.ntotal == 3
+    assert list(load_manifest(index_path)["files"]) == [str(pdf)]
+
+
+def test_refresh_of_ivf_index_keeps_rows_and_chunks_in_step(tmp_path, fake_pdfs):
+    from ai.chunk_store import iter_documents
+    from ai.loader import get_or_create_pdf_index
+    from ai.retriever import get_retriever
+
+    texts = [f"chunk {i}" for i in range(60)]
+    pdf = write_pdf(tmp_path / "manual.pdf", texts)
+    indices = tmp_path / "indices"
+    get_or_create_pdf_index(pdf, indices, index_spec="ivf:nlist=2,nprobe=2")
+    texts[20] = "chunk 20 revised"
+    write_pdf(pdf, texts)
+    db = get_or_create_pdf_index(pdf, indices, index_spec="flat")
+
+    assert type(db.index).__name__ == "IndexIVFFlat"
+    assert db.index.ntotal == 60
+    ordered = [doc_id for _, doc_id in sorted(db.index_to_docstore_id.items())]
+    assert [d.page_content for d in iter_documents(db.docstore, ordered)] == texts
+    retriever = get_retriever(db, 1)
+    for text in ("chunk 0", "chunk 20 revised", "chunk 40", "chunk 59"):
+        [(doc, _)] = retriever.search(HashEmbeddings().embed_query(text))
+        assert doc.page_content == text
+
+
+def test_streaming_build_resumes_from_its_checkpoint(tmp_path, monkeypatch, fake_pdfs):
+    from ai.chunk_store import iter_documents
+    from ai.loader import INGEST_STATE_FILENAME, build_index_streaming
+
+    texts = [f"page {i}" for i in range(6)]
+    pdf = write_pdf(tmp_path / "manual.pdf", texts)
+    out = tmp_path / "index"
+
+    class Interrupted(HashEmbeddings):
+        def embed_documents(self, texts):
+            if "page 4" in texts:
+                raise KeyboardInterrupt
+            return super().embed_documents(texts)
+
+    monkeypatch.setattr(loader, "get_embeddings", lambda model, base_url: Interrupted())
+    with pytest.raises(KeyboardInterrupt):
+        build_index_streaming([pdf], out, batch_size=1, max_in_flight=1, checkpoint_pages=2)
+    assert (out / INGEST_STATE_FILENAME).exists()
+
+    # A save that landed after the state file was written: its extra vector is trimmed on resume
+    monkeypatch.setattr(loader, "get_embeddings", lambda model, base_url: HashEmbeddings())
+    partial = load_index(out)
+    assert partial.index.ntotal == 4
+    partial.add_texts(["stray"], metadatas=[{"source": str(pdf), "page": 9}])
+    save_index(partial, out)
+
+    db = build_index_streaming([pdf], out, batch_size=1, max_in_flight=1, checkpoint_pages=2)
+    assert not (out / INGEST_STATE_FILENAME).exists()
+    ordered = [doc_id for _, doc_id in sorted(db.index_to_docstore_id.items())]
+    assert [d.page_content for d in iter_documents(db.docstore, ordered)] == texts
+    assert load_index(out).index.ntotal == 6
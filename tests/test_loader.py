@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("faiss")
+pypdf = pytest.importorskip("pypdf")
+
+from ai.loader import load_pdfs
+
+
+def _write_pdf(path, pages: int) -> None:
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    writer.add_metadata({"/Title": "Manual", "/Author": "QA", "/CreationDate": "D:20240102030405+00'00'"})
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def test_load_pdfs_metadata_does_not_depend_on_workers(tmp_path):
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, 5)
+    serial = load_pdfs([pdf], workers=1)
+    parallel = load_pdfs([pdf], workers=2, pages_per_task=2)
+    assert [d.metadata for d in serial] == [d.metadata for d in parallel]
+    assert [d.page_content for d in serial] == [d.page_content for d in parallel]
+    first = serial[0].metadata
+    assert first["title"] == "Manual" and first["author"] == "QA" and first["producer"]
+    assert first["creationdate"].startswith("2024-01-02")
+    assert [d.metadata["page"] for d in serial] == list(range(5))
+    assert first["total_pages"] == 5
+
+
+def test_page_labels_are_computed_once_per_file(tmp_path, monkeypatch):
+    from ai.loader import iter_pdf_pages
+
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, 6)
+    calls = []
+    labels = pypdf.PdfReader.page_labels
+
+    def counting(reader):
+        calls.append(1)
+        return labels.fget(reader)
+
+    monkeypatch.setattr(pypdf.PdfReader, "page_labels", property(counting))
+    pages = [doc for _, doc in iter_pdf_pages([pdf], reopen_every=4)]
+    assert [d.metadata["page_label"] for d in pages] == ["1", "2", "3", "4", "5", "6"]
+    assert len(calls) == 1
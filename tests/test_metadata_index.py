@@ -0,0 +1,22 @@
+import pytest
+
+pytest.importorskip("numpy")
+from ai.metadata_index import MetadataIndex
+
+
+def make_index():
+    metadatas = [{"source": "/docs/a.pdf", "page": page} for page in range(4)]
+    metadatas += [{"source": "/docs/b.pdf", "page": page} for page in range(3)]
+    return MetadataIndex.build(metadatas)
+
+
+def test_select_pages_and_ranges():
+    index = make_index()
+    assert index.select(["a.pdf"], [0, [2, 3]]).tolist() == [0, 2, 3]
+    assert index.select(None, [[1]]).tolist() == [1, 5]
+
+
+@pytest.mark.parametrize("entry", [[], [1, 2, 3], "3", [1, "2"]])
+def test_select_rejects_malformed_page_entries(entry):
+    with pytest.raises(ValueError, match="Page"):
+        make_index().select(None, [entry])
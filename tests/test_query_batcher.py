@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.embeddings import Embeddings
+
+from ai.query_batcher import QueryEmbeddingBatcher
+
+
+class RecordingEmbeddings(Embeddings):
+    """Vector = [ord of the first letter, length]; records each batch it is sent"""
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        if self.fail:
+            raise ConnectionError("Ollama is down")
+        return [[float(ord(t[0])), float(len(t))] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_concurrent_queries_share_a_batch_and_get_their_own_vectors():
+    inner = RecordingEmbeddings()
+    batcher = QueryEmbeddingBatcher(inner, window_ms=200, max_batch=32)
+    texts = ["torque", "reset", "torque", "manual"]
+    futures = [batcher.submit(text) for text in texts]
+
+    assert [f.result(timeout=5) for f in futures] == [inner.embed_query(t) for t in texts]
+    # One request for the three distinct texts (the rest are this test's own calls)
+    assert inner.batches[0] == ["torque", "reset", "manual"]
+    assert batcher.stats()["batches"] == 1 and batcher.stats()["requests"] == 4
+
+
+def test_async_callers_are_answered_in_order():
+    inner = RecordingEmbeddings()
+    batcher = QueryEmbeddingBatcher(inner, window_ms=50, max_batch=2)
+
+    async def ask():
+        return await asyncio.gather(*(batcher.aembed_query(t) for t in ("a", "bb", "ccc")))
+
+    assert asyncio.run(ask()) == [[97.0, 1.0], [98.0, 2.0], [99.0, 3.0]]
+    assert max(len(batch) for batch in inner.batches) == 2
+
+
+def test_failed_batch_fails_every_caller():
+    batcher = QueryEmbeddingBatcher(RecordingEmbeddings(fail=True), window_ms=50)
+    futures = [batcher.submit(text) for text in ("a", "b")]
+    for future in futures:
+        with pytest.raises(ConnectionError):
+            future.result(timeout=5)
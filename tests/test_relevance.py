@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.documents import Document
+
+from ai.relevance import relevance_from_l2, select_relevant
+
+
+def hits(*relevances):
+    # Squared L2 distance between unit vectors is 2 - 2 * cosine
+    return [(Document(page_content=f"chunk {r}"), 2.0 - 2.0 * r) for r in relevances]
+
+
+def test_relevance_is_cosine_from_squared_l2():
+    assert relevance_from_l2(0.0) == 1.0
+    assert relevance_from_l2(2.0) == 0.0
+    assert relevance_from_l2(5.0) == -1.0
+
+
+def test_chunks_below_the_threshold_are_cut():
+    kept = select_relevant(hits(0.5, 0.8, 0.3, 0.7), k=4, min_score=0.45, max_drop=None)
+    assert [d.page_content for d in kept] == ["chunk 0.8", "chunk 0.7", "chunk 0.5"]
+    assert [d.metadata["score"] for d in kept] == [0.8, 0.7, 0.5]
+    assert kept[0].metadata["distance"] == pytest.approx(0.4)
+
+
+def test_weak_chunks_far_below_the_best_are_cut():
+    kept = select_relevant(hits(0.9, 0.8, 0.7, 0.6), k=4, min_score=0.45, max_drop=0.15)
+    assert [d.metadata["score"] for d in kept] == [0.9, 0.8]
+
+
+def test_at_most_k_and_empty_when_nothing_clears_the_bar():
+    assert len(select_relevant(hits(0.9, 0.88, 0.86), k=2)) == 2
+    assert select_relevant(hits(0.3, 0.2), k=4, min_score=0.45) == []
+    assert select_relevant([], k=4) == []
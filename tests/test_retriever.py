@@ -0,0 +1,52 @@
+import pytest
+
+faiss = pytest.importorskip("faiss")
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from ai.index_spec import build_index, parse_index_spec, train_index
+from ai.retriever import get_retriever, search_parameters
+
+
+def make_store(spec: str, n: int = 400, dim: int = 8) -> FAISS:
+    vectors = np.random.default_rng(0).random((n, dim), dtype=np.float32)
+    index = build_index(parse_index_spec(spec), dim, n)
+    train_index(index, vectors)
+    db = FAISS(lambda text: vectors[0].tolist(), index, InMemoryDocstore(), {})
+    db.add_embeddings([(f"chunk {i}", v.tolist()) for i, v in enumerate(vectors)], metadatas=[{"page": i} for i in range(n)])
+    return db
+
+
+@pytest.mark.parametrize("spec, attr", [("hnsw:M=8,efSearch=16", "efSearch"), ("ivf:nlist=8,nprobe=1", "nprobe")])
+def test_search_params_do_not_change_shared_index(spec, attr):
+    db = make_store(spec)
+    index = db.index
+    before = index.hnsw.efSearch if attr == "efSearch" else index.nprobe
+    query = np.full(index.d, 0.5).tolist()
+    hits = get_retriever(db, 4).search(query, **{attr: 8 if attr == "nprobe" else 200})
+    assert len(hits) == 4 and isinstance(hits[0][0], Document)
+    after = index.hnsw.efSearch if attr == "efSearch" else index.nprobe
+    assert after == before
+
+
+def test_search_parameters_only_when_needed():
+    flat = faiss.IndexFlatL2(4)
+    assert search_parameters(flat) is None
+    hnsw = faiss.IndexHNSWFlat(4, 8)
+    assert search_parameters(hnsw) is None
+    assert search_parameters(hnsw, efSearch=99).efSearch == 99
+
+
+def test_store_is_freed_after_get_retriever():
+    import gc
+    import weakref
+
+    db = make_store("flat", n=20)
+    retriever = get_retriever(db, 4)
+    assert get_retriever(db, 4) is retriever
+    alive = weakref.ref(db)
+    del db, retriever
+    gc.collect()
+    assert alive() is None